@@ -28,9 +28,12 @@ setup(
                                         'templates/rdf_star_store/*.txt',
                                         'templates/query_utils/versioning_modes/*.txt',
                                         'templates/rdf_star_store/test_connection/*.txt',
+                                        'templates/rdf_star_store/partitions/*.txt',
                                         'templates/rdf_star_store/versioning_modes/*.txt',
                                         'templates/query_store/*.sql']},
     install_requires=['tzlocal>=2.1', 'pandas>=1.1.2', 'sparqlwrapper>=1.8.5', 'rdflib>=5.0.0', 'sqlalchemy>=1.3.19',
-                      'numpy>=1.19.1', 'setuptools>=49.6.0']
+                      'numpy>=1.19.1', 'setuptools>=49.6.0'],
+    extras_require={'pooled': ['requests>=2.20.0'], 'arrow': ['pyarrow>=8.0.0']},
+    entry_points={'console_scripts': ['rdf_query_log=rdf_data_citation.query_log:main']}
 
 )
@@ -48,3 +48,16 @@ class InputMissing(Exception):
 
 class WrongInputFormatException(Exception):
     pass
+
+
+class WriteBehindError(Exception):
+
+    def __init__(self, message: str, outdates: list, inserts: list):
+        """
+        :param message:
+        :param outdates: The (triple, prefixes) tuples whose outdates were not written.
+        :param inserts: The (triple, prefixes) tuples whose inserts were not written.
+        """
+        super().__init__(message)
+        self.outdates = outdates
+        self.inserts = inserts
@@ -0,0 +1,161 @@
+from .rdf_star import TripleStoreEngine
+from .rdf_files import parse_ntriples_line, read_ntriples, has_blank_node
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Iterator
+import tzlocal
+import tempfile
+import zlib
+import time
+import os
+import logging
+
+ChangesetResult = namedtuple('ChangesetResult', ['cnt_added', 'cnt_removed', 'cnt_unchanged', 'cnt_skipped',
+                                                 'seconds', 'triples_per_second'])
+
+# N-Triples dumps typically shrink to a tenth of their size with gzip.
+_gzip_compression_ratio = 10
+
+
+def _estimate_size(path: str) -> int:
+    """
+    :return: The size of :path in bytes. The size of files that end with .gz is estimated from the compressed size
+    as the size of the decompressed content is only known after reading the file.
+    """
+
+    if path.endswith(".gz"):
+        return os.path.getsize(path) * _gzip_compression_ratio
+    return os.path.getsize(path)
+
+
+def _partition(path: str, directory: str, cnt_partitions: int, max_open_files: int) -> tuple:
+    """
+    Distributes the triples of :path over :cnt_partitions files by the hash of the triple. Thus, the same triple
+    of two snapshots ends up in the partitions with the same number. Triples with blank nodes are skipped as
+    their labels are not comparable across snapshots. If there are more partitions than :max_open_files,
+    :path is read once per :max_open_files partitions.
+
+    :return: The paths of the partition files and the number of skipped triples.
+    """
+
+    paths = [os.path.join(directory, "{0}.nt".format(i)) for i in range(cnt_partitions)]
+    cnt_skipped = 0
+    for first in range(0, cnt_partitions, max_open_files):
+        last = min(first + max_open_files, cnt_partitions)
+        partitions = [open(p, "w", encoding="utf-8") for p in paths[first:last]]
+        try:
+            for triple in read_ntriples(path):
+                statement = " ".join(triple)
+                if "_:" in statement and any(has_blank_node(term) for term in triple):
+                    if first == 0:
+                        cnt_skipped += 1
+                    continue
+                i = zlib.crc32(statement.encode("utf-8")) % cnt_partitions
+                if first <= i < last:
+                    partitions[i - first].write(statement + " .\n")
+        finally:
+            for partition in partitions:
+                partition.close()
+
+    return paths, cnt_skipped
+
+
+def compute_changeset(old_path: str, new_path: str, partition_size: int = 64 * 1024 * 1024,
+                      tmp_dir: str = None, max_open_files: int = 256) -> Iterator[tuple]:
+    """
+    Computes the triples that were added to and removed from an N-Triples(-star) snapshot. Both snapshots are
+    hash partitioned on disk first, so that only one partition of each snapshot is held in memory at a time.
+    Triples with blank nodes are skipped as their labels are not comparable across snapshots.
+
+    :param old_path: The previous snapshot.
+    :param new_path: The current snapshot.
+    :param partition_size: The approximate size in bytes of a partition of the larger snapshot. The size of gzip
+    compressed snapshots is estimated from their compressed size.
+    :param tmp_dir: The directory for the partition files. Defaults to the system's temporary directory.
+    :param max_open_files: The maximum number of partition files that are open at the same time. A snapshot is read
+    once per :max_open_files partitions.
+    :return: One (partition number, number of partitions, added triples, removed triples, number of unchanged
+    triples, number of skipped triples) tuple per partition. The skipped triples of both snapshots are reported
+    with the first partition.
+    """
+
+    if max_open_files < 1:
+        raise ValueError("max_open_files must be at least 1.")
+
+    snapshot_size = max(_estimate_size(old_path), _estimate_size(new_path))
+    cnt_partitions = max(1, -(-snapshot_size // partition_size))
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+        os.mkdir(os.path.join(directory, "old"))
+        os.mkdir(os.path.join(directory, "new"))
+        old_partitions, cnt_skipped_old = _partition(old_path, os.path.join(directory, "old"), cnt_partitions,
+                                                     max_open_files)
+        new_partitions, cnt_skipped_new = _partition(new_path, os.path.join(directory, "new"), cnt_partitions,
+                                                     max_open_files)
+
+        for i, (old_partition, new_partition) in enumerate(zip(old_partitions, new_partitions)):
+            with open(old_partition, "r", encoding="utf-8") as old:
+                old_statements = set(old)
+            new_statements = set()
+            added = []
+            with open(new_partition, "r", encoding="utf-8") as new:
+                for statement in new:
+                    if statement not in new_statements:
+                        new_statements.add(statement)
+                        if statement not in old_statements:
+                            added.append(statement)
+            removed = old_statements - new_statements
+            yield (i, cnt_partitions, [parse_ntriples_line(s) for s in sorted(added)],
+                   [parse_ntriples_line(s) for s in sorted(removed)], len(new_statements) - len(added),
+                   cnt_skipped_old + cnt_skipped_new if i == 0 else 0)
+
+
+def ingest_changeset(engine: TripleStoreEngine, old_path: str, new_path: str, batch_size: int = 1000,
+                     timestamp: datetime = None, partition_size: int = 64 * 1024 * 1024,
+                     tmp_dir: str = None, max_open_files: int = 256) -> ChangesetResult:
+    """
+    Versions the changes between two N-Triples(-star) snapshots in the RDF store: Triples that were removed
+    are outdated and triples that were added are inserted with batched updates (see
+    TripleStoreEngine.outdate_triples_bulk and TripleStoreEngine.insert_triples_bulk). All changes share one
+    commit timestamp. The progress and throughput are logged per partition (see compute_changeset).
+
+    :param engine:
+    :param old_path: The previous snapshot, which must be the current version in the RDF store.
+    :param new_path: The current snapshot.
+    :param batch_size: The maximum number of triples per update request.
+    :param timestamp: The commit timestamp, which must include the timezone. Defaults to the current time.
+    :param partition_size: The approximate size in bytes of a partition of the larger snapshot.
+    :param tmp_dir: The directory for the partition files. Defaults to the system's temporary directory.
+    :param max_open_files: The maximum number of partition files that are open at the same time.
+    :return: The number of added, removed, unchanged and skipped triples, the duration and the throughput in
+    changed triples per second.
+    """
+
+    if timestamp is None:
+        current_datetime = datetime.now()
+        timezone_delta = tzlocal.get_localzone().dst(current_datetime).seconds
+        timestamp = datetime.now(timezone(timedelta(seconds=timezone_delta)))
+
+    cnt_added, cnt_removed, cnt_unchanged, cnt_skipped = 0, 0, 0, 0
+    start_time = time.perf_counter()
+    for i, cnt_partitions, added, removed, cnt_partition_unchanged, cnt_partition_skipped \
+            in compute_changeset(old_path, new_path, partition_size, tmp_dir, max_open_files):
+        if removed:
+            engine.outdate_triples_bulk(removed, batch_size=batch_size, timestamp=timestamp)
+        if added:
+            engine.insert_triples_bulk([list(triple) for triple in added], batch_size=batch_size,
+                                       timestamp=timestamp)
+        cnt_added += len(added)
+        cnt_removed += len(removed)
+        cnt_unchanged += cnt_partition_unchanged
+        cnt_skipped += cnt_partition_skipped
+        seconds = time.perf_counter() - start_time
+        logging.info("Partition {0}/{1}: {2} added, {3} removed, {4} unchanged triples in total; "
+                     "{5:.0f} changed triples per second".format(i + 1, cnt_partitions, cnt_added, cnt_removed,
+                                                                 cnt_unchanged, (cnt_added + cnt_removed) / seconds))
+
+    if cnt_skipped:
+        logging.warning("{0} triples with blank nodes were skipped".format(cnt_skipped))
+    seconds = time.perf_counter() - start_time
+    return ChangesetResult(cnt_added, cnt_removed, cnt_unchanged, cnt_skipped, seconds,
+                           (cnt_added + cnt_removed) / seconds if seconds else 0)
@@ -4,7 +4,8 @@ orig_query CHAR (4000),
 query_prefixes CHAR (4000),
 last_execution_pid CHAR (4000),
 normal_query_algebra CHAR (4000),
-normal_query CHAR (4000)
+normal_query CHAR (4000),
+timestamp_template CHAR (4000)
 
 );
 
@@ -13,6 +14,8 @@ query_pid CHAR (500) PRIMARY KEY,
 query_checksum CHAR (200),
 timestamped_query CHAR (4000),
 result_set_checksum CHAR (200),
+result_set_checksum_algorithm CHAR (200) default 'pandas-row-hash-v1',
+result_set_block_checksums CHAR (4000),
 result_set_description CHAR (4000),
 result_set_sort_order CHAR (4000),
 execution_timestamp DATETIME,
@@ -3,24 +3,40 @@ from .prefixes import split_prefixes_query, versioning_prefixes
 from ._exceptions import MultipleSortIndexesError, NoUniqueSortIndexError, \
     ExpressionNotCoveredException, InputMissing
 from rdflib.plugins.sparql.parserutils import CompValue, Expr
-from rdflib.term import Variable, Identifier, URIRef
+from rdflib.plugins.sparql.sparql import Prologue
+from rdflib.term import Variable, Identifier, URIRef, BNode, Literal
 from rdflib.paths import SequencePath, Path, NegatedPath, AlternativePath, InvPath, MulPath, ZeroOrOne, \
     ZeroOrMore, OneOrMore
 import rdflib.plugins.sparql.parser as parser
 import rdflib.plugins.sparql.algebra as algebra
 import rdflib.plugins.sparql.parser
 from rdflib.plugins.sparql.operators import TrueFilter, UnaryNot, Builtin_BOUND
+from types import MethodType
+from typing import Union, Iterable, Iterator, Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import pandas as pd
-from pandas.util import hash_pandas_object
+from pandas.util import hash_pandas_object, hash_array
 import hashlib
 import datetime
 import json
 import numpy as np
 from datetime import datetime, timedelta, timezone
 import tzlocal
-import os
 import logging
 import collections
+import threading
+import functools
+import itertools
+import copyreg
+import pickle
+import io
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
 
 
 def _query_algebra(query: str, sparql_prefixes: str) -> rdflib.plugins.sparql.algebra.Query:
@@ -64,7 +80,46 @@ def _pprint_query(query: str):
             f = print(e, end='')
 
 
-def _order_by_variables(query: str, prefixes: str) -> dict:
+def _copy_algebra(node, memo: dict = None):
+    """
+    Copies a query tree or any of its nodes. CompValues, Exprs and containers are copied whereas RDF terms
+    and paths are immutable and thus, shared with the original tree. copy.deepcopy cannot be used because
+    CompValue requires a name on instantiation and Expr binds its evaluation function to itself.
+
+    :param node: An algebra node, e.g. query_algebra.algebra
+    :param memo: Copies of nodes that were already visited. Keeps nodes that are referenced multiple times
+    within the tree shared in the copy.
+    :return: The copied node
+    """
+
+    if memo is None:
+        memo = {}
+    if id(node) in memo:
+        return memo[id(node)]
+
+    if isinstance(node, CompValue):
+        node_copy = node.__class__.__new__(node.__class__)
+        collections.OrderedDict.__init__(node_copy)
+        node_copy.__dict__.update(node.__dict__)
+        if isinstance(node, Expr) and node._evalfn is not None:
+            node_copy._evalfn = MethodType(node._evalfn.__func__, node_copy)
+        memo[id(node)] = node_copy
+        for k, v in node.items():
+            collections.OrderedDict.__setitem__(node_copy, k, _copy_algebra(v, memo))
+    elif isinstance(node, (list, set)):
+        node_copy = node.__class__(_copy_algebra(v, memo) for v in node)
+        memo[id(node)] = node_copy
+    elif isinstance(node, tuple):
+        node_copy = tuple(_copy_algebra(v, memo) for v in node)
+        memo[id(node)] = node_copy
+    else:
+        node_copy = node
+
+    return node_copy
+
+
+def _order_by_variables(query: str, prefixes: str, query_algebra: rdflib.plugins.sparql.algebra.Query = None) \
+        -> dict:
     """
     The query must be a valid query including prefixes.
     The query algebra is searched for "PV". There can be more than one PV-Nodes containing the select-clause
@@ -73,10 +128,13 @@ def _order_by_variables(query: str, prefixes: str) -> dict:
 
     :param query: The select statement.
     :param prefixes: The query prefixes or prologue.
+    :param query_algebra: The query tree of :query. If it is provided the query will not be parsed again.
+    The tree is altered by the traversal, so pass a copy if the tree is used afterwards.
     :return: a list of variables used in the query
     """
 
-    query_algebra = _query_algebra(query, prefixes)
+    if query_algebra is None:
+        query_algebra = _query_algebra(query, prefixes)
     order_by_variables = {}
 
     def retrieve_order_by_variables(node):
@@ -98,42 +156,52 @@ def _order_by_variables(query: str, prefixes: str) -> dict:
     return order_by_variables
 
 
+_UNARY_FUNCTIONS = {
+    # 17.4.2 Functions on RDF Terms
+    'Builtin_isIRI': 'isIRI', 'Builtin_isBLANK': 'isBLANK', 'Builtin_isLITERAL': 'isLITERAL',
+    'Builtin_isNUMERIC': 'isNUMERIC', 'Builtin_STR': 'STR', 'Builtin_LANG': 'LANG', 'Builtin_DATATYPE': 'DATATYPE',
+    'Builtin_IRI': 'IRI', 'Builtin_BNODE': 'BNODE',
+    # 17.4.3 Functions on Strings
+    'Builtin_STRLEN': 'STRLEN', 'Builtin_UCASE': 'UCASE', 'Builtin_LCASE': 'LCASE',
+    'Builtin_ENCODE_FOR_URI': 'ENCODE_FOR_URI',
+    # 17.4.4 Functions on Numerics
+    'Builtin_ABS': 'ABS', 'Builtin_ROUND': 'ROUND', 'Builtin_CEIL': 'CEIL', 'Builtin_FLOOR': 'FLOOR',
+    # 17.4.5 Functions on Dates and Times
+    'Builtin_YEAR': 'YEAR', 'Builtin_MONTH': 'MONTH', 'Builtin_DAY': 'DAY', 'Builtin_HOURS': 'HOURS',
+    'Builtin_MINUTES': 'MINUTES', 'Builtin_SECONDS': 'SECONDS', 'Builtin_TIMEZONE': 'TIMEZONE', 'Builtin_TZ': 'TZ',
+    # 17.4.6 Hash functions
+    'Builtin_MD5': 'MD5', 'Builtin_SHA1': 'SHA1', 'Builtin_SHA256': 'SHA256', 'Builtin_SHA384': 'SHA384',
+    'Builtin_SHA512': 'SHA512'
+}
+
+_BINARY_FUNCTIONS = {
+    'Builtin_sameTerm': 'SAMETERM', 'Builtin_STRDT': 'STRDT', 'Builtin_STRLANG': 'STRLANG',
+    'Builtin_STRSTARTS': 'STRSTARTS', 'Builtin_STRENDS': 'STRENDS', 'Builtin_CONTAINS': 'CONTAINS',
+    'Builtin_STRBEFORE': 'STRBEFORE', 'Builtin_STRAFTER': 'STRAFTER', 'Builtin_LANGMATCHES': 'LANGMATCHES'
+}
+
+_NULLARY_FUNCTIONS = {
+    'Builtin_UUID': 'UUID()', 'Builtin_STRUUID': 'STRUUID()', 'Builtin_RAND': 'RAND()', 'Builtin_NOW': 'NOW()'
+}
+
+
 def _translate_algebra(query_algebra: rdflib.plugins.sparql.sparql.Query = None) -> str:
     """
+    Serializes the query algebra into a query string in a single bottom-up traversal. Every node appends its text
+    to one output buffer, thus, the translation runs in linear time in the size of the query. Text that depends on
+    nodes further down in the tree, such as the select clause of a (sub-)select, is kept in a slot of the buffer
+    and filled in once the nodes below have been serialized. All state is local to the call.
 
     :param query_algebra: An algebra returned by the function call algebra.translateQuery(parse_tree)
     from the rdflib library.
     :return: The query form of the algebra.
     """
 
-    def overwrite(text):
-        file = open("query.txt", "w+")
-        file.write(text)
-        file.close()
-
-    def replace(old, new, search_from_match: str = None, search_from_match_occurrence: int = None, count: int = 1):
-        # Read in the file
-        with open('query.txt', 'r') as file:
-            query = file.read()
-
-        def find_nth(haystack, needle, n):
-            start = haystack.lower().find(needle)
-            while start >= 0 and n > 1:
-                start = haystack.lower().find(needle, start + len(needle))
-                n -= 1
-            return start
-
-        if search_from_match and search_from_match_occurrence:
-            position = find_nth(query, search_from_match, search_from_match_occurrence)
-            query_pre = query[:position]
-            query_post = query[position:].replace(old, new, count)
-            query = query_pre + query_post
-        else:
-            query = query.replace(old, new, count)
-
-        # Write the file out again
-        with open('query.txt', 'w') as file:
-            file.write(query)
+    aggr_vars = collections.defaultdict(list)
+    # The select clause texts of the (sub-)selects that enclose the current node. The inner most select is the
+    # last one in the list.
+    select_scopes = []
+    expr_masks = []
 
     def convert_node_arg(node_arg):
         if isinstance(node_arg, Identifier):
@@ -143,390 +211,351 @@ def _translate_algebra(query_algebra: rdflib.plugins.sparql.sparql.Query = None)
             else:
                 return node_arg.n3()
         elif isinstance(node_arg, CompValue):
-            return "{" + node_arg.name + "}"
-        elif isinstance(node_arg, Expr):
-            return "{" + node_arg.name + "}"
+            return node_text(node_arg)
         elif isinstance(node_arg, str):
             return node_arg
         else:
             raise ExpressionNotCoveredException(
                 "The expression {0} might not be covered yet.".format(node_arg))
 
-    aggr_vars = collections.defaultdict(list)
+    def node_text(node) -> str:
+        out = []
+        serialize(node, out)
+        return "".join(out)
+
+    def triples_text(triples) -> str:
+        # Identifiers or Paths
+        # Negated path throws a type error. Probably n3() method of negated paths should be fixed
+        return "".join(triple[0].n3() + " " + triple[1].n3() + " " + triple[2].n3() + "." for triple in triples)
+
+    def replace_in_select_clauses(old: str, new: str, scopes: list):
+        """
+        Replaces the first occurrence of :old within the select clause texts of :scopes. The texts are searched
+        in the order in which they appear in the query text: first the projections from the outer most to the
+        inner most select and then the order by and having texts from the inner most to the outer most select.
+        """
+
+        fields = [(scope, 'projection') for scope in scopes]
+        for scope in reversed(scopes):
+            fields.extend([(scope, 'order_by'), (scope, 'having')])
+        for scope, field in fields:
+            if scope[field] is None:
+                continue
+            position = scope[field].find(old)
+            if position > -1:
+                scope[field] = scope[field][:position] + new + scope[field][position + len(old):]
+                return
 
-    def sparql_query_text(node):
+    def serialize(node, out: list):
         """
          https://www.w3.org/TR/sparql11-query/#sparqlSyntax
 
         :param node:
+        :param out: The buffer to which the text of the node is appended.
         :return:
         """
 
-        if isinstance(node, CompValue):
-            # 18.2 Query Forms
-            if node.name == "SelectQuery":
-                overwrite("-*-SELECT-*- " + "{" + node.p.name + "}")
-
-            # 18.2 Graph Patterns
-            elif node.name == "BGP":
-                # Identifiers or Paths
-                # Negated path throws a type error. Probably n3() method of negated paths should be fixed
-                triples = "".join(triple[0].n3() + " " + triple[1].n3() + " " + triple[2].n3() + "."
-                                  for triple in node.triples)
-                replace("{BGP}", triples)
-                # The dummy -*-SELECT-*- is placed during a SelectQuery or Multiset pattern in order to be able
-                # to match extended variables in a specific Select-clause (see "Extend" below)
-                replace("-*-SELECT-*-", "SELECT", count=-1)
-                # If there is no "Group By" clause the placeholder will simply be deleted. Otherwise there will be
-                # no matching {GroupBy} placeholder because it has already been replaced by "group by variables"
-                replace("{GroupBy}", "", count=-1)
-                replace("{Having}", "", count=-1)
-            elif node.name == "Join":
-                replace("{Join}", "{" + node.p1.name + "}{" + node.p2.name + "}")  #
-            elif node.name == "LeftJoin":
-                replace("{LeftJoin}", "{" + node.p1.name + "}OPTIONAL{{" + node.p2.name + "}}")
-            elif node.name == "Filter":
-                if isinstance(node.expr, CompValue):
-                    expr = node.expr.name
-                else:
-                    raise ExpressionNotCoveredException("This expression might not be covered yet.")
-                if node.p:
-                    # Filter with p=AggregateJoin = Having
-                    if node.p.name == "AggregateJoin":
-                        replace("{Filter}", "{" + node.p.name + "}")
-                        replace("{Having}", "HAVING({" + expr + "})")
-                    else:
-                        replace("{Filter}", "FILTER({" + expr + "}) {" + node.p.name + "}")
-                else:
-                    replace("{Filter}", "FILTER({" + expr + "})")
-
-            elif node.name == "Union":
-                replace("{Union}", "{{" + node.p1.name + "}}UNION{{" + node.p2.name + "}}")
-            elif node.name == "Graph":
-                expr = "GRAPH " + node.term.n3() + " {{" + node.p.name + "}}"
-                replace("{Graph}", expr)
-            elif node.name == "Extend":
-                query_string = open('query.txt', 'r').read().lower()
-                select_occurrences = query_string.count('-*-select-*-')
-                replace(node.var.n3(), "(" + convert_node_arg(node.expr) + " as " + node.var.n3() + ")",
-                        search_from_match='-*-select-*-', search_from_match_occurrence=select_occurrences)
-                replace("{Extend}", "{" + node.p.name + "}")
-            elif node.name == "Minus":
-                expr = "{" + node.p1.name + "}MINUS{{" + node.p2.name + "}}"
-                replace("{Minus}", expr)
-            elif node.name == "Group":
-                group_by_vars = []
-                if node.expr:
-                    for var in node.expr:
-                        if isinstance(var, Identifier):
-                            group_by_vars.append(var.n3())
-                        else:
-                            raise ExpressionNotCoveredException("This expression might not be covered yet.")
-                    replace("{Group}", "{" + node.p.name + "}")
-                    replace("{GroupBy}", "GROUP BY " + " ".join(group_by_vars) + " ")
-                else:
-                    replace("{Group}", "{" + node.p.name + "}")
-            elif node.name == "AggregateJoin":
-                replace("{AggregateJoin}", "{" + node.p.name + "}")
-                for agg_func in node.A:
-                    if isinstance(agg_func.res, Identifier):
-                        identifier = agg_func.res.n3()
-                    else:
-                        raise ExpressionNotCoveredException("This expression might not be covered yet.")
-
-                    aggr_vars[agg_func.res].append(agg_func.vars)
-                    agg_func_name = agg_func.name.split('_')[1]
-                    distinct = ""
-                    if agg_func.distinct:
-                        distinct = agg_func.distinct + " "
-                    if agg_func_name == 'GroupConcat':
-                        replace(identifier, "GROUP_CONCAT" + "(" + distinct
-                                + agg_func.vars.n3() + ";SEPARATOR=" + agg_func.separator.n3() + ")")
-                    else:
-                        replace(identifier, agg_func_name.upper() + "(" + distinct
-                                + convert_node_arg(agg_func.vars) + ")")
-
-                    # For non-aggregated variables the aggregation function "sample" is automatically assigned.
-                    # However, we do not want to have "sample" wrapped around non-aggregated variables. That is
-                    # why we replace it. If "sample" is used on purpose it will not be replaced as the alias
-                    # must be different from the variable in this case.
-                    replace("(SAMPLE({0}) as {0})".format(convert_node_arg(agg_func.vars)),
-                            convert_node_arg(agg_func.vars))
-            elif node.name == "GroupGraphPatternSub":
-                replace("GroupGraphPatternSub", " ".join([convert_node_arg(pattern) for pattern in node.part]))
-            elif node.name == "TriplesBlock":
-                replace("{TriplesBlock}", "".join(triple[0].n3() + " " + triple[1].n3() + " " + triple[2].n3() + "."
-                                                  for triple in node.triples))
-
-            # 18.2 Solution modifiers
-            elif node.name == "ToList":
+        if not isinstance(node, CompValue):
+            out.append(convert_node_arg(node))
+            return
+
+        # 18.2 Query Forms
+        if node.name == "SelectQuery":
+            out.append("SELECT ")
+            serialize(node.p, out)
+
+        # 18.2 Graph Patterns
+        elif node.name == "BGP":
+            out.append(triples_text(node.triples))
+        elif node.name == "Join":
+            serialize(node.p1, out)
+            serialize(node.p2, out)
+        elif node.name == "LeftJoin":
+            serialize(node.p1, out)
+            out.append("OPTIONAL{")
+            serialize(node.p2, out)
+            out.append("}")
+        elif node.name == "Filter":
+            if not isinstance(node.expr, CompValue):
                 raise ExpressionNotCoveredException("This expression might not be covered yet.")
-            elif node.name == "OrderBy":
-                order_conditions = []
-                for c in node.expr:
-                    if isinstance(c.expr, Identifier):
-                        var = c.expr.n3()
-                        if c.order is not None:
-                            cond = c.order + "(" + var + ")"
-                        else:
-                            cond = var
-                        order_conditions.append(cond)
-                    else:
-                        raise ExpressionNotCoveredException("This expression might not be covered yet.")
-                replace("{OrderBy}", "{" + node.p.name + "}")
-                replace("{OrderConditions}", " ".join(order_conditions) + " ")
-            elif node.name == "Project":
-                project_variables = []
-                for var in node.PV:
+            if node.p:
+                # Filter with p=AggregateJoin = Having
+                if node.p.name == "AggregateJoin":
+                    select_scopes[-1]['having'] = "HAVING(" + node_text(node.expr) + ")"
+                    serialize(node.p, out)
+                else:
+                    out.append("FILTER(" + node_text(node.expr) + ") ")
+                    serialize(node.p, out)
+            else:
+                out.append("FILTER(" + node_text(node.expr) + ")")
+        elif node.name == "Union":
+            out.append("{")
+            serialize(node.p1, out)
+            out.append("}UNION{")
+            serialize(node.p2, out)
+            out.append("}")
+        elif node.name == "Graph":
+            out.append("GRAPH " + node.term.n3() + " {")
+            serialize(node.p, out)
+            out.append("}")
+        elif node.name == "Extend":
+            # The alias replaces the first occurrence of the variable in the select clause. Complex expressions are
+            # masked until the nodes below have been serialized.
+            var = node.var.n3()
+            if isinstance(node.expr, CompValue):
+                mask = "\x01{0}\x01".format(len(expr_masks))
+                expr_masks.append(mask)
+                replace_in_select_clauses(var, "(" + mask + " as " + var + ")", select_scopes[-1:])
+                serialize(node.p, out)
+                replace_in_select_clauses(mask, convert_node_arg(node.expr), select_scopes)
+            else:
+                replace_in_select_clauses(var, "(" + convert_node_arg(node.expr) + " as " + var + ")",
+                                          select_scopes[-1:])
+                serialize(node.p, out)
+        elif node.name == "Minus":
+            serialize(node.p1, out)
+            out.append("MINUS{")
+            serialize(node.p2, out)
+            out.append("}")
+        elif node.name == "Group":
+            group_by_vars = []
+            if node.expr:
+                for var in node.expr:
                     if isinstance(var, Identifier):
-                        project_variables.append(var.n3())
+                        group_by_vars.append(var.n3())
                     else:
                         raise ExpressionNotCoveredException("This expression might not be covered yet.")
-                order_by_pattern = ""
-                if node.p.name == "OrderBy":
-                    order_by_pattern = "ORDER BY {OrderConditions}"
-                replace("{Project}", " ".join(project_variables) + "{{" + node.p.name + "}}"
-                        + "{GroupBy}" + order_by_pattern + "{Having}")
-            elif node.name == "Distinct":
-                replace("{Distinct}", "DISTINCT {" + node.p.name + "}")
-            elif node.name == "Reduced":
-                replace("{Reduced}", "REDUCED {" + node.p.name + "}")
-            elif node.name == "Slice":
-                slice = "OFFSET " + str(node.start) + " LIMIT " + str(node.length)
-                replace("{Slice}", "{" + node.p.name + "}" + slice)
-            elif node.name == "ToMultiSet":
-                if node.p.name == "values":
-                    replace("{ToMultiSet}", "{{" + node.p.name + "}}")
+                select_scopes[-1]['group_by'] = "GROUP BY " + " ".join(group_by_vars) + " "
+            serialize(node.p, out)
+        elif node.name == "AggregateJoin":
+            for agg_func in node.A:
+                if isinstance(agg_func.res, Identifier):
+                    identifier = agg_func.res.n3()
                 else:
-                    replace("{ToMultiSet}", "{-*-SELECT-*- " + "{" + node.p.name + "}" + "}")
-
-            # 18.2 Property Path
+                    raise ExpressionNotCoveredException("This expression might not be covered yet.")
 
-            # 17 Expressions and Testing Values
-            # # 17.3 Operator Mapping
-            elif node.name == "RelationalExpression":
-                expr = convert_node_arg(node.expr)
-                op = node.op
-                if isinstance(list, type(node.other)):
-                    other = "(" + ", ".join(convert_node_arg(expr) for expr in node.other) + ")"
+                aggr_vars[agg_func.res].append(agg_func.vars)
+                agg_func_name = agg_func.name.split('_')[1]
+                distinct = ""
+                if agg_func.distinct:
+                    distinct = agg_func.distinct + " "
+                if agg_func_name == 'GroupConcat':
+                    replace_in_select_clauses(identifier, "GROUP_CONCAT" + "(" + distinct + agg_func.vars.n3()
+                                              + ";SEPARATOR=" + agg_func.separator.n3() + ")", select_scopes)
                 else:
-                    other = convert_node_arg(node.other)
-                condition = "{left} {operator} {right}".format(left=expr, operator=op, right=other)
-                replace("{RelationalExpression}", condition)
-            elif node.name == "ConditionalAndExpression":
-                inner_nodes = " && ".join([convert_node_arg(expr) for expr in node.other])
-                replace("{ConditionalAndExpression}", convert_node_arg(node.expr) + " && " + inner_nodes)
-            elif node.name == "ConditionalOrExpression":
-                inner_nodes = " || ".join([convert_node_arg(expr) for expr in node.other])
-                replace("{ConditionalOrExpression}", "(" + convert_node_arg(node.expr) + " || " + inner_nodes + ")")
-            elif node.name == "MultiplicativeExpression":
-                left_side = convert_node_arg(node.expr)
-                multiplication = left_side
-                for i, operator in enumerate(node.op):
-                    multiplication += operator + " " + convert_node_arg(node.other[i]) + " "
-                replace("{MultiplicativeExpression}", multiplication)
-            elif node.name == "AdditiveExpression":
-                left_side = convert_node_arg(node.expr)
-                addition = left_side
-                for i, operator in enumerate(node.op):
-                    addition += operator + " " + convert_node_arg(node.other[i]) + " "
-                replace("{AdditiveExpression}", addition)
-            elif node.name == "UnaryNot":
-                replace("{UnaryNot}", "!" + convert_node_arg(node.expr))
-
-            # # 17.4 Function Definitions
-            # # # 17.4.1 Functional Forms
-            elif node.name.endswith('BOUND'):
-                bound_var = convert_node_arg(node.arg)
-                replace("{Builtin_BOUND}", "bound(" + bound_var + ")")
-            elif node.name.endswith('IF'):
-                arg2 = convert_node_arg(node.arg2)
-                arg3 = convert_node_arg(node.arg3)
-
-                if_expression = "IF(" + "{" + node.arg1.name + "}, " + arg2 + ", " + arg3 + ")"
-                replace("{Builtin_IF}", if_expression)
-            elif node.name.endswith('COALESCE'):
-                replace("{Builtin_COALESCE}", "COALESCE(" + ", ".join(convert_node_arg(arg) for arg in node.arg) + ")")
-            elif node.name.endswith('Builtin_EXISTS'):
-                # The node's name which we get with node.graph.name returns "Join" instead of GroupGraphPatternSub
-                # According to https://www.w3.org/TR/2013/REC-sparql11-query-20130321/#rExistsFunc
-                # ExistsFunc can only have a GroupGraphPattern as parameter. However, when we print the query algebra
-                # we get a GroupGraphPatternSub
-                replace("{Builtin_EXISTS}", "EXISTS " + "{{" + node.graph.name + "}}")
-                algebra.traverse(node.graph, visitPre=sparql_query_text)
-                return node.graph
-            elif node.name.endswith('Builtin_NOTEXISTS'):
-                # The node's name which we get with node.graph.name returns "Join" instead of GroupGraphPatternSub
-                # According to https://www.w3.org/TR/2013/REC-sparql11-query-20130321/#rNotExistsFunc
-                # NotExistsFunc can only have a GroupGraphPattern as parameter. However, when we print the query algebra
-                # we get a GroupGraphPatternSub
-                replace("{Builtin_NOTEXISTS}", "NOT EXISTS " + "{{" + node.graph.name + "}}")
-                algebra.traverse(node.graph, visitPre=sparql_query_text)
-                return node.graph
-            # # # # 17.4.1.5 logical-or: Covered in "RelationalExpression"
-            # # # # 17.4.1.6 logical-and: Covered in "RelationalExpression"
-            # # # # 17.4.1.7 RDFterm-equal: Covered in "RelationalExpression"
-            elif node.name.endswith('sameTerm'):
-                replace("{Builtin_sameTerm}", "SAMETERM(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            # # # # IN: Covered in "RelationalExpression"
-            # # # # NOT IN: Covered in "RelationalExpression"
-
-            # # # 17.4.2 Functions on RDF Terms
-            elif node.name.endswith('Builtin_isIRI'):
-                replace("{Builtin_isIRI}", "isIRI(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_isBLANK'):
-                replace("{Builtin_isBLANK}", "isBLANK(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_isLITERAL'):
-                replace("{Builtin_isLITERAL}", "isLITERAL(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_isNUMERIC'):
-                replace("{Builtin_isNUMERIC}", "isNUMERIC(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_STR'):
-                replace("{Builtin_STR}", "STR(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_LANG'):
-                replace("{Builtin_LANG}", "LANG(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_DATATYPE'):
-                replace("{Builtin_DATATYPE}", "DATATYPE(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_IRI'):
-                replace("{Builtin_IRI}", "IRI(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_BNODE'):
-                replace("{Builtin_BNODE}", "BNODE(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('STRDT'):
-                replace("{Builtin_STRDT}", "STRDT(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_STRLANG'):
-                replace("{Builtin_STRLANG}", "STRLANG(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_UUID'):
-                replace("{Builtin_UUID}", "UUID()")
-            elif node.name.endswith('Builtin_STRUUID'):
-                replace("{Builtin_STRUUID}", "STRUUID()")
-
-            # # # 17.4.3 Functions on Strings
-            elif node.name.endswith('Builtin_STRLEN'):
-                replace("{Builtin_STRLEN}", "STRLEN(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_SUBSTR'):
-                args = [convert_node_arg(node.arg), node.start]
-                if node.length:
-                    args.append(node.length)
-                expr = "SUBSTR(" + ", ".join(args) + ")"
-                replace("{Builtin_SUBSTR}", expr)
-            elif node.name.endswith('Builtin_UCASE'):
-                replace("{Builtin_UCASE}", "UCASE(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_LCASE'):
-                replace("{Builtin_LCASE}", "LCASE(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_STRSTARTS'):
-                replace("{Builtin_STRSTARTS}", "STRSTARTS(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_STRENDS'):
-                replace("{Builtin_STRENDS}", "STRENDS(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_CONTAINS'):
-                replace("{Builtin_CONTAINS}", "CONTAINS(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_STRBEFORE'):
-                replace("{Builtin_STRBEFORE}", "STRBEFORE(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_STRAFTER'):
-                replace("{Builtin_STRAFTER}", "STRAFTER(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('Builtin_ENCODE_FOR_URI'):
-                replace("{Builtin_ENCODE_FOR_URI}", "ENCODE_FOR_URI(" + convert_node_arg(node.arg) + ")")
-            elif node.name.endswith('Builtin_CONCAT'):
-                expr = 'CONCAT({vars})'.format(vars=", ".join(convert_node_arg(elem) for elem in node.arg))
-                replace("{Builtin_CONCAT}", expr)
-            elif node.name.endswith('Builtin_LANGMATCHES'):
-                replace("{Builtin_LANGMATCHES}", "LANGMATCHES(" + convert_node_arg(node.arg1)
-                        + ", " + convert_node_arg(node.arg2) + ")")
-            elif node.name.endswith('REGEX'):
-                args = [convert_node_arg(node.text), convert_node_arg(node.pattern)]
-                expr = "REGEX(" + ", ".join(args) + ")"
-                replace("{Builtin_REGEX}", expr)
-            elif node.name.endswith('REPLACE'):
-                replace("{Builtin_REPLACE}", "REPLACE(" + convert_node_arg(node.arg)
-                        + ", " + convert_node_arg(node.pattern) + ", " + convert_node_arg(node.replacement) + ")")
-
-            # # # 17.4.4 Functions on Numerics
-            elif node.name == 'Builtin_ABS':
-                replace("{Builtin_ABS}", "ABS(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_ROUND':
-                replace("{Builtin_ROUND}", "ROUND(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_CEIL':
-                replace("{Builtin_CEIL}", "CEIL(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_FLOOR':
-                replace("{Builtin_FLOOR}", "FLOOR(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_RAND':
-                replace("{Builtin_RAND}", "RAND()")
-
-            # # # 17.4.5 Functions on Dates and Times
-            elif node.name == 'Builtin_NOW':
-                replace("{Builtin_NOW}", "NOW()")
-            elif node.name == 'Builtin_YEAR':
-                replace("{Builtin_YEAR}", "YEAR(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_MONTH':
-                replace("{Builtin_MONTH}", "MONTH(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_DAY':
-                replace("{Builtin_DAY}", "DAY(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_HOURS':
-                replace("{Builtin_HOURS}", "HOURS(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_MINUTES':
-                replace("{Builtin_MINUTES}", "MINUTES(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_SECONDS':
-                replace("{Builtin_SECONDS}", "SECONDS(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_TIMEZONE':
-                replace("{Builtin_TIMEZONE}", "TIMEZONE(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_TZ':
-                replace("{Builtin_TZ}", "TZ(" + convert_node_arg(node.arg) + ")")
-
-            # # # 17.4.6 Hash functions
-            elif node.name == 'Builtin_MD5':
-                replace("{Builtin_MD5}", "MD5(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_SHA1':
-                replace("{Builtin_SHA1}", "SHA1(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_SHA256':
-                replace("{Builtin_SHA256}", "SHA256(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_SHA384':
-                replace("{Builtin_SHA384}", "SHA384(" + convert_node_arg(node.arg) + ")")
-            elif node.name == 'Builtin_SHA512':
-                replace("{Builtin_SHA512}", "SHA512(" + convert_node_arg(node.arg) + ")")
-
-            # Other
-            elif node.name == 'values':
-                columns = []
-                for key in node.res[0].keys():
-                    if isinstance(key, Identifier):
-                        columns.append(key.n3())
+                    replace_in_select_clauses(identifier, agg_func_name.upper() + "(" + distinct
+                                              + convert_node_arg(agg_func.vars) + ")", select_scopes)
+
+                # For non-aggregated variables the aggregation function "sample" is automatically assigned.
+                # However, we do not want to have "sample" wrapped around non-aggregated variables. That is
+                # why we replace it. If "sample" is used on purpose it will not be replaced as the alias
+                # must be different from the variable in this case.
+                replace_in_select_clauses("(SAMPLE({0}) as {0})".format(convert_node_arg(agg_func.vars)),
+                                          convert_node_arg(agg_func.vars), select_scopes)
+            serialize(node.p, out)
+        elif node.name == "GroupGraphPatternSub":
+            out.append("{" + " ".join([convert_node_arg(pattern) for pattern in node.part]) + "}")
+        elif node.name == "TriplesBlock":
+            out.append(triples_text(node.triples))
+
+        # 18.2 Solution modifiers
+        elif node.name == "ToList":
+            raise ExpressionNotCoveredException("This expression might not be covered yet.")
+        elif node.name == "OrderBy":
+            order_conditions = []
+            for c in node.expr:
+                if isinstance(c.expr, Identifier):
+                    var = c.expr.n3()
+                    if c.order is not None:
+                        cond = c.order + "(" + var + ")"
                     else:
-                        raise ExpressionNotCoveredException("The expression {0} might not be covered yet.".format(key))
-                values = "VALUES (" + " ".join(columns) + ")"
-
-                rows = ""
-                for elem in node.res:
-                    row = []
-                    for term in elem.values():
-                        if isinstance(term, Identifier):
-                            row.append(term.n3())  # n3() is not part of Identifier class but every subclass has it
-                        elif isinstance(term, str):
-                            row.append(term)
-                        else:
-                            raise ExpressionNotCoveredException(
-                                "The expression {0} might not be covered yet.".format(term))
-                    rows += "(" + " ".join(row) + ")"
+                        cond = var
+                    order_conditions.append(cond)
+                else:
+                    raise ExpressionNotCoveredException("This expression might not be covered yet.")
+            if select_scopes[-1]['order_by'] is not None:
+                select_scopes[-1]['order_by'] = "ORDER BY " + " ".join(order_conditions) + " "
+            serialize(node.p, out)
+        elif node.name == "Project":
+            project_variables = []
+            for var in node.PV:
+                if isinstance(var, Identifier):
+                    project_variables.append(var.n3())
+                else:
+                    raise ExpressionNotCoveredException("This expression might not be covered yet.")
+            # The select clause is completed by the nodes below. Only an OrderBy node directly below
+            # adds an order by clause.
+            scope = {'projection': " ".join(project_variables), 'group_by': "", 'having': "",
+                     'order_by': "" if node.p.name == "OrderBy" else None}
+            select_scopes.append(scope)
+            select_clause_slot = len(out)
+            out.append(None)
+            out.append("{")
+            serialize(node.p, out)
+            out.append("}")
+            select_scopes.pop()
+            out[select_clause_slot] = scope['projection']
+            out.append(scope['group_by'] + (scope['order_by'] or "") + scope['having'])
+        elif node.name == "Distinct":
+            out.append("DISTINCT ")
+            serialize(node.p, out)
+        elif node.name == "Reduced":
+            out.append("REDUCED ")
+            serialize(node.p, out)
+        elif node.name == "Slice":
+            serialize(node.p, out)
+            out.append("OFFSET " + str(node.start) + " LIMIT " + str(node.length))
+        elif node.name == "ToMultiSet":
+            if node.p.name == "values":
+                out.append("{")
+                serialize(node.p, out)
+                out.append("}")
+            else:
+                out.append("{SELECT ")
+                serialize(node.p, out)
+                out.append("}")
+
+        # 17 Expressions and Testing Values
+        # # 17.3 Operator Mapping
+        elif node.name == "RelationalExpression":
+            expr = convert_node_arg(node.expr)
+            other = convert_node_arg(node.other)
+            out.append("{left} {operator} {right}".format(left=expr, operator=node.op, right=other))
+        elif node.name == "ConditionalAndExpression":
+            inner_nodes = " && ".join([convert_node_arg(expr) for expr in node.other])
+            out.append(convert_node_arg(node.expr) + " && " + inner_nodes)
+        elif node.name == "ConditionalOrExpression":
+            inner_nodes = " || ".join([convert_node_arg(expr) for expr in node.other])
+            out.append("(" + convert_node_arg(node.expr) + " || " + inner_nodes + ")")
+        elif node.name in ("MultiplicativeExpression", "AdditiveExpression"):
+            out.append(convert_node_arg(node.expr))
+            for i, operator in enumerate(node.op):
+                out.append(operator + " " + convert_node_arg(node.other[i]) + " ")
+        elif node.name == "UnaryNot":
+            out.append("!" + convert_node_arg(node.expr))
+
+        # # 17.4 Function Definitions
+        # # # 17.4.1 Functional Forms
+        elif node.name == "Builtin_BOUND":
+            out.append("bound(" + convert_node_arg(node.arg) + ")")
+        elif node.name == "Builtin_IF":
+            out.append("IF(" + convert_node_arg(node.arg1) + ", " + convert_node_arg(node.arg2) + ", "
+                       + convert_node_arg(node.arg3) + ")")
+        elif node.name == "Builtin_COALESCE":
+            out.append("COALESCE(" + ", ".join(convert_node_arg(arg) for arg in node.arg) + ")")
+        elif node.name in ("Builtin_EXISTS", "Builtin_NOTEXISTS"):
+            # The node's name which we get with node.graph.name returns "Join" instead of GroupGraphPatternSub
+            # According to https://www.w3.org/TR/2013/REC-sparql11-query-20130321/#rExistsFunc
+            # ExistsFunc can only have a GroupGraphPattern as parameter. However, when we print the query algebra
+            # we get a GroupGraphPatternSub
+            out.append("EXISTS {" if node.name == "Builtin_EXISTS" else "NOT EXISTS {")
+            serialize(node.graph, out)
+            out.append("}")
+        # # # # 17.4.1.5 logical-or: Covered in "RelationalExpression"
+        # # # # 17.4.1.6 logical-and: Covered in "RelationalExpression"
+        # # # # 17.4.1.7 RDFterm-equal: Covered in "RelationalExpression"
+        # # # # IN: Covered in "RelationalExpression"
+        # # # # NOT IN: Covered in "RelationalExpression"
+
+        # # # 17.4.2 - 17.4.6 Functions on RDF Terms, Strings, Numerics, Dates and Times, Hash functions
+        elif node.name in _UNARY_FUNCTIONS:
+            out.append(_UNARY_FUNCTIONS[node.name] + "(" + convert_node_arg(node.arg) + ")")
+        elif node.name in _BINARY_FUNCTIONS:
+            out.append(_BINARY_FUNCTIONS[node.name] + "(" + convert_node_arg(node.arg1)
+                       + ", " + convert_node_arg(node.arg2) + ")")
+        elif node.name in _NULLARY_FUNCTIONS:
+            out.append(_NULLARY_FUNCTIONS[node.name])
+        elif node.name == "Builtin_SUBSTR":
+            args = [convert_node_arg(node.arg), node.start]
+            if node.length:
+                args.append(node.length)
+            out.append("SUBSTR(" + ", ".join(args) + ")")
+        elif node.name == "Builtin_CONCAT":
+            out.append('CONCAT({vars})'.format(vars=", ".join(convert_node_arg(elem) for elem in node.arg)))
+        elif node.name == "Builtin_REGEX":
+            out.append("REGEX(" + convert_node_arg(node.text) + ", " + convert_node_arg(node.pattern) + ")")
+        elif node.name == "Builtin_REPLACE":
+            out.append("REPLACE(" + convert_node_arg(node.arg) + ", " + convert_node_arg(node.pattern) + ", "
+                       + convert_node_arg(node.replacement) + ")")
+
+        # Other
+        elif node.name == 'values':
+            columns = []
+            for key in node.res[0].keys():
+                if isinstance(key, Identifier):
+                    columns.append(key.n3())
+                else:
+                    raise ExpressionNotCoveredException("The expression {0} might not be covered yet.".format(key))
+            out.append("{VALUES (" + " ".join(columns) + "){")
+            for elem in node.res:
+                row = []
+                for term in elem.values():
+                    if isinstance(term, Identifier):
+                        row.append(term.n3())  # n3() is not part of Identifier class but every subclass has it
+                    elif isinstance(term, str):
+                        row.append(term)
+                    else:
+                        raise ExpressionNotCoveredException(
+                            "The expression {0} might not be covered yet.".format(term))
+                out.append("(" + " ".join(row) + ")")
+            out.append("}}")
+        elif node.name == 'ServiceGraphPattern':
+            out.append("SERVICE " + convert_node_arg(node.term))
+            serialize(node.graph, out)
+        else:
+            # Nodes that are not covered yet are kept as a placeholder in the query text.
+            out.append("{" + node.name + "}")
+
+    if query_algebra.algebra.name != "SelectQuery":
+        return ""
+    return node_text(query_algebra.algebra)
 
-                replace("values", values + "{" + rows + "}")
-            elif node.name == 'ServiceGraphPattern':
-                replace("{ServiceGraphPattern}", "SERVICE " + convert_node_arg(node.term)
-                        + "{" + node.graph.name + "}")
-                algebra.traverse(node.graph, visitPre=sparql_query_text)
-                return node.graph
-            # else:
-            #     raise ExpressionNotCoveredException("The expression {0} might not be covered yet.".format(node.name))
 
-    algebra.traverse(query_algebra.algebra, visitPre=sparql_query_text)
-    query_from_algebra = open("query.txt", "r").read()
-    os.remove("query.txt")
+def _reorder_triples(triples) -> list:
+    """
+    Orders the triple statements exactly like rdflib.plugins.sparql.algebra.reorderTriples: By the number of
+    variables that are not bound by the preceding statements, then by the number of occurrences of their variables.
+    rdflib sorts the remaining statements again after each statement, which is quadratic in the number of statements.
+    Here, they are only sorted again if the preceding statement bound a new variable as otherwise the order of the
+    remaining statements does not change.
+
+    :param triples:
+    :return: The ordered triple statements
+    """
 
-    return query_from_algebra
+    def known_terms(triple):
+        return (len([x for x in triple if x not in vars_known and isinstance(x, (Variable, BNode))]),
+                -sum(vars_count.get(x, 0) for x in triple),
+                not isinstance(triple[2], Literal))
+
+    triples = [(None, triple) for triple in triples]
+    vars_known = set()
+    vars_count = collections.defaultdict(int)
+    for _, triple in triples:
+        for term in triple:
+            if isinstance(term, (Variable, BNode)):
+                vars_count[term] += 1
+
+    yn_sort = True
+    block_end = 0
+    for i in range(len(triples)):
+        if yn_sort:
+            triples[i:] = sorted((known_terms(triple), triple) for _, triple in triples[i:])
+            yn_sort = False
+            block_end = i
+        # The statements of the top block are considered as bound. A block that was already considered does
+        # not bind any new variables.
+        if i >= block_end:
+            cnt_vars_known = len(vars_known)
+            block_end = i
+            while block_end < len(triples) and triples[block_end][0][0] == triples[i][0][0]:
+                for term in triples[block_end][1]:
+                    if isinstance(term, (Variable, BNode)):
+                        vars_known.add(term)
+                block_end += 1
+            yn_sort = len(vars_known) != cnt_vars_known
+
+    return [triple for _, triple in triples]
 
 
 def _resolve_paths(node: CompValue):
@@ -604,33 +633,266 @@ def _resolve_paths(node: CompValue):
 
             node.triples.clear()
             node.triples.extend(resolved_triples)
-            node.triples = algebra.reorderTriples(node.triples)
+            node.triples = _reorder_triples(node.triples)
 
         elif node.name == "TriplesBlock":
             raise ExpressionNotCoveredException("TriplesBlock has not been covered yet. "
                                                 "If there are any paths they will not be resolved.")
 
 
-class QueryUtils:
+TIMESTAMP_PLACEHOLDER = "__TimeOfExecution__"
+
+
+def fill_timestamp_template(timestamp_template: str, timestamp: Union[datetime, str]) -> str:
+    """
+    Turns a timestamp template (see QueryUtils.compile_timestamp_template) into an executable timestamped query.
+
+    :param timestamp_template:
+    :param timestamp: A datetime or a timestamp that is already in the versioning timestamp format.
+    :return: The timestamped query
+    """
+
+    if isinstance(timestamp, datetime):
+        timestamp = versioning_timestamp_format(timestamp)
+    return timestamp_template.replace('"{0}"^^xsd:dateTime'.format(TIMESTAMP_PLACEHOLDER),
+                                      '"{0}"^^xsd:dateTime'.format(timestamp))
+
+
+NormalizedQuery = collections.namedtuple('NormalizedQuery', ['normal_query', 'normal_query_algebra', 'checksum',
+                                                             'order_by_variables'])
+
+
+def _restore_comp_value(cls, name: str, evalfn, items: list, attributes: dict) -> CompValue:
+    if name == 'TrueFilter':
+        evalfn = TrueFilter._evalfn.__func__
+    node = Expr(name, evalfn) if cls is Expr else cls(name)
+    for k, v in items:
+        node[k] = v
+    node.__dict__.update(attributes)
+    return node
+
+
+def _reduce_comp_value(node: CompValue):
+    evalfn = node._evalfn.__func__ if isinstance(node, Expr) and node._evalfn is not None else None
+    # TrueFilter's evaluation function is a lambda which cannot be pickled. It is restored from TrueFilter.
+    if node.name == 'TrueFilter':
+        evalfn = None
+    # Attributes that were assigned to the node, e.g. node.triples, shadow the items of the same name.
+    attributes = {k: v for k, v in node.__dict__.items() if k not in ('name', '_evalfn')}
+    return _restore_comp_value, (node.__class__, node.name, evalfn, list(node.items()), attributes)
+
+
+def _dumps_normalized_query(normalized_query: NormalizedQuery) -> bytes:
+    """
+    Pickles a NormalizedQuery. CompValues and Exprs are pickled by their name, evaluation function and items
+    as they cannot be pickled by default. The prologue of the normalized query algebra is not pickled.
+
+    :param normalized_query:
+    :return:
+    """
+
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[CompValue] = _reduce_comp_value
+    pickler.dispatch_table[Expr] = _reduce_comp_value
+    pickler.dump(normalized_query._replace(normal_query_algebra=normalized_query.normal_query_algebra.algebra))
+
+    return buffer.getvalue()
+
+
+def _loads_normalized_query(data: bytes) -> NormalizedQuery:
+    """
+    Unpickles a NormalizedQuery that was pickled with _dumps_normalized_query. Only load data from trusted sources.
+
+    :param data:
+    :return:
+    """
+
+    normalized_query = pickle.loads(data)
+    return normalized_query._replace(normal_query_algebra=algebra.Query(Prologue(),
+                                                                        normalized_query.normal_query_algebra))
+
+
+class NormalizationCache:
+
+    CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize', 'persistent_hits'])
+
+    def __init__(self, maxsize: int = 512, persistent_cache=None):
+        """
+        A process-wide least recently used cache for the normalization results of QueryUtils. Queries are looked
+        up by their exact prefixes and select statement. Entries are shared between all callers, therefore,
+        every lookup returns a copy of the normalized query algebra and of the order by variables.
+
+        :param maxsize: The maximum number of queries to keep. 0 disables the cache.
+        :param persistent_cache: An optional second level cache, e.g. query_store.PersistentNormalizationCache,
+        that is shared by several processes and survives restarts. It must provide get, put and invalidate
+        with the same signatures as this class. Queries that are found there count as persistent hits.
+        """
+
+        self.maxsize = maxsize
+        self.persistent_cache = persistent_cache
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sparql_prefixes: str, query: str) -> NormalizedQuery:
+        """
+        :param sparql_prefixes: The query prefixes as returned by split_prefixes_query.
+        :param query: The select statement as returned by split_prefixes_query.
+        :return: A copy of the cached NormalizedQuery or None if the query is not cached.
+        """
+
+        with self._lock:
+            entry = self._entries.get((sparql_prefixes, query))
+            if entry is not None:
+                self._entries.move_to_end((sparql_prefixes, query))
+                self.hits += 1
+
+        if entry is None:
+            persistent_cache = self.persistent_cache
+            normalized_query = persistent_cache.get(sparql_prefixes, query) if persistent_cache is not None else None
+            with self._lock:
+                if normalized_query is None:
+                    self.misses += 1
+                    return None
+                self.persistent_hits += 1
+            self._put(sparql_prefixes, query, normalized_query)
+            return normalized_query
+
+        return entry._replace(
+            normal_query_algebra=algebra.Query(entry.normal_query_algebra.prologue,
+                                               _copy_algebra(entry.normal_query_algebra.algebra)),
+            order_by_variables={k: list(v) for k, v in entry.order_by_variables})
+
+    def put(self, sparql_prefixes: str, query: str, normalized_query: NormalizedQuery):
+        """
+        Caches a copy of :normalized_query and evicts the least recently used query if the cache is full.
+
+        :param sparql_prefixes:
+        :param query:
+        :param normalized_query:
+        :return:
+        """
+
+        self._put(sparql_prefixes, query, normalized_query)
+        if self.persistent_cache is not None:
+            self.persistent_cache.put(sparql_prefixes, query, normalized_query)
+
+    def _put(self, sparql_prefixes: str, query: str, normalized_query: NormalizedQuery):
+        if self.maxsize <= 0:
+            return
+        entry = normalized_query._replace(
+            normal_query_algebra=algebra.Query(normalized_query.normal_query_algebra.prologue,
+                                               _copy_algebra(normalized_query.normal_query_algebra.algebra)),
+            order_by_variables=tuple((k, tuple(v)) for k, v in normalized_query.order_by_variables.items()))
+        with self._lock:
+            self._entries[(sparql_prefixes, query)] = entry
+            self._entries.move_to_end((sparql_prefixes, query))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, sparql_prefixes: str, query: str) -> bool:
+        """
+        Removes a single query from the cache and from the persistent cache. Other processes might still keep
+        the query in their in-process cache.
+
+        :return: True if the query was cached.
+        """
+
+        with self._lock:
+            yn_cached = self._entries.pop((sparql_prefixes, query), None) is not None
+        if self.persistent_cache is not None:
+            yn_cached = self.persistent_cache.invalidate(sparql_prefixes, query) or yn_cached
+
+        return yn_cached
+
+    def resize(self, maxsize: int):
+        """
+        Sets the maximum number of cached queries and evicts the least recently used queries that exceed it.
+
+        :param maxsize:
+        :return:
+        """
+
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > max(maxsize, 0):
+                self._entries.popitem(last=False)
+
+    def cache_clear(self):
+        """
+        Removes all queries from the in-process cache and resets the hit and miss counters. The persistent cache
+        is not cleared.
+
+        :return:
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.persistent_hits = 0
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return self.CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries), self.persistent_hits)
+
+
+normalization_cache = NormalizationCache()
 
-    def __init__(self, query: str = None, execution_timestamp: datetime = None):
+
+class PreparedQuery:
+
+    def __init__(self, query: str, sparql_prefixes: str = None):
+        """
+        Parses the SPARQL select statement once. Normalization, timestamping and the retrieval of the order by
+        variables all alter the query tree. Each of them therefore works on its own copy of the tree
+        (see algebra_copy) instead of parsing the query again.
+
+        :param query: The SPARQL select statement including its prefixes.
+        :param sparql_prefixes: The prefixes of the query if they were already split from :query
+        (see prefixes.split_prefixes_query).
+        """
+
+        if sparql_prefixes is None:
+            self.sparql_prefixes, self.query = split_prefixes_query(query)
+        else:
+            self.sparql_prefixes, self.query = sparql_prefixes, query
+        self.query_algebra = _query_algebra(self.query, self.sparql_prefixes)
+
+    def algebra_copy(self) -> rdflib.plugins.sparql.algebra.Query:
         """
-        Initializes the QueryData object and presets most of the variables by calling functions from this class.
+        :return: A copy of the parsed query tree that can be altered without affecting the prepared query.
+        """
+
+        return algebra.Query(self.query_algebra.prologue, _copy_algebra(self.query_algebra.algebra))
+
 
-        :param query: The SPARQL select statement that is used to retrieve the data set for citing.
+class QueryUtils:
+
+    def __init__(self, query: Union[str, PreparedQuery] = None, execution_timestamp: datetime = None):
+        """
+        Initializes the QueryData object. The query is split into its prefixes and the select statement and the
+        execution timestamp is set. All other attributes are computed when they are first accessed and kept
+        afterwards (see the properties below). Thus, an object that is only used to timestamp the query does not
+        normalize it and the query is not parsed at all if its normalization is cached. Errors of the
+        normalization, such as ExpressionNotCoveredException, are raised on first access of the normal query,
+        its algebra, the order by variables, the checksum or the PID.
+
+        :param query: The SPARQL select statement that is used to retrieve the data set for citing. Pass a
+        PreparedQuery to reuse a query that has already been parsed.
         :param execution_timestamp: The timestamp as of q_handler.
         """
 
         if query is not None:
-            self.sparql_prefixes, self.query = split_prefixes_query(query)
-            try:
-                self.normal_query_algebra = self.normalize_query_tree()
-                self.normal_query = _translate_algebra(self.normal_query_algebra)
-                self.order_by_variables = _order_by_variables(self.query, self.sparql_prefixes)
-            except ExpressionNotCoveredException as e:
-                logging.error(e)
-                raise ExpressionNotCoveredException(e)
-            self.checksum = self.compute_checksum()
+            if isinstance(query, PreparedQuery):
+                self.prepared_query = query
+                self.sparql_prefixes, self.query = query.sparql_prefixes, query.query
+            else:
+                self.sparql_prefixes, self.query = split_prefixes_query(query)
 
             if execution_timestamp is not None:
                 self.execution_timestamp = versioning_timestamp_format(execution_timestamp)  # -> str
@@ -640,13 +902,69 @@ class QueryUtils:
                 execution_datetime = datetime.now(timezone(timedelta(seconds=timezone_delta)))
                 execution_timestamp = versioning_timestamp_format(execution_datetime)
                 self.execution_timestamp = execution_timestamp
-            self.timestamped_query = self.timestamp_query()
-            self.pid = self.generate_query_pid()
         else:
+            self.prepared_query = None
+            self.timestamp_template = None
             self.query = None
             self.normal_query_algebra = None
             self.checksum = None
 
+    @functools.cached_property
+    def prepared_query(self) -> PreparedQuery:
+        return PreparedQuery(self.query, self.sparql_prefixes)
+
+    @functools.cached_property
+    def _normalized_query(self) -> NormalizedQuery:
+        """
+        Takes the normalization from the normalization cache or normalizes the query and caches the result.
+
+        :return:
+        """
+
+        normalized_query = normalization_cache.get(self.sparql_prefixes, self.query)
+        if normalized_query is None:
+            try:
+                normal_query_algebra = self.normalize_query_tree()
+                normal_query = _translate_algebra(normal_query_algebra)
+                order_by_variables = _order_by_variables(self.query, self.sparql_prefixes,
+                                                         self.prepared_query.algebra_copy())
+            except ExpressionNotCoveredException as e:
+                logging.error(e)
+                raise ExpressionNotCoveredException(e)
+            normalized_query = NormalizedQuery(normal_query, normal_query_algebra, self.compute_checksum(normal_query),
+                                               order_by_variables)
+            normalization_cache.put(self.sparql_prefixes, self.query, normalized_query)
+
+        return normalized_query
+
+    @functools.cached_property
+    def normal_query_algebra(self) -> rdflib.plugins.sparql.algebra.Query:
+        return self._normalized_query.normal_query_algebra
+
+    @functools.cached_property
+    def normal_query(self) -> str:
+        return self._normalized_query.normal_query
+
+    @functools.cached_property
+    def order_by_variables(self) -> dict:
+        return self._normalized_query.order_by_variables
+
+    @functools.cached_property
+    def checksum(self) -> str:
+        return self._normalized_query.checksum
+
+    @functools.cached_property
+    def timestamp_template(self) -> str:
+        return self.compile_timestamp_template()
+
+    @functools.cached_property
+    def timestamped_query(self) -> str:
+        return fill_timestamp_template(self.timestamp_template, self.execution_timestamp)
+
+    @functools.cached_property
+    def pid(self) -> str:
+        return self.generate_query_pid()
+
     def normalize_query_tree(self, query: str = None) -> rdflib.plugins.sparql.algebra.Query:
         """
         R4 - Query Uniqueness
@@ -661,14 +979,22 @@ class QueryUtils:
 
         # Assertions and exception handling
         if query is None:
-            if self.query is not None:
-                prefixes = self.sparql_prefixes
-                query = self.query
-            else:
+            if self.prepared_query is None:
                 raise InputMissing("Query could not be normalized because the query string was not set.")
+            q_algebra = self.prepared_query.algebra_copy()
         else:
             prefixes, query = split_prefixes_query(query)
-        q_algebra = _query_algebra(query, prefixes)
+            q_algebra = _query_algebra(query, prefixes)
+
+        """
+        The normalization measures are applied in four traversals of the query tree. Each traversal fuses the
+        measures that only depend on the results of the previous traversals:
+        1. Post-order: Protected variables are removed and aliases are collected and removed (#6.1, #6.2)
+        2. Post-order: Aliases are replaced by their original variables (#6.1, #6.2)
+        3. Pre-order: "filter not exists" is replaced (#8), paths are resolved (#9, #10) and the variables are
+        collected for the replacement by letters (#7).
+        4. Post-order: Variables are replaced by letters (#7). Pre-order: Triple statements are ordered (#5).
+        """
 
         def remove_protected_vars(node):
             """
@@ -682,8 +1008,6 @@ class QueryUtils:
             if isinstance(node, set):
                 return set()
 
-        algebra.traverse(q_algebra.algebra, visitPost=remove_protected_vars)
-
         """
         #6.1
         Aliases via BIND keyword just rename variables but the query result stays the same.
@@ -707,7 +1031,12 @@ class QueryUtils:
                 if aliases.get(node):
                     return aliases.get(node)
 
-        algebra.traverse(q_algebra.algebra, visitPost=remove_alias)
+        def remove_protected_vars_and_aliases(node):
+            if isinstance(node, set):
+                return remove_protected_vars(node)
+            return remove_alias(node)
+
+        algebra.traverse(q_algebra.algebra, visitPost=remove_protected_vars_and_aliases)
         algebra.traverse(q_algebra.algebra, visitPost=overwrite_aliases_with_orig_var)
 
         """
@@ -742,12 +1071,6 @@ class QueryUtils:
                                                             "will not be translated into the OPTIONAL + !BOUND pattern."
                                                             "")
 
-        try:
-            algebra.traverse(q_algebra.algebra, replace_filter_not_exists)
-        except ExpressionNotCoveredException as e:
-            err = "Query will not be normalized because of following error: {0}".format(e)
-            raise ExpressionNotCoveredException(err)
-
         """
         #9
         Inverting the order of the triple statement (object predicate subject instead of subject predicate object) 
@@ -761,11 +1084,7 @@ class QueryUtils:
         Sequence paths can reduce the number of triples in the query statement and are commonly used. They can be
         resolved to 'normal' triple statements.
         """
-        try:
-            algebra.traverse(q_algebra.algebra, _resolve_paths)
-        except ExpressionNotCoveredException as e:
-            err = "Query will not be normalized because of following error: {0}".format(e)
-            raise ExpressionNotCoveredException(err)
+        # Solved with _resolve_paths
 
         """
         #11
@@ -805,14 +1124,19 @@ class QueryUtils:
         are supported. 
         There is no need to sort the variables in the query tree as this is implicitly solved by the algebra. Variables
         are sorted by their bindings where the ones with the most bindings come first.
+        The variables are collected in one traversal but letters are assigned to the bind variables first, then to the
+        projection variables and last to the variables of the triple statements.
         """
+        bind_vars = []
+        pv_vars = []
+        bgp_vars = []
         q_vars_mapped = {}
 
         def retrieve_pv_vars(node):
             if isinstance(node, CompValue) and node.get('PV') and type(node.get('PV')) == list:
                 for idx, pv in enumerate(node.get('PV')):
                     if isinstance(pv, Variable):
-                        q_vars_mapped.setdefault(pv, chr(len(q_vars_mapped) + 97))
+                        pv_vars.append(pv)
                     else:
                         raise ExpressionNotCoveredException("There is a project variable that is actually not "
                                                             "a variables but {0}. This case has not been covered yet."
@@ -823,15 +1147,42 @@ class QueryUtils:
             if isinstance(node, CompValue) and node.name == 'BGP':
                 for triple in node.triples:
                     if isinstance(triple[0], Variable):
-                        q_vars_mapped.setdefault(triple[0], chr(len(q_vars_mapped) + 97))
+                        bgp_vars.append(triple[0])
                     if isinstance(triple[1], Variable):
-                        q_vars_mapped.setdefault(triple[1], chr(len(q_vars_mapped) + 97))
+                        bgp_vars.append(triple[1])
                     if isinstance(triple[2], Variable):
-                        q_vars_mapped.setdefault(triple[2], chr(len(q_vars_mapped) + 97))
+                        bgp_vars.append(triple[2])
 
         def retrieve_bind_vars(node):
             if isinstance(node, CompValue) and node.name == 'Extend':
-                q_vars_mapped.setdefault(node.var, chr(len(q_vars_mapped) + 97))
+                bind_vars.append(node.var)
+
+        def resolve_paths_and_retrieve_vars(node):
+            try:
+                _resolve_paths(node)
+            except ExpressionNotCoveredException as e:
+                err = "Query will not be normalized because of following error: {0}".format(e)
+                raise ExpressionNotCoveredException(err)
+            retrieve_bind_vars(node)
+            retrieve_pv_vars(node)
+            retrieve_bgp_vars(node)
+
+        def replace_filter_not_exists_and_resolve_paths(node):
+            try:
+                filter_node = replace_filter_not_exists(node)
+            except ExpressionNotCoveredException as e:
+                err = "Query will not be normalized because of following error: {0}".format(e)
+                raise ExpressionNotCoveredException(err)
+            if filter_node is not None:
+                # The traversal does not descend into the replaced node. Its sub-tree is still subject to the
+                # subsequent measures but not to another replacement of "filter not exists".
+                algebra.traverse(filter_node, visitPre=resolve_paths_and_retrieve_vars)
+                return filter_node
+            resolve_paths_and_retrieve_vars(node)
+
+        algebra.traverse(q_algebra.algebra, visitPre=replace_filter_not_exists_and_resolve_paths)
+        for var in bind_vars + pv_vars + bgp_vars:
+            q_vars_mapped.setdefault(var, chr(len(q_vars_mapped) + 97))
 
         def replace_variable_names_with_letters(node):
             if isinstance(node, Variable) and not node.startswith("__agg_"):
@@ -844,21 +1195,14 @@ class QueryUtils:
                                                         "went wrong prior to this step or the variable is not part "
                                                         "of any triple statement.".format(node))
 
-        algebra.traverse(q_algebra.algebra, retrieve_bind_vars)
-        algebra.traverse(q_algebra.algebra, retrieve_pv_vars)
-        algebra.traverse(q_algebra.algebra, retrieve_bgp_vars)
-
-        try:
-            algebra.traverse(q_algebra.algebra, visitPost=replace_variable_names_with_letters)
-        except ExpressionNotCoveredException as e:
-            err = "Query will not be normalized because of following error: {0}".format(e)
-            raise ExpressionNotCoveredException(err)
-
         """
         #5
         Triple statements are first ordered by the number of their bindings. This is already done in the 
         query-to-algebra translation step. 
         Then, the query is ordered alphabetically by subject, predicate, object.
+        The triple statements are ordered in the same traversal in which the variables are replaced. This works
+        because _resolve_paths has assigned the attribute node.triples, which still holds the original variables,
+        whereas the traversal replaces the variables in the node's items.
         """
 
         def reorder_triples(node):
@@ -892,56 +1236,48 @@ class QueryUtils:
                             o = t[2]
                         norm_triple += s + "_" + p + "_" + o
                         ordered_triples[(s, p, o)] = norm_triple
-                        ordered_triples = {k: var for k, var in sorted(ordered_triples.items(),
-                                                                       key=lambda item: item[1])}
                 except Exception:
                     raise ExpressionNotCoveredException("There might be uncovered expressions, "
                                                         "identifiers or paths. Triple statements will not "
                                                         "be re-ordered.")
 
+                # Python's sort is stable, so triple statements with the same normalized representation keep
+                # their order.
+                ordered_triples = sorted(ordered_triples.items(), key=lambda item: item[1])
                 node.triples.clear()
-                node.triples.extend(list(ordered_triples.keys()))
+                node.triples.extend([k for k, norm_triple in ordered_triples])
             elif isinstance(node, CompValue) and node.name == 'TriplesBlock':
                 raise ExpressionNotCoveredException("TriplesBlock has not been covered yet. "
                                                     "Triples within a TripleBlock Node will not be ordered. ")
 
         try:
-            algebra.traverse(q_algebra.algebra, reorder_triples)
+            algebra.traverse(q_algebra.algebra, visitPre=reorder_triples,
+                             visitPost=replace_variable_names_with_letters)
         except ExpressionNotCoveredException as e:
             err = "Query will not be normalized because of following error: {0}".format(e)
             raise ExpressionNotCoveredException(err)
 
         return q_algebra
 
-    def timestamp_query(self, query: str = None, citation_timestamp: datetime = None) -> str:
+    def compile_timestamp_template(self, query: str = None) -> str:
         """
         R7 - Query timestamping
-        Binds a q_handler timestamp to the variable ?TimeOfExecution and wraps it around the query. Also extends
-        the query with a code snippet that ensures that a snapshot of the data as of q_handler
-        time gets returned when the query is executed. Optionally, but recommended, the order by clause
-        is attached to the query to ensure a unique sort of the data.
+        Wraps the query with the versioning extensions like timestamp_query does but binds the placeholder
+        TIMESTAMP_PLACEHOLDER instead of a timestamp to the variable ?TimeOfExecution. fill_timestamp_template turns
+        the template into the timestamped query for any timestamp by plain substitution.
 
-        :param query:
-        :param citation_timestamp:
-        Use this parameter only for presentation purpose as the code for color encoding will make the SPARQL
-        query erroneous!
-        :return: A query string extended with the given timestamp
+        :param query: The query to compile. If no query is provided the template will be compiled for the query
+        of this object.
+        :return: The timestamp template
         """
 
         if query is None:
-            if self.query is not None and self.sparql_prefixes is not None:
-                prefixes = self.sparql_prefixes
-                query = self.query
-            else:
+            if self.prepared_query is None:
                 raise InputMissing("Query could not be normalized because the query string is not set.")
+            query_algebra = self.prepared_query.algebra_copy()
         else:
             prefixes, query = split_prefixes_query(query)
-        query_vers = prefixes + "\n" + query
-
-        if citation_timestamp is not None:
-            timestamp = versioning_timestamp_format(citation_timestamp)
-        else:
-            timestamp = self.execution_timestamp
+            query_algebra = _query_algebra(query, prefixes)
 
         bgp_triples = {}
 
@@ -957,8 +1293,6 @@ class QueryUtils:
                     raise ExpressionNotCoveredException("TriplesBlock has not been covered yet. "
                                                         "No versioning extensions will be injected.")
 
-        query_tree = parser.parseQuery(query_vers)
-        query_algebra = algebra.translateQuery(query_tree)
         try:
             algebra.traverse(query_algebra.algebra, visitPre=_resolve_paths)
             algebra.traverse(query_algebra.algebra, visitPre=inject_versioning_extensions)
@@ -967,10 +1301,8 @@ class QueryUtils:
             raise ExpressionNotCoveredException(err)
 
         query_vers_out = _translate_algebra(query_algebra)
+        ver_block_template = open(template_path("templates/query_utils/versioning_query_extensions.txt"), "r").read()
         for bgp_identifier, triples in bgp_triples.items():
-            ver_block_template = \
-                open(template_path("templates/query_utils/versioning_query_extensions.txt"), "r").read()
-
             ver_block = ""
             for i, triple in enumerate(triples):
                 templ = ver_block_template
@@ -983,13 +1315,42 @@ class QueryUtils:
             dummy_triple = rdflib.term.Literal('__{0}dummy_subject__'.format(bgp_identifier)).n3() + " "\
                            + rdflib.term.Literal('__{0}dummy_predicate__'.format(bgp_identifier)).n3() + " "\
                            + rdflib.term.Literal('__{0}dummy_object__'.format(bgp_identifier)).n3() + "."
-            ver_block += 'bind("{0}"^^xsd:dateTime as ?TimeOfExecution{1})'.format(timestamp, bgp_identifier)
+            ver_block += 'bind("{0}"^^xsd:dateTime as ?TimeOfExecution{1})'.format(TIMESTAMP_PLACEHOLDER,
+                                                                                   bgp_identifier)
             query_vers_out = query_vers_out.replace(dummy_triple, ver_block)
 
         query_vers_out = versioning_prefixes("") + "\n" + query_vers_out
 
         return query_vers_out
 
+    def timestamp_query(self, query: str = None, citation_timestamp: datetime = None) -> str:
+        """
+        R7 - Query timestamping
+        Binds a q_handler timestamp to the variable ?TimeOfExecution and wraps it around the query. Also extends
+        the query with a code snippet that ensures that a snapshot of the data as of q_handler
+        time gets returned when the query is executed. Optionally, but recommended, the order by clause
+        is attached to the query to ensure a unique sort of the data.
+        The timestamp template of this object is reused if no :query is provided.
+
+        :param query:
+        :param citation_timestamp:
+        Use this parameter only for presentation purpose as the code for color encoding will make the SPARQL
+        query erroneous!
+        :return: A query string extended with the given timestamp
+        """
+
+        if query is None and self.timestamp_template is not None:
+            template = self.timestamp_template
+        else:
+            template = self.compile_timestamp_template(query)
+
+        if citation_timestamp is not None:
+            timestamp = citation_timestamp
+        else:
+            timestamp = self.execution_timestamp
+
+        return fill_timestamp_template(template, timestamp)
+
     def compute_checksum(self, string: str = None) -> str:
         """
         Computes the checksum based on the provided :string or on
@@ -1037,6 +1398,519 @@ class QueryUtils:
         return query_pid
 
 
+# Version of the normalization that QueryUtils applies. It must be increased whenever a change of
+# QueryUtils.normalize_query_tree, _translate_algebra or of a function they depend on changes normal queries, their
+# algebra, their checksums or the order by variables. tests/normalization_cache fails if a checksum of the
+# tests/normalization corpus changes while the version stays the same.
+NORMALIZER_VERSION = 2
+
+
+@functools.lru_cache(maxsize=None)
+def normalizer_version() -> str:
+    """
+    Identifies the normalization that QueryUtils applies. It changes with NORMALIZER_VERSION and with the rdflib
+    version. Persisted normalization results of other versions must not be used.
+
+    :return: A hex digest.
+    """
+
+    return hashlib.sha256(str.encode("{0} {1}".format(NORMALIZER_VERSION, rdflib.__version__))).hexdigest()
+
+
+def _normalization_result(query: str) -> tuple:
+    query_utils = QueryUtils(query)
+    return query_utils.checksum, query_utils.normal_query
+
+
+def _map_query_chunk(function: Callable, queries: list) -> list:
+    """
+    Applies :function to each query of a chunk in a worker process. Errors are returned instead of raised so
+    that one query does not fail the whole chunk.
+
+    :param function: A module level function that takes a query. It is pickled by reference.
+    :param queries:
+    :return: A list of (result, error) tuples in the order of :queries.
+    """
+
+    results = []
+    for query in queries:
+        try:
+            results.append((function(query), None))
+        except Exception as e:
+            try:
+                pickle.dumps(e)
+            except Exception:
+                e = Exception("{0}: {1}".format(type(e).__name__, e))
+            results.append((None, e))
+    return results
+
+
+def _map_queries(function: Callable, queries: Iterable[str], workers: int = None,
+                 chunksize: int = 16) -> Iterator[tuple]:
+    """
+    Applies :function to each query in a pool of :workers processes. :queries is consumed lazily and at most
+    two chunks per worker are pending at a time, so query logs of any size can be processed. Identical query
+    strings are only passed once to :function.
+
+    :param function: A module level function that takes a query.
+    :param queries:
+    :param workers: The number of worker processes. Defaults to the number of CPUs. With one worker, the queries
+    are processed in this process in the order of :queries.
+    :param chunksize: The number of queries that are sent to a worker process at once.
+    :return: (index, result, error) tuples as soon as the query at :index of :queries was processed.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1 or chunksize < 1:
+        raise ValueError("workers and chunksize must be greater than 0.")
+
+    results = {}
+    if workers == 1:
+        for index, query in enumerate(queries):
+            if query not in results:
+                results[query] = _map_query_chunk(function, [query])[0]
+            yield (index,) + results[query]
+        return
+
+    # Indexes of the queries whose results are pending
+    pending = collections.defaultdict(list)
+
+    def finished(futures: dict, done: set):
+        for future in done:
+            for query, result in zip(futures.pop(future), future.result()):
+                results[query] = result
+                for index in pending.pop(query):
+                    yield (index,) + result
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        chunk = []
+        for index, query in enumerate(queries):
+            if query in results:
+                yield (index,) + results[query]
+                continue
+            if query not in pending:
+                chunk.append(query)
+            pending[query].append(index)
+            if len(chunk) == chunksize:
+                futures[executor.submit(_map_query_chunk, function, chunk)] = chunk
+                chunk = []
+                if len(futures) >= 2 * workers:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    yield from finished(futures, done)
+        if chunk:
+            futures[executor.submit(_map_query_chunk, function, chunk)] = chunk
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            yield from finished(futures, done)
+
+
+def normalize_many(queries: Iterable[str], workers: int = None, chunksize: int = 16) -> Iterator[tuple]:
+    """
+    R4 - Query Uniqueness
+    Normalizes many queries in parallel processes, e.g. to find semantically identical queries in a query log.
+    Each query is normalized like QueryUtils(query) does, thus the checksums can be compared with the checksums
+    in the query store. The results are yielded as soon as they are available, which is not necessarily the
+    order of :queries.
+
+    :param queries: SPARQL select statements including their prefixes.
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param chunksize: The number of queries that are sent to a worker process at once.
+    :return: (index, checksum, normal_query, error) tuples where index is the position of the query in :queries.
+    Checksum and normal query are None if the query could not be normalized and error is the exception that was
+    raised. Otherwise, error is None.
+    """
+
+    for index, result, error in _map_queries(_normalization_result, queries, workers, chunksize):
+        if error is None:
+            yield index, result[0], result[1], None
+        else:
+            yield index, None, None, error
+
+
+def _is_arrow_table(dataset) -> bool:
+    return pa is not None and isinstance(dataset, pa.Table)
+
+
+def _arrow_codes(column) -> tuple:
+    """
+    :param column: A column of a pyarrow Table.
+    :return: The index of each value in the distinct values of the column, -1 for missing values, and the distinct
+    values.
+    """
+
+    if pa.types.is_dictionary(column.type):
+        column = column.unify_dictionaries()
+    encoded = pc.dictionary_encode(column.combine_chunks())
+    return encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False), encoded.dictionary.to_pylist()
+
+
+# Ids of the result set checksum algorithms (see RDFDataSetUtils.compute_checksum).
+CHECKSUM_ROW_HASH_V1 = "pandas-row-hash-v1"
+CHECKSUM_CELL_SUM_V1 = "sha256-cell-sum-v1"
+CHECKSUM_COLUMN_HASH_SUM_V2 = "column-hash-sum-v2"
+CHECKSUM_CANONICAL_V1 = "canonical-blake2b-v1"
+CHECKSUM_MERKLE_V1 = "merkle-blake2b-v1"
+CHECKSUM_ALGORITHMS = (CHECKSUM_ROW_HASH_V1, CHECKSUM_CELL_SUM_V1, CHECKSUM_COLUMN_HASH_SUM_V2, CHECKSUM_CANONICAL_V1,
+                       CHECKSUM_MERKLE_V1)
+
+# Number of rows that are serialized at once for the canonical checksum
+_canonical_block_size = 10000
+# Default number of rows per block of the Merkle tree checksum
+merkle_block_size = 100000
+
+MerkleChecksum = collections.namedtuple('MerkleChecksum', ['checksum', 'block_size', 'block_checksums'])
+
+
+def _dataset_columns(dataset) -> Iterator[tuple]:
+    """
+    :param dataset: A data frame or pyarrow Table.
+    :return: Tuples of column name, codes and values. Dictionary-encoded columns and the columns of Arrow tables
+    come as the index of each value in the distinct values (-1 for missing values) and the distinct values. The
+    codes of other columns are None.
+    """
+
+    if _is_arrow_table(dataset):
+        for name, column in zip(dataset.column_names, dataset.columns):
+            yield (name, *_arrow_codes(column))
+    else:
+        for name, column in dataset.items():
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                yield name, column.cat.codes.to_numpy(), column.cat.categories
+            else:
+                yield name, None, column
+
+
+def _column_hash_values(dataset) -> Iterator[tuple]:
+    """
+    Hashes the values of each column of a data frame or pyarrow Table into 64-bit hash values. The hash key is
+    derived from the column name, so that equal values in different columns yield different hash values. Values
+    are hashed as UTF-8 strings and missing values yield 0. Dictionary-encoded columns are hashed by their distinct
+    values.
+
+    :param dataset:
+    :return: Tuples of column name and hash values.
+    """
+
+    for name, codes, values in _dataset_columns(dataset):
+        hash_key = hashlib.blake2b(str(name).encode(), digest_size=8).hexdigest()
+        if codes is None:
+            # Before astype(str), which turns missing values into strings like "nan"
+            missing = pd.isna(values).to_numpy()
+            if not pd.api.types.is_string_dtype(values.dtype):
+                values = values.astype(str)
+            values = values.to_numpy(dtype=object)
+            # Factorizing the values first takes longer than hashing them all.
+            hash_values = hash_array(values, encoding="utf8", hash_key=hash_key, categorize=False)
+            hash_values[missing] = 0
+        else:
+            # Missing values (code -1) take the last hash value.
+            hash_values = np.append(hash_array(np.asarray(values, dtype=object), encoding="utf8",
+                                               hash_key=hash_key, categorize=False), np.uint64(0))[codes]
+        yield name, hash_values
+
+
+def _escape_term(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _canonical_header(column_names: list) -> bytes:
+    """
+    :param column_names:
+    :return: The header line of the canonical serialization (see _canonical_rows).
+    """
+
+    return ("\t".join(_escape_term(str(name)) for name in column_names) + "\n").encode("utf-8")
+
+
+def _canonical_columns(dataset) -> list:
+    """
+    Escapes the terms of a data frame or pyarrow Table for the canonical serialization (see _canonical_rows).
+
+    :param dataset:
+    :return: One array of escaped terms per column.
+    """
+
+    escaped_columns = []
+    for name, codes, values in _dataset_columns(dataset):
+        if codes is not None:
+            # Dictionary-encoded columns are escaped by their distinct values. Missing values (code -1) take the
+            # last term.
+            values = pd.Series(list(values) + [None], dtype=object)
+        values = values.to_numpy(dtype=object)
+        missing = pd.isna(values)
+        yn_missing = missing.any()
+        if yn_missing:
+            values = np.where(missing, "", values)
+        if pd.api.types.infer_dtype(values, skipna=False) != "string":
+            values = np.array([str(term) for term in values], dtype=object)
+        # Most columns have no term that needs to be escaped. Checking them all at once is much faster than
+        # escaping each term.
+        joined_terms = "".join(values)
+        if any(character in joined_terms for character in "\\\t\n\r"):
+            values = np.array([_escape_term(term) for term in values], dtype=object)
+        if yn_missing:
+            values[missing] = "\\N"
+        escaped_columns.append(values if codes is None else values[codes])
+    return escaped_columns
+
+
+def _canonical_rows(dataset) -> Iterator[bytes]:
+    """
+    Serializes the rows of a data frame or pyarrow Table canonically. Each row is a line of its terms in column
+    order, separated by tabs. Backslashes, tabs, line feeds and carriage returns within terms are escaped with a
+    backslash as in SPARQL TSV results and missing values are written as backslash N. Terms that are no strings
+    are converted to strings first. The serialization is encoded in UTF-8. Neither the index of a data frame nor the
+    data types of the columns are part of it.
+
+    :param dataset:
+    :return: The serialization in blocks of rows.
+    """
+
+    escaped_columns = _canonical_columns(dataset)
+    for start in range(0, len(dataset), _canonical_block_size):
+        rows = zip(*[column[start:start + _canonical_block_size] for column in escaped_columns])
+        yield ("\n".join(map("\t".join, rows)) + "\n").encode("utf-8")
+
+
+def _concat_rows(chunks: list):
+    if len(chunks) == 1:
+        return chunks[0]
+    return pa.concat_tables(chunks) if _is_arrow_table(chunks[0]) else pd.concat(chunks)
+
+
+def _row_blocks(dataset, block_size: int) -> list:
+    """
+    :param dataset: A data frame or pyarrow Table.
+    :param block_size: Number of rows per block.
+    :return: The consecutive blocks of :block_size rows of :dataset. The last block may have less rows.
+    """
+
+    if _is_arrow_table(dataset):
+        return [dataset.slice(start, block_size) for start in range(0, dataset.num_rows, block_size)]
+    return [dataset.iloc[start:start + block_size] for start in range(0, len(dataset.index), block_size)]
+
+
+def _merkle_block_checksum(block) -> str:
+    """
+    :param block: Rows of a data frame or pyarrow Table.
+    :return: The BLAKE2b hash of a zero byte followed by the canonical serialization of the rows
+    (see _canonical_rows).
+    """
+
+    checksum = hashlib.blake2b(b"\x00", digest_size=32)
+    for rows in _canonical_rows(block):
+        checksum.update(rows)
+    return checksum.hexdigest()
+
+
+def _merkle_root(column_names: list, block_size: int, block_checksums: list) -> str:
+    """
+    Combines the block checksums of the Merkle tree checksum (CHECKSUM_MERKLE_V1). The checksums are combined
+    pairwise, level by level, where the parent of two nodes is the BLAKE2b hash of a one byte followed by both
+    nodes. A node without a sibling is carried up to the next level. The prefixes of blocks and parents make sure
+    that a block cannot be passed off as a parent and vice versa.
+
+    :param column_names:
+    :param block_size:
+    :param block_checksums:
+    :return: The BLAKE2b hash of the canonical header (see _canonical_header), the block size (8 bytes, little
+    endian) and the root of the tree.
+    """
+
+    level = [bytes.fromhex(block_checksum) for block_checksum in block_checksums]
+    while len(level) > 1:
+        level = [hashlib.blake2b(b"\x01" + b"".join(level[i:i + 2]), digest_size=32).digest()
+                 if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+    checksum = hashlib.blake2b(_canonical_header(column_names), digest_size=32)
+    checksum.update(block_size.to_bytes(8, "little"))
+    checksum.update(level[0] if level else b"")
+    return checksum.hexdigest()
+
+
+def changed_row_ranges(merkle_checksum: MerkleChecksum, other_merkle_checksum: MerkleChecksum) -> list:
+    """
+    Compares the block checksums of two Merkle tree checksums of a dataset, e.g. the stored one of a PID and the
+    one of the re-executed query.
+
+    :param merkle_checksum:
+    :param other_merkle_checksum:
+    :return: The row ranges of the blocks whose checksums differ. Blocks that only one of the datasets has count
+    as changed. The range of the last block may extend beyond the last row.
+    """
+
+    if merkle_checksum.block_size != other_merkle_checksum.block_size:
+        raise ValueError("Merkle tree checksums with block sizes {0} and {1} cannot be compared.".format(
+            merkle_checksum.block_size, other_merkle_checksum.block_size))
+    block_size = merkle_checksum.block_size
+    block_checksum_pairs = itertools.zip_longest(merkle_checksum.block_checksums,
+                                                 other_merkle_checksum.block_checksums)
+    return [range(i * block_size, (i + 1) * block_size) for i, (block_checksum, other_block_checksum)
+            in enumerate(block_checksum_pairs) if block_checksum != other_block_checksum]
+
+
+class ResultSetChecksum:
+    """
+    Computes the checksum of a result set chunk by chunk, e.g. while the chunks of get_data (see
+    TripleStoreEngine.get_data) are downloaded. The result set is never held in memory as a whole. The checksum
+    equals the one RDFDataSetUtils.compute_checksum computes from the concatenated chunks. Only algorithms that
+    process the rows in order can be computed chunk by chunk (see ResultSetChecksum.algorithms).
+
+    checksum = ResultSetChecksum()
+    for chunk in engine.get_data(select_statement, chunksize=100000):
+        checksum.update(chunk)
+    checksum.hexdigest()
+    """
+
+    algorithms = (CHECKSUM_CANONICAL_V1, CHECKSUM_COLUMN_HASH_SUM_V2, CHECKSUM_MERKLE_V1)
+
+    def __init__(self, algorithm: str = CHECKSUM_CANONICAL_V1, block_size: int = merkle_block_size):
+        """
+
+        :param algorithm: The id of the checksum algorithm.
+        :param block_size: Number of rows per block of the Merkle tree checksum (see
+        RDFDataSetUtils.compute_merkle_checksum).
+        """
+
+        if algorithm not in self.algorithms:
+            raise ValueError("The checksum algorithm {0} cannot be computed chunk by chunk. Choose one of: {1}".format(
+                algorithm, ", ".join(self.algorithms)))
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        self.algorithm = algorithm
+        self.block_size = block_size
+        self.column_names = None
+        self.cnt_rows = 0
+        # Rows of the Merkle tree checksum that do not fill a block yet
+        self._pending_rows = []
+        self._cnt_pending_rows = 0
+        self._block_checksums = []
+        if algorithm == CHECKSUM_CANONICAL_V1:
+            self._checksum = hashlib.blake2b(digest_size=32)
+        else:
+            self._checksum = hashlib.sha256()
+
+    def update(self, rows):
+        """
+        Adds the next rows of the result set to the checksum.
+
+        :param rows: A data frame or pyarrow Table with the same columns as the rows before.
+        """
+
+        column_names = rows.column_names if _is_arrow_table(rows) else list(rows.columns)
+        if self.column_names is None:
+            self.column_names = column_names
+            if self.algorithm == CHECKSUM_CANONICAL_V1:
+                self._checksum.update(_canonical_header(column_names))
+        elif column_names != self.column_names:
+            raise ValueError("The rows have the columns {0} instead of {1}".format(column_names, self.column_names))
+
+        if self.algorithm == CHECKSUM_MERKLE_V1:
+            self._pending_rows.append(rows)
+            self._cnt_pending_rows += len(rows)
+            if self._cnt_pending_rows >= self.block_size:
+                blocks = _row_blocks(_concat_rows(self._pending_rows), self.block_size)
+                if len(blocks[-1]) < self.block_size:
+                    self._pending_rows = [blocks.pop()]
+                else:
+                    self._pending_rows = []
+                self._cnt_pending_rows = sum(len(pending_rows) for pending_rows in self._pending_rows)
+                self._block_checksums += [_merkle_block_checksum(block) for block in blocks]
+        elif self.algorithm == CHECKSUM_CANONICAL_V1:
+            for block in _canonical_rows(rows):
+                self._checksum.update(block)
+        else:
+            row_hashsums = np.zeros(len(rows), dtype=np.uint64)
+            for name, hash_values in _column_hash_values(rows):
+                # uint64 additions wrap around
+                row_hashsums += hash_values
+            self._checksum.update(row_hashsums.astype("<u8").tobytes())
+        self.cnt_rows += len(rows)
+
+    def hexdigest(self) -> str:
+        """
+        :return: The checksum of the rows so far. More rows can be added afterwards.
+        """
+
+        if self.algorithm == CHECKSUM_MERKLE_V1:
+            return self.merkle_checksum().checksum
+        return self._checksum.hexdigest()
+
+    def merkle_checksum(self) -> MerkleChecksum:
+        """
+        :return: The Merkle tree checksum of the rows so far including the block checksums.
+        """
+
+        if self.algorithm != CHECKSUM_MERKLE_V1:
+            raise ValueError("Block checksums are only computed for {0}".format(CHECKSUM_MERKLE_V1))
+        block_checksums = list(self._block_checksums)
+        if self._cnt_pending_rows > 0:
+            block_checksums.append(_merkle_block_checksum(_concat_rows(self._pending_rows)))
+        return MerkleChecksum(_merkle_root(self.column_names or [], self.block_size, block_checksums),
+                              self.block_size, block_checksums)
+
+
+# Largest code that _combined_codes may compute without overflowing 64-bit integers
+_max_combined_code = 2 ** 63 - 1
+
+
+def _key_codes(dataset) -> tuple:
+    """
+    Factorizes the columns of a dataset into integer codes from 0 to the number of distinct values of the column,
+    so that candidate keys can be checked on integers instead of terms. Missing values get a code of their own.
+    Rows that occur more than once are only kept once.
+
+    :param dataset: A data frame or pyarrow Table.
+    :return: The column names, the codes of the distinct rows for each column and the number of distinct values of
+    each column.
+    """
+
+    column_names = []
+    codes = []
+    cnt_distinct = []
+    for name, column_codes, values in _dataset_columns(dataset):
+        if column_codes is None:
+            column_codes = pd.factorize(values)[0]
+        # The missing values' code -1 becomes a regular code.
+        column_codes, distinct_codes = pd.factorize(column_codes)
+        column_names.append(name)
+        codes.append(column_codes)
+        cnt_distinct.append(len(distinct_codes))
+
+    if codes:
+        duplicated = pd.Series(_combined_codes(codes, cnt_distinct)).duplicated().to_numpy()
+        if duplicated.any():
+            codes = [column_codes[~duplicated] for column_codes in codes]
+    return column_names, codes, cnt_distinct
+
+
+def _combined_codes(codes: list, cnt_distinct: list) -> np.ndarray:
+    """
+    Combines the codes of several columns (see _key_codes) into one code per row, like the digits of a number
+    whose digits have the number of distinct values of their column as base. Equal rows yield equal codes. Before
+    the codes could overflow, the codes so far are factorized, so that they are smaller than the number of rows.
+
+    :param codes: The codes of each column.
+    :param cnt_distinct: The number of distinct values of each column.
+    :return: The combined codes.
+    """
+
+    combined = codes[0]
+    cnt_combined = cnt_distinct[0]
+    for column_codes, cnt in zip(codes[1:], cnt_distinct[1:]):
+        if cnt_combined * cnt > _max_combined_code:
+            combined, distinct_codes = pd.factorize(combined)
+            cnt_combined = len(distinct_codes)
+        combined = combined * cnt + column_codes
+        cnt_combined *= cnt
+    return combined
+
+
+def _is_unique(codes: np.ndarray) -> bool:
+    return len(pd.unique(codes)) == len(codes)
+
+
 class RDFDataSetUtils:
 
     def __init__(self, dataset: pd.DataFrame = None, description: str = None, unique_sort_index: tuple = None):
@@ -1051,9 +1925,13 @@ class RDFDataSetUtils:
         self.description = description
         self.sort_order = unique_sort_index
         if dataset is not None:
-            self.checksum = self.compute_checksum()
+            self.checksum_algorithm = CHECKSUM_COLUMN_HASH_SUM_V2
+            self.checksum = self.compute_checksum(algorithm=self.checksum_algorithm)
         else:
+            self.checksum_algorithm = None
             self.checksum = None
+        # Block checksums of the Merkle tree checksum (see compute_merkle_checksum)
+        self.merkle_checksum = None
 
     def describe(self, dataset: pd.DataFrame = None, query: str = None):
         """
@@ -1065,7 +1943,9 @@ class RDFDataSetUtils:
             raise InputMissing("No dataset was provided. Either use self.dataset or this function's parameter to "
                                "pass a dataset")
         if dataset is None:
-            dataset = self.dataset.copy()
+            dataset = self.dataset if _is_arrow_table(self.dataset) else self.dataset.copy()
+        if _is_arrow_table(dataset):
+            dataset = dataset.to_pandas()
 
         # TODO: Use a natural language processor for RDF data to generate a description
         #  from the dataset and query
@@ -1095,19 +1975,34 @@ class RDFDataSetUtils:
             desc += ", ".join(": ".join((str(k), str(v))) for k, v in dataset_description['unique'].items()) + "\n"
         return desc
 
-    def compute_checksum(self, dataset: pd.DataFrame = None, column_order_dependent: bool = False) -> str:
+    def compute_checksum(self, dataset: pd.DataFrame = None, column_order_dependent: bool = False,
+                         algorithm: str = None, block_size: int = merkle_block_size) -> str:
         """
         R6 - Result set verification
-        A column order dependent or independent computation of the dataset checksum.
-
-        Algorithm:
-        Computes a checksum for each cell of the dataset. Then, a sum is calculated for each row making the
-        checksum computation independent of the column order. Last, the vector of row sums is hashed again
-        and the mean is taken.
+        A column order dependent or independent computation of the dataset checksum. Checksums can only be
+        compared if they were computed with the same algorithm. Therefore, the algorithms are versioned
+        (see CHECKSUM_ALGORITHMS) and the algorithm of older checksums can be passed to verify them.
+
+        Algorithms:
+        canonical-blake2b-v1 (column order dependent): Serializes the column names and the rows canonically (see
+        _canonical_header and _canonical_rows) and hashes the serialization with BLAKE2b (32 bytes). It depends
+        neither on pandas nor on the index of the dataset.
+        pandas-row-hash-v1 (column order dependent, legacy): Hashes each row with pandas' hash_pandas_object, which
+        includes the index. Its hash values are not guaranteed to be the same across pandas versions.
+        sha256-cell-sum-v1 (column order independent, legacy): Computes a SHA-256 checksum for each cell of
+        the dataset. Then, a sum is calculated for each row making the checksum computation independent of the
+        column order. Last, the string of row sums is hashed again.
+        column-hash-sum-v2 (column order independent): Hashes each column at once into 64-bit hash values that
+        are keyed with the column name. The hash values of a row are summed up modulo 2^64, which makes the
+        checksum independent of the column order. Last, the vector of row sums is hashed with SHA-256.
+        merkle-blake2b-v1 (column order dependent): The root of a Merkle tree over blocks of rows (see
+        compute_merkle_checksum).
 
         :param dataset:
         :param column_order_dependent: Tells the algorithm whether to make the checksum computation dependent or
-        independent of the column order.
+        independent of the column order. Only used to choose the default algorithm if no :algorithm is passed.
+        :param algorithm: The id of the checksum algorithm.
+        :param block_size: Number of rows per block of the Merkle tree checksum.
         :return:
         """
 
@@ -1115,19 +2010,51 @@ class RDFDataSetUtils:
             raise InputMissing("No dataset was provided. Either use self.dataset or this function's parameter to "
                                "pass a dataset")
         if dataset is None:
-            dataset = self.dataset.copy()
-
-        if column_order_dependent:
+            dataset = self.dataset
+        if algorithm is None:
+            algorithm = CHECKSUM_CANONICAL_V1 if column_order_dependent else CHECKSUM_COLUMN_HASH_SUM_V2
+        if algorithm not in CHECKSUM_ALGORITHMS:
+            raise ValueError("Unknown checksum algorithm {0}. Choose one of: {1}".format(
+                algorithm, ", ".join(CHECKSUM_ALGORITHMS)))
+
+        if algorithm == CHECKSUM_MERKLE_V1:
+            return self.compute_merkle_checksum(dataset, block_size).checksum
+
+        if algorithm in ResultSetChecksum.algorithms:
+            checksum = ResultSetChecksum(algorithm)
+            checksum.update(dataset)
+            return checksum.hexdigest()
+
+        def cell_hash_value(cell):
+            checksum = hashlib.sha256()
+            # numpy data types need to be converted to native python data types before they can be encoded
+            checksum.update(str.encode(str(cell)))
+            return int(checksum.hexdigest(), 16)
+
+        def coded_hash_values(codes: np.ndarray, values: Iterable) -> np.ndarray:
+            # Each distinct value is hashed once and the hash values are looked up by the codes. Missing values
+            # (code -1) take the last hash value, which is the one of None.
+            hash_values = np.array([cell_hash_value(value) for value in values] + [cell_hash_value(None)],
+                                   dtype=object)
+            return hash_values[codes]
+
+        def column_hash_values(column: pd.Series):
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                return coded_hash_values(column.cat.codes.to_numpy(), column.cat.categories)
+            return np.vectorize(cell_hash_value)(column)
+
+        if _is_arrow_table(dataset):
+            if algorithm == CHECKSUM_ROW_HASH_V1:
+                row_hashsum_series = hash_pandas_object(dataset.to_pandas())
+            else:
+                hashed_dataframe = pd.DataFrame({name: coded_hash_values(*_arrow_codes(column)) for name, column
+                                                 in zip(dataset.column_names, dataset.columns)})
+                row_hashsum_series = hashed_dataframe.sum(axis=1)
+        elif algorithm == CHECKSUM_ROW_HASH_V1:
             row_hashsum_series = hash_pandas_object(dataset)
         else:
-            def cell_hash_value(cell):
-                checksum = hashlib.sha256()
-                # numpy data types need to be converted to native python data types before they can be encoded
-                checksum.update(str.encode(str(cell)))
-                return int(checksum.hexdigest(), 16)
-
             # TODO: take care of empty result sets
-            hashed_dataframe = self.dataset.apply(np.vectorize(cell_hash_value))
+            hashed_dataframe = dataset.apply(column_hash_values)
             row_hashsum_series = hashed_dataframe.sum(axis=1)
 
         row_hashsum_series = row_hashsum_series.astype(str)
@@ -1138,7 +2065,51 @@ class RDFDataSetUtils:
         checksum = checksum.hexdigest()
         return checksum
 
-    def create_sort_index(self, dataset: pd.DataFrame = None) -> list:
+    def compute_merkle_checksum(self, dataset: pd.DataFrame = None, block_size: int = merkle_block_size,
+                                workers: int = None, yn_process_pool: bool = False) -> MerkleChecksum:
+        """
+        R6 - Result set verification
+        Computes the Merkle tree checksum (merkle-blake2b-v1) of the sorted dataset. The dataset is split into
+        blocks of :block_size rows whose canonical serializations (see _canonical_rows) are hashed in parallel.
+        The block checksums are combined into the root of a binary Merkle tree (see _merkle_root). If the block
+        checksums are stored along with the checksum, a later verification can tell which blocks of rows changed
+        (see changed_row_ranges).
+
+        The blocks are hashed in a thread pool by default. BLAKE2b releases the GIL while it hashes a block, but
+        the serialization of the rows does not. A process pool serializes the blocks in parallel, too, but the
+        blocks need to be sent to the worker processes.
+
+        :param dataset:
+        :param block_size: Number of rows per block.
+        :param workers: The number of worker threads or processes. Defaults to the number of CPUs.
+        :param yn_process_pool: If true, the blocks are hashed in worker processes instead of threads.
+        :return: The checksum, the block size and the block checksums.
+        """
+
+        if self.dataset is None and dataset is None:
+            raise InputMissing("No dataset was provided. Either use self.dataset or this function's parameter to "
+                               "pass a dataset")
+        if dataset is None:
+            dataset = self.dataset
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        blocks = _row_blocks(dataset, block_size)
+        if workers == 1 or len(blocks) <= 1:
+            block_checksums = [_merkle_block_checksum(block) for block in blocks]
+        else:
+            executor_class = ProcessPoolExecutor if yn_process_pool else ThreadPoolExecutor
+            with executor_class(max_workers=min(workers, len(blocks))) as executor:
+                block_checksums = list(executor.map(_merkle_block_checksum, blocks))
+
+        column_names = dataset.column_names if _is_arrow_table(dataset) else list(dataset.columns)
+        return MerkleChecksum(_merkle_root(column_names, block_size, block_checksums), block_size, block_checksums)
+
+    def create_sort_index(self, dataset: pd.DataFrame = None, sample_size: int = None) -> list:
         """
         Infers the primary key from a dataset.
         Two datasets with differently permuted columns but otherwise identical
@@ -1150,83 +2121,59 @@ class RDFDataSetUtils:
         (column); 2. Sum up all the counted distinct values.
         The composite keys with the maximum sum of distinct key attribute values will be returned.
 
+        The column combinations are checked by size, starting with single columns, on the integer codes of the
+        columns (see _key_codes). A combination is skipped if the product of its columns' distinct value counts is
+        smaller than the number of distinct rows or if it contains a column with a single value, because the
+        combination without that column is no key either. As the search stops at the smallest size with keys,
+        supersets of keys are never checked. With :sample_size, the combinations are checked on a random sample of
+        the distinct rows first. Only combinations that are unique within the sample can be keys of the dataset,
+        so only those are checked on all rows.
+
+        :param sample_size: Number of distinct rows to check the column combinations on before all rows are checked.
+        Worthwhile for large datasets with many columns.
         :return: A list of suggested indexes to use for sorting the dataset.
         """
         if self.dataset is None and dataset is None:
             raise InputMissing("No dataset was provided. Either use self.dataset or this function's parameter to "
                                "pass a dataset")
         if dataset is None:
-            dataset = self.dataset.copy()
+            dataset = self.dataset
+        if sample_size is not None and sample_size < 1:
+            raise ValueError("sample_size must be at least 1, not {0}".format(sample_size))
 
         # TODO: Think about whether the order of columns should yield a different permutation of key attributes
         #  within composite keys, thus, meaning a different sorting or not.
 
-        def combination_util(combos: list, arr, n, tuple_size, data, index=0, i=0):
-            """
-            Returns a dictionary with combinations of size tuple_size.
-
-            :param combos: list to be populated with the output combinations from this algorithm
-            :param arr: Input Array
-            :param n: Size of input array
-            :param tuple_size: size of a combination to be printed
-            :param index: Current index in data[]
-            :param data: temporary list to store current combination
-            :param i: index of current element in arr[]
-            :return:
-            """
-
-            # Current combination is ready, print it
-            if index == tuple_size:
-                combo = []
-                for j in range(tuple_size):
-                    combo.append(data[j])
-                combos.append(combo)
-                return
-
-            # When no more elements are there to put in data[]
-            if i >= n:
-                return
-
-            # current is included, put next at next location
-            data[index] = arr[i]
-            combination_util(combos, arr, n, tuple_size, data, index + 1, i + 1)
-
-            # current is excluded, replace it with next (Note that i+1 is passed, but index is not changed)
-            combination_util(combos, arr, n, tuple_size, data, index, i + 1)
-
-        sufficient_tuple_size = False
-        df_key_finder = dataset.copy()
-        df_key_finder.drop_duplicates(inplace=True)
-        cnt_columns = len(df_key_finder.columns)
-        columns = df_key_finder.columns
-
-        distinct_occurrences = {}
-        for column in columns:
-            distinct_occurrences[column] = len(df_key_finder[column].unique().flat)
-
-        attribute_combos_min_tuple_size = {}
-        cnt_index_attrs = 1
-        while not sufficient_tuple_size:
-            attribute_combos = []
-            combination_util(combos=attribute_combos, arr=columns, n=cnt_columns,
-                             tuple_size=cnt_index_attrs, data=[0] * cnt_index_attrs)
-            attribute_combos_unique_flags = {}
-            for combo in attribute_combos:
-                attribute_combos_unique_flags[tuple(combo)] = df_key_finder.set_index(combo).index.is_unique
-
-            if any(attribute_combos_unique_flags.values()):
-                sufficient_tuple_size = True
-                attribute_combos_min_tuple_size = attribute_combos_unique_flags
-            cnt_index_attrs += 1
+        # Dictionary-encoded columns and the columns of Arrow tables are compared by their integer codes.
+        column_names, codes, cnt_distinct = _key_codes(dataset)
+        cnt_rows = len(codes[0]) if codes else 0
+        sample_codes = None
+        if sample_size is not None and sample_size < cnt_rows:
+            sample = np.sort(np.random.default_rng(0).choice(cnt_rows, sample_size, replace=False))
+            sample_codes = [column_codes[sample] for column_codes in codes]
+
+        keys = []
+        for cnt_index_attrs in range(1, len(column_names) + 1):
+            for combo in itertools.combinations(range(len(column_names)), cnt_index_attrs):
+                combo_cnt_distinct = [cnt_distinct[i] for i in combo]
+                if functools.reduce(lambda product, cnt: product * cnt, combo_cnt_distinct, 1) < cnt_rows:
+                    continue
+                if cnt_index_attrs > 1 and 1 in combo_cnt_distinct:
+                    continue
+                if sample_codes is not None and \
+                        not _is_unique(_combined_codes([sample_codes[i] for i in combo], combo_cnt_distinct)):
+                    continue
+                if _is_unique(_combined_codes([codes[i] for i in combo], combo_cnt_distinct)):
+                    keys.append(combo)
+            if keys:
+                break
+        if not keys:
+            return []
 
         dist_stacked_key_attr_values = {}
-        for composition, is_potential_key in attribute_combos_min_tuple_size.items():
-            if is_potential_key:
-                cnt_dist_stacked_attr_values = 0
-                for attribute in composition:
-                    cnt_distinct_attribute_values = distinct_occurrences[attribute]
-                    cnt_dist_stacked_attr_values += cnt_distinct_attribute_values
-                dist_stacked_key_attr_values[composition] = cnt_dist_stacked_attr_values
+        for combo in keys:
+            composition = tuple(column_names[i] for i in combo)
+            dist_stacked_key_attr_values[composition] = sum(cnt_distinct[i] for i in combo)
 
         max_val = max(dist_stacked_key_attr_values.values())
         sort_indexes = [k for k, v in dist_stacked_key_attr_values.items() if v == max_val]
@@ -1248,7 +2195,7 @@ class RDFDataSetUtils:
             raise InputMissing("No dataset was provided. Either use self.dataset or this function's parameter to "
                                "pass a dataset")
         if dataset is None:
-            dataset = self.dataset.copy()
+            dataset = self.dataset if _is_arrow_table(self.dataset) else self.dataset.copy()
 
         if sort_index is None:
             sort_index_used = self.create_sort_index()
@@ -1260,12 +2207,25 @@ class RDFDataSetUtils:
         else:
             # The tuple is passed in a list, therefore it must be taken out first
             sort_index_used = list(sort_index)
-            is_unique = dataset.set_index(sort_index_used).index.is_unique
+            if _is_arrow_table(dataset):
+                is_unique = dataset.group_by(sort_index_used).aggregate([]).num_rows == dataset.num_rows
+            else:
+                is_unique = dataset.set_index(sort_index_used).index.is_unique
 
             if not is_unique:
                 raise NoUniqueSortIndexError("A non-unique sort index was given.")
 
         self.sort_order = sort_index_used
+        if _is_arrow_table(dataset):
+            # Strings are compared by their UTF-8 bytes, which is the order of their code points like in pandas.
+            # As with set_index, the sort columns come first.
+            # Dictionary-encoded columns cannot be sorted by Arrow and are compared by their values.
+            sort_keys = pa.table({column: dataset[column].cast(dataset[column].type.value_type)
+                                  if pa.types.is_dictionary(dataset[column].type) else dataset[column]
+                                  for column in sort_index_used})
+            order = pc.sort_indices(sort_keys, sort_keys=[(column, "ascending") for column in sort_index_used])
+            other_columns = [column for column in dataset.column_names if column not in sort_index_used]
+            return dataset.take(order).select(sort_index_used + other_columns)
         sorted_df = dataset.set_index(sort_index_used).sort_index()
         sorted_df = sorted_df.reset_index()
 
@@ -1,6 +1,8 @@
 from .query_store import QueryStore
 from .rdf_star import TripleStoreEngine
-from .persistent_id_utils import RDFDataSetUtils, QueryUtils, MetaData, generate_citation_snippet
+from .transport import SPARQLWrapperTransport
+from .persistent_id_utils import RDFDataSetUtils, QueryUtils, MetaData, ResultSetChecksum, \
+    generate_citation_snippet, changed_row_ranges, CHECKSUM_CANONICAL_V1, CHECKSUM_MERKLE_V1
 from ._helper import versioning_timestamp_format
 from ._exceptions import MissingSortVariables, SortVariablesNotInSelectError, \
     ExpressionNotCoveredException, NoUniqueSortIndexError, QueryDoesNotExistError
@@ -16,21 +18,45 @@ from typing import Callable
 # TODO:  Reconsider role "publisher" in Readme.md and change it to researcher
 
 
+def _is_sorted(keys: pd.DataFrame) -> bool:
+    """
+    :param keys: The sort columns of consecutive rows.
+    :return: True, if RDFDataSetUtils.sort would not change the order of the rows.
+    """
+
+    # Sorted like in RDFDataSetUtils.sort
+    positions = pd.Series(range(len(keys.index)), index=keys.set_index(list(keys.columns)).index).sort_index()
+    return bool((positions.to_numpy()[1:] > positions.to_numpy()[:-1]).all())
+
+
 class QueryHandler:
 
-    def __init__(self, get_endpoint: str, post_endpoint: str, credentials: TripleStoreEngine.Credentials = None):
+    def __init__(self, get_endpoint: str, post_endpoint: str, credentials: TripleStoreEngine.Credentials = None,
+                 transport: SPARQLWrapperTransport = None, yn_dictionary_encoding: bool = False,
+                 yn_merkle_checksum: bool = False):
         """
         Initializes the QueryHandler class.
 
         :param get_endpoint: RDF* store URL for get/read statements.
         :param post_endpoint:  RDF* store URL for post/write statements.
+        :param transport: See TripleStoreEngine. Pass the same PooledTransport to several QueryHandler instances
+        to let them share its connection pools.
+        :param yn_dictionary_encoding: If true, result sets are dictionary-encoded (see TripleStoreEngine.get_data).
+        The result set checksums are the same.
+        :param yn_merkle_checksum: If true, the checksums of minted result sets are Merkle tree checksums and their
+        block checksums are stored, too (see RDFDataSetUtils.compute_merkle_checksum). Then, verify and
+        mint_query_pid can tell which rows changed.
         """
-        self.sparqlapi = TripleStoreEngine(get_endpoint, post_endpoint, credentials)
+        self.sparqlapi = TripleStoreEngine(get_endpoint, post_endpoint, credentials, transport=transport)
+        self.yn_dictionary_encoding = yn_dictionary_encoding
+        self.yn_merkle_checksum = yn_merkle_checksum
 
         self.yn_query_exists = False
         self.yn_result_set_changed = False
         self.yn_unique_sort_index = False
         self.execution_timestamp = None
+        # Row ranges of the blocks that changed since the last execution (see changed_row_ranges)
+        self.changed_row_ranges = []
         self.query_utils = QueryUtils()
         self.result_set_utils = RDFDataSetUtils()
         self.citation_metadata = MetaData()
@@ -80,6 +106,7 @@ class QueryHandler:
         """
 
         query_store = QueryStore()
+        self.changed_row_ranges = []
 
         # Assign q_handler timestamp to query object
         current_datetime = datetime.now()
@@ -92,11 +119,14 @@ class QueryHandler:
 
         try:
             query_utils = QueryUtils(select_statement, execution_timestamp)
+            # QueryUtils normalizes the query on first access. Queries that cannot be normalized are not executed.
+            logging.info("Query checksum: {0}".format(query_utils.checksum))
         except ExpressionNotCoveredException as e:
             raise ExpressionNotCoveredException(e)
 
-        # Execute query
-        result_set = self.sparqlapi.get_data(select_statement, execution_timestamp)
+        # Execute query. The query was already parsed, normalized and timestamped above.
+        result_set = self.sparqlapi.get_data(query_utils, execution_timestamp,
+                                             yn_dictionary_encoding=self.yn_dictionary_encoding)
 
         # Validate order by clause
         if len(query_utils.order_by_variables) > 1:
@@ -131,7 +161,13 @@ class QueryHandler:
             rdf_ds.description = citation_metadata.result_set_description
 
         # Compute result set checksum
-        rdf_ds.checksum = rdf_ds.compute_checksum(column_order_dependent=True)
+        if self.yn_merkle_checksum:
+            rdf_ds.merkle_checksum = rdf_ds.compute_merkle_checksum()
+            rdf_ds.checksum_algorithm = CHECKSUM_MERKLE_V1
+            rdf_ds.checksum = rdf_ds.merkle_checksum.checksum
+        else:
+            rdf_ds.checksum_algorithm = CHECKSUM_CANONICAL_V1
+            rdf_ds.checksum = rdf_ds.compute_checksum(algorithm=rdf_ds.checksum_algorithm)
 
         # Get latest query q_handler and its metadata by query checksum
         existing_query_data, existing_query_rdf_ds_data, existing_query_citation_data \
@@ -140,7 +176,7 @@ class QueryHandler:
         if existing_query_data and existing_query_rdf_ds_data and existing_query_citation_data:
             logging.info("Query was found in query store.")
             self.yn_query_exists = True
-            if rdf_ds.checksum == existing_query_rdf_ds_data.checksum:
+            if self._compare_checksums(rdf_ds, existing_query_rdf_ds_data):
                 self.query_utils = existing_query_data
                 self.result_set_utils = existing_query_rdf_ds_data
                 self.citation_metadata = existing_query_citation_data
@@ -179,7 +215,7 @@ class QueryHandler:
             query_store.store(query_utils, rdf_ds, self.citation_metadata, yn_new_query=True)
             logging.info("A new query q_handler with PID {0} was stored in the query store.".format(query_utils.pid))
 
-    def retrieve(self, query_pid: str) -> [pd.DataFrame, str]:
+    def retrieve(self, query_pid: str, yn_arrow_table: bool = False) -> [pd.DataFrame, str]:
         """
         Retrieves metadata (query data, dataset metadata, q_handler metadata) including q_handler snippet
         as a JSON representation to foster machine actionability and the dataset as pandas dataframe.
@@ -197,6 +233,7 @@ class QueryHandler:
         [1]: Data QueryHandler of Evolving Data: Andreas Rauber, Ari Asmi, Dieter van Uytvanck and Stefan Pröll
 
         :param query_pid:
+        :param yn_arrow_table: If true, the dataset is returned as pyarrow Table (see TripleStoreEngine.get_data).
         :return: The historic dataset.
         """
 
@@ -206,7 +243,9 @@ class QueryHandler:
             query_data, result_set_data, citation_metadata = query_store.get_query(query_pid)
         except QueryDoesNotExistError as e:
             raise QueryDoesNotExistError("{0} The query and its metadata will not be retrieved.".format(e))
-        result_set_data.dataset = self.sparqlapi.get_data(query_data.timestamped_query, yn_timestamp_query=False)
+        result_set_data.dataset = self.sparqlapi.get_data(query_data.timestamped_query, yn_timestamp_query=False,
+                                                          yn_dictionary_encoding=self.yn_dictionary_encoding,
+                                                          yn_arrow_table=yn_arrow_table)
         metadata = json.dumps({'query_data': {'query': query_data.query,
                                               'timestamped_query': query_data.timestamped_query,
                                               'prefixes': query_data.sparql_prefixes,
@@ -217,7 +256,8 @@ class QueryHandler:
                                               'checksum': query_data.checksum},
                                'dataset_metadata': {'description': result_set_data.description,
                                                     'sort_order': result_set_data.sort_order,
-                                                    'checksum': result_set_data.checksum},
+                                                    'checksum': result_set_data.checksum,
+                                                    'checksum_algorithm': result_set_data.checksum_algorithm},
                                'citation_metadata': {'identifier': citation_metadata.identifier,
                                                      'creator': citation_metadata.creator,
                                                      'title': citation_metadata.title,
@@ -229,5 +269,121 @@ class QueryHandler:
 
         return [result_set_data.dataset, metadata]
 
+    def verify(self, query_pid: str, chunksize: int = None) -> bool:
+        """
+        R6 - Result set verification
+        Re-executes the timestamped query of :query_pid and compares the checksum of the result set with the
+        checksum that was stored when the PID was minted, using the same checksum algorithm.
+
+        With a chunksize, the checksum is computed chunk by chunk while the result set is downloaded
+        (see ResultSetChecksum), so the memory use does not grow with the result set. This relies on the RDF store
+        returning the rows in the order that RDFDataSetUtils.sort yields for the formatted terms. The store orders
+        typed literals, e.g. numbers and dates, by their values, though. If a chunk is out of order or if the stored
+        checksum cannot be computed chunk by chunk (see ResultSetChecksum.algorithms), the result set is verified as
+        a whole. Without a chunksize, the result set is sorted like in mint_query_pid.
+
+        :param query_pid:
+        :param chunksize: Number of rows per chunk.
+        :return: True, if the result set has not changed since the PID was minted.
+        """
+
+        query_store = QueryStore()
+        self.changed_row_ranges = []
+        try:
+            query_data, result_set_data, citation_metadata = query_store.get_query(query_pid)
+        except QueryDoesNotExistError as e:
+            raise QueryDoesNotExistError("{0} The result set will not be verified.".format(e))
+        sort_order = result_set_data.sort_order.split(", ")
+
+        yn_unchanged = None
+        if chunksize is not None:
+            if result_set_data.checksum_algorithm in ResultSetChecksum.algorithms:
+                yn_unchanged = self._verify_chunks(query_data, result_set_data, sort_order, chunksize)
+                if yn_unchanged is None:
+                    logging.info("The RDF store does not return the result set of the query with PID {0} in the "
+                                 "sort order of its checksum. It is verified as a whole.".format(query_pid))
+            else:
+                logging.info("The checksum algorithm {0} of the query with PID {1} cannot be computed chunk by "
+                             "chunk. The result set is verified as a whole.".format(
+                                result_set_data.checksum_algorithm, query_pid))
+
+        if yn_unchanged is None:
+            rdf_ds = RDFDataSetUtils()
+            dataset = self.sparqlapi.get_data(query_data.timestamped_query, yn_timestamp_query=False,
+                                              yn_dictionary_encoding=self.yn_dictionary_encoding)
+            rdf_ds.dataset = rdf_ds.sort(tuple(sort_order), dataset)
+            yn_unchanged = self._compare_checksums(rdf_ds, result_set_data)
+
+        if yn_unchanged:
+            logging.info("The result set of the query with PID {0} has not changed.".format(query_pid))
+            return True
+        logging.info("The result set of the query with PID {0} has changed.".format(query_pid))
+        if self.changed_row_ranges:
+            logging.info("Changed rows: {0}".format(", ".join(
+                "{0}-{1}".format(row_range.start, row_range.stop - 1) for row_range in self.changed_row_ranges)))
+        return False
+
+    def _verify_chunks(self, query_data: QueryUtils, result_set_data: RDFDataSetUtils, sort_order: list,
+                       chunksize: int):
+        """
+        Computes the checksum of the re-executed timestamped query chunk by chunk and compares it with the stored
+        checksum.
+
+        :param query_data: The query data from the query store.
+        :param result_set_data: The result set metadata from the query store.
+        :param sort_order: The sort columns of the result set.
+        :param chunksize: Number of rows per chunk.
+        :return: True, if the checksums are the same, or None if the rows were not returned in the order of
+        RDFDataSetUtils.sort.
+        """
+
+        stored_merkle_checksum = result_set_data.merkle_checksum
+        if stored_merkle_checksum is None:
+            result_set_checksum = ResultSetChecksum(result_set_data.checksum_algorithm)
+        else:
+            result_set_checksum = ResultSetChecksum(result_set_data.checksum_algorithm,
+                                                    stored_merkle_checksum.block_size)
+        last_keys = None
+        for chunk in self.sparqlapi.get_data(query_data.timestamped_query, yn_timestamp_query=False,
+                                             chunksize=chunksize, yn_dictionary_encoding=self.yn_dictionary_encoding):
+            # The first row of a chunk must follow the last row of the previous chunk.
+            keys = chunk[sort_order] if last_keys is None else pd.concat([last_keys, chunk[sort_order]])
+            if not _is_sorted(keys):
+                return None
+            last_keys = chunk[sort_order].iloc[-1:]
+            # The sorted result set starts with the sort columns (see RDFDataSetUtils.sort)
+            result_set_checksum.update(chunk[sort_order + [c for c in chunk.columns if c not in sort_order]])
+
+        if stored_merkle_checksum is not None:
+            self.changed_row_ranges = changed_row_ranges(stored_merkle_checksum,
+                                                         result_set_checksum.merkle_checksum())
+        return result_set_checksum.hexdigest() == result_set_data.checksum
+
+    def _compare_checksums(self, rdf_ds: RDFDataSetUtils, stored_rdf_ds: RDFDataSetUtils) -> bool:
+        """
+        Compares the checksum of the result set in :rdf_ds with a stored checksum. The stored checksum might have
+        been computed with another algorithm than the current one, so the checksum of :rdf_ds is computed with the
+        stored algorithm if necessary. If block checksums were stored, the row ranges of the blocks that changed
+        are kept in self.changed_row_ranges.
+
+        :param rdf_ds: The sorted result set.
+        :param stored_rdf_ds: The result set metadata from the query store.
+        :return: True, if the checksums are the same.
+        """
+
+        stored_merkle_checksum = stored_rdf_ds.merkle_checksum
+        if stored_merkle_checksum is not None:
+            merkle_checksum = rdf_ds.merkle_checksum
+            if merkle_checksum is None or merkle_checksum.block_size != stored_merkle_checksum.block_size:
+                merkle_checksum = rdf_ds.compute_merkle_checksum(block_size=stored_merkle_checksum.block_size)
+            self.changed_row_ranges = changed_row_ranges(stored_merkle_checksum, merkle_checksum)
+            return merkle_checksum.checksum == stored_rdf_ds.checksum
+
+        if stored_rdf_ds.checksum_algorithm == rdf_ds.checksum_algorithm:
+            checksum = rdf_ds.checksum
+        else:
+            checksum = rdf_ds.compute_checksum(algorithm=stored_rdf_ds.checksum_algorithm)
+        return checksum == stored_rdf_ds.checksum
+
 
 
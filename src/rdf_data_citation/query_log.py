@@ -0,0 +1,155 @@
+"""
+Finds semantically identical queries in a SPARQL query log. The queries are normalized in parallel processes
+(see persistent_id_utils.normalize_many) and grouped by their checksum. Each checksum group is written as one
+JSON object per line, the largest groups first:
+
+    {"query_checksum": "...", "cnt_queries": 3, "query_indexes": [0, 7, 12], "normal_query": "..."}
+
+The query indexes are the positions of the queries in the log. Optionally, one query per checksum group is
+stored in the query_hub table of the query store, so that the query store knows the queries before they are cited.
+
+    python -m rdf_data_citation.query_log query_log.txt -o checksum_groups.jsonl --workers 8 --seed-query-hub
+"""
+
+from .persistent_id_utils import QueryUtils, _map_queries, _normalization_result
+from .query_store import QueryStore
+from typing import Iterator, Iterable
+import argparse
+import json
+import logging
+import sys
+
+
+def read_query_log(path: str, delimiter: str = None) -> Iterator[str]:
+    """
+    Reads the queries of a query log lazily.
+
+    :param path: Path to the query log.
+    :param delimiter: The line that separates two queries, e.g. "" for queries that are separated by empty lines.
+    If None, each non-empty line is a query.
+    :return: The queries in the order of the query log.
+    """
+
+    with open(path, "r") as query_log:
+        if delimiter is None:
+            for line in query_log:
+                if line.strip():
+                    yield line.rstrip("\r\n")
+            return
+
+        lines = []
+        for line in query_log:
+            if line.strip() == delimiter.strip():
+                if "".join(lines).strip():
+                    yield "".join(lines)
+                lines = []
+            else:
+                lines.append(line)
+        if "".join(lines).strip():
+            yield "".join(lines)
+
+
+def _query_hub_record(query: str) -> tuple:
+    query_utils = QueryUtils(query)
+    query_hub_record = {'query_checksum': query_utils.checksum,
+                        'orig_query': query_utils.query,
+                        'query_prefixes': query_utils.sparql_prefixes,
+                        'normal_query_algebra': str(query_utils.normal_query_algebra.algebra),
+                        'normal_query': query_utils.normal_query,
+                        'timestamp_template': query_utils.timestamp_template}
+    return query_utils.checksum, query_utils.normal_query, query_hub_record
+
+
+def group_by_checksum(queries: Iterable[str], workers: int = None, chunksize: int = 16,
+                      yn_query_hub_records: bool = False) -> tuple:
+    """
+    Normalizes the queries in parallel processes and groups them by their checksum.
+
+    :param queries:
+    :param workers: The number of worker processes. Defaults to the number of CPUs.
+    :param chunksize: The number of queries that are sent to a worker process at once.
+    :param yn_query_hub_records: If True, the query_hub record of the first query of each group is returned.
+    :return: The checksum groups as dictionaries (see module description), a list of (query index, error) tuples
+    for the queries that could not be normalized and a dictionary of query_hub records by checksum.
+    """
+
+    function = _query_hub_record if yn_query_hub_records else _normalization_result
+    groups = {}
+    errors = []
+    query_hub_records = {}
+    for index, result, error in _map_queries(function, queries, workers, chunksize):
+        if error is not None:
+            logging.debug("Query {0} could not be normalized: {1}".format(index, error))
+            errors.append((index, error))
+            continue
+        checksum, normal_query = result[0], result[1]
+        if checksum not in groups:
+            groups[checksum] = {'query_checksum': checksum, 'cnt_queries': 0, 'query_indexes': [],
+                                'normal_query': normal_query}
+            if yn_query_hub_records:
+                query_hub_records[checksum] = result[2]
+        groups[checksum]['cnt_queries'] += 1
+        groups[checksum]['query_indexes'].append(index)
+
+    # The results arrive in the order in which the worker processes finish.
+    for group in groups.values():
+        group['query_indexes'].sort()
+    checksum_groups = sorted(groups.values(), key=lambda g: (-g['cnt_queries'], g['query_indexes'][0]))
+    errors.sort(key=lambda e: e[0])
+
+    return checksum_groups, errors, query_hub_records
+
+
+def main(argv: list = None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Groups the queries of a SPARQL query log by the checksum of "
+                                                     "their normal query.")
+    arg_parser.add_argument("query_log", help="Path to the query log.")
+    arg_parser.add_argument("-o", "--output", default="-",
+                            help="File to which the checksum groups are written. Defaults to stdout.")
+    arg_parser.add_argument("-d", "--delimiter", default=None,
+                            help="Line that separates two queries, e.g. '' for empty lines. "
+                                 "By default, each line is a query.")
+    arg_parser.add_argument("-w", "--workers", type=int, default=None,
+                            help="Number of worker processes. Defaults to the number of CPUs.")
+    arg_parser.add_argument("--chunksize", type=int, default=16,
+                            help="Number of queries that are sent to a worker process at once.")
+    arg_parser.add_argument("--errors", default=None,
+                            help="File to which the indexes and errors of the queries that could not be normalized "
+                                 "are written.")
+    arg_parser.add_argument("--seed-query-hub", action="store_true",
+                            help="Store one query per checksum group in the query_hub table of the query store.")
+    args = arg_parser.parse_args(argv)
+
+    checksum_groups, errors, query_hub_records = group_by_checksum(read_query_log(args.query_log, args.delimiter),
+                                                                   args.workers, args.chunksize,
+                                                                   args.seed_query_hub)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for group in checksum_groups:
+            output.write(json.dumps(group) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if args.errors is not None:
+        with open(args.errors, "w") as errors_file:
+            for index, error in errors:
+                errors_file.write(json.dumps({'query_index': index,
+                                              'error': "{0}: {1}".format(type(error).__name__, error)}) + "\n")
+
+    cnt_queries = sum(group['cnt_queries'] for group in checksum_groups) + len(errors)
+    cnt_duplicates = cnt_queries - len(checksum_groups) - len(errors)
+    print("{0} queries, {1} checksum groups, {2} duplicates ({3:.1%}), {4} errors".format(
+        cnt_queries, len(checksum_groups), cnt_duplicates, cnt_duplicates / cnt_queries if cnt_queries else 0,
+        len(errors)), file=sys.stderr)
+
+    if args.seed_query_hub:
+        cnt_seeded = QueryStore().seed_query_hub(list(query_hub_records.values()))
+        print("{0} queries were seeded into the query_hub table".format(cnt_seeded), file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
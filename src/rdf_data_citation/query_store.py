@@ -1,12 +1,28 @@
-from .persistent_id_utils import QueryUtils, RDFDataSetUtils, MetaData
+from .persistent_id_utils import QueryUtils, RDFDataSetUtils, MetaData, NormalizedQuery, normalizer_version, \
+    _dumps_normalized_query, _loads_normalized_query, MerkleChecksum, CHECKSUM_ROW_HASH_V1
 from ._helper import template_path
 from ._exceptions import QueryExistsError, QueryDoesNotExistError
 import sqlalchemy as sql
 from sqlalchemy import exc
 import pandas as pd
+import hashlib
+import json
 import logging
 
 
+def _dumps_block_checksums(merkle_checksum: MerkleChecksum) -> str:
+    if merkle_checksum is None:
+        return None
+    return json.dumps({'block_size': merkle_checksum.block_size, 'block_checksums': merkle_checksum.block_checksums})
+
+
+def _loads_block_checksums(checksum: str, block_checksums: str) -> MerkleChecksum:
+    if block_checksums is None:
+        return None
+    block_checksums = json.loads(block_checksums)
+    return MerkleChecksum(checksum, block_checksums['block_size'], block_checksums['block_checksums'])
+
+
 class QueryStore:
 
     def __init__(self):
@@ -20,6 +36,20 @@ class QueryStore:
         logging.debug(db_path)
         self._engine = sql.create_engine("sqlite:///{0}".format(db_path))
 
+        # Query stores that were created before timestamp templates were introduced lack the column.
+        with self._engine.connect() as connection:
+            columns = [column[1] for column in connection.execute("pragma table_info(query_hub)").fetchall()]
+            if columns and 'timestamp_template' not in columns:
+                connection.execute("alter table query_hub add column timestamp_template CHAR (4000)")
+            # Result set checksums that were stored before checksum algorithms were versioned were computed with
+            # pandas' hash_pandas_object.
+            columns = [column[1] for column in connection.execute("pragma table_info(query_satellite)").fetchall()]
+            if columns and 'result_set_checksum_algorithm' not in columns:
+                connection.execute("alter table query_satellite add column result_set_checksum_algorithm CHAR (200) "
+                                   "default '{0}'".format(CHECKSUM_ROW_HASH_V1))
+            if columns and 'result_set_block_checksums' not in columns:
+                connection.execute("alter table query_satellite add column result_set_block_checksums CHAR (4000)")
+
     def _remove(self, query_checksum):
         """
         Removes a query with a given query checksum from the query store. This function is not intended to be used
@@ -70,9 +100,13 @@ class QueryStore:
                 query_data.normal_query = df.normal_query.loc[0]
                 query_data.sparql_prefixes = df.query_prefixes.loc[0]
                 query_data.execution_timestamp = df.execution_timestamp.loc[0]
+                query_data.timestamp_template = df.timestamp_template.loc[0]
 
                 result_set_data = RDFDataSetUtils()
                 result_set_data.checksum = df.result_set_checksum.loc[0]
+                result_set_data.checksum_algorithm = df.result_set_checksum_algorithm.loc[0]
+                result_set_data.merkle_checksum = _loads_block_checksums(df.result_set_checksum.loc[0],
+                                                                         df.result_set_block_checksums.loc[0])
                 result_set_data.description = df.result_set_description.loc[0]
                 result_set_data.sort_order = df.result_set_sort_order.loc[0]
 
@@ -115,9 +149,13 @@ class QueryStore:
                 query_data.normal_query = df.normal_query.loc[0]
                 query_data.sparql_prefixes = df.query_prefixes.loc[0]
                 query_data.execution_timestamp = df.execution_timestamp.loc[0]
+                query_data.timestamp_template = df.timestamp_template.loc[0]
 
                 result_set_data = RDFDataSetUtils()
                 result_set_data.checksum = df.result_set_checksum.loc[0]
+                result_set_data.checksum_algorithm = df.result_set_checksum_algorithm.loc[0]
+                result_set_data.merkle_checksum = _loads_block_checksums(df.result_set_checksum.loc[0],
+                                                                         df.result_set_block_checksums.loc[0])
                 result_set_data.description = df.result_set_description.loc[0]
                 result_set_data.sort_order = df.result_set_sort_order.loc[0]
 
@@ -132,6 +170,24 @@ class QueryStore:
             except Exception as e:
                 logging.error(e)
 
+    def get_timestamp_template(self, query_checksum: str) -> str:
+        """
+        Retrieves the timestamp template of the query with the checksum :query_checksum. Pass it together with
+        a timestamp to persistent_id_utils.fill_timestamp_template to get the timestamped query without parsing
+        the query.
+
+        :param query_checksum:
+        :return: The timestamp template or None if the query does not exist or has no template.
+        """
+
+        select_statement = open("{0}/select_timestamp_template.sql".format(self._path_to_templates), "r").read()
+        with self._engine.connect() as connection:
+            result = connection.execute(select_statement, query_checksum=query_checksum).fetchone()
+
+        if result is None:
+            return None
+        return result[0]
+
     def store(self, query_data: QueryUtils, rs_data: RDFDataSetUtils, meta_data: MetaData, yn_new_query=True):
         """
         R9 - Store Query
@@ -161,6 +217,9 @@ class QueryStore:
         insert_statement = open("{0}/store_insert_query_hub.sql".format(self._path_to_templates), "r").read()
         insert_statement_2 = open("{0}/store_insert_query_satellite.sql".format(self._path_to_templates), "r").read()
         update_statement = open("{0}/store_update_query_hub.sql".format(self._path_to_templates), "r").read()
+        update_template_statement = open("{0}/store_update_timestamp_template.sql".format(self._path_to_templates),
+                                         "r").read()
+        select_cnt_executions = open("{0}/select_cnt_executions.sql".format(self._path_to_templates), "r").read()
 
         with self._engine.connect() as connection:
             if yn_new_query:
@@ -170,19 +229,32 @@ class QueryStore:
                                        orig_query=query_data.query,
                                        query_prefixes=query_data.sparql_prefixes,
                                        normal_query_algebra=str(query_data.normal_query_algebra.algebra),
-                                       normal_query=query_data.normal_query)
+                                       normal_query=query_data.normal_query,
+                                       timestamp_template=query_data.timestamp_template)
                     logging.info("New query with checksum {0} and PID {1} stored".format(query_data.checksum,
                                                                                          query_data.pid))
                 except exc.IntegrityError:
-                    raise QueryExistsError("A query is trying to be inserted that exists already. "
-                                           "The checksum of the executed query "
-                                           "is found within the query_hub table: {0}".format(query_data.checksum))
+                    # Queries that were seeded from a query log (see seed_query_hub) have not been executed yet.
+                    if connection.execute(select_cnt_executions, query_checksum=query_data.checksum).scalar() > 0:
+                        raise QueryExistsError("A query is trying to be inserted that exists already. "
+                                               "The checksum of the executed query "
+                                               "is found within the query_hub table: {0}".format(query_data.checksum))
+                    connection.execute(update_template_statement,
+                                       query_checksum=query_data.checksum,
+                                       timestamp_template=query_data.timestamp_template)
+            else:
+                # Queries that were stored before timestamp templates were introduced do not have one yet.
+                connection.execute(update_template_statement,
+                                   query_checksum=query_data.checksum,
+                                   timestamp_template=query_data.timestamp_template)
             try:
                 connection.execute(insert_statement_2,
                                    query_pid=query_data.pid,
                                    query_checksum=query_data.checksum,
                                    timestamped_query=query_data.timestamped_query,
                                    result_set_checksum=rs_data.checksum,
+                                   result_set_checksum_algorithm=rs_data.checksum_algorithm,
+                                   result_set_block_checksums=_dumps_block_checksums(rs_data.merkle_checksum),
                                    result_set_description=rs_data.description,
                                    result_set_sort_order=", ".join(rs_data.sort_order),
                                    citation_data=meta_data.to_json(),
@@ -202,4 +274,123 @@ class QueryStore:
             except Exception:
                 logging.error("Could not update the last execution PID in query_hub.last_execution_pid")
 
+    def seed_query_hub(self, query_hub_records: list) -> int:
+        """
+        Stores queries in the query_hub table without executing them, e.g. the distinct queries of a query log
+        (see query_log.py). A seeded query is cited like a new query on its first execution. Queries whose checksum
+        already exists in the query_hub table are skipped.
+
+        :param query_hub_records: Dictionaries with the keys query_checksum, orig_query, query_prefixes,
+        normal_query_algebra, normal_query and timestamp_template.
+        :return: The number of queries that were stored.
+        """
+
+        if not query_hub_records:
+            return 0
+        insert_statement = open("{0}/store_seed_query_hub.sql".format(self._path_to_templates), "r").read()
+        with self._engine.connect() as connection:
+            result = connection.execute(insert_statement, query_hub_records)
+            logging.info("{0} queries were seeded into the query_hub table".format(result.rowcount))
+
+        return result.rowcount
+
+
+class PersistentNormalizationCache:
+
+    def __init__(self, db_path: str = None):
+        """
+        An on-disk cache for the normalization results of QueryUtils that is shared by all processes using the same
+        database file, e.g. the workers of a web service, and survives restarts. Entries are keyed by the SHA-256 of
+        the query prefixes and select statement and tagged with the normalizer version. Entries of other versions
+        are ignored and overwritten. Use it as second level cache of the NormalizationCache:
+        normalization_cache.persistent_cache = PersistentNormalizationCache()
+
+        The entries are pickled, so the database file must not be writable by untrusted parties.
+
+        :param db_path: Path to the SQLite database file. It will be created if it does not exist.
+        Default: persistence/normalization_cache.db
+        """
+
+        if db_path is None:
+            db_path = template_path("persistence/normalization_cache.db")
+        logging.debug(db_path)
+        self._engine = sql.create_engine("sqlite:///{0}".format(db_path))
+        self.normalizer_version = normalizer_version()
+
+        with self._engine.connect() as connection:
+            # Lets the reading processes proceed while another process writes.
+            connection.execute("pragma journal_mode=wal")
+            connection.execute("create table if not exists normalization_cache("
+                               "query_hash text primary key, "
+                               "normalizer_version text not null, "
+                               "normalized_query blob not null)")
+
+    @staticmethod
+    def _query_hash(sparql_prefixes: str, query: str) -> str:
+        query_hash = hashlib.sha256()
+        query_hash.update(str.encode(sparql_prefixes + "\n" + query))
+        return query_hash.hexdigest()
+
+    def get(self, sparql_prefixes: str, query: str) -> NormalizedQuery:
+        """
+        :param sparql_prefixes: The query prefixes as returned by split_prefixes_query.
+        :param query: The select statement as returned by split_prefixes_query.
+        :return: The cached NormalizedQuery or None if the query is not cached with the current normalizer version.
+        """
+
+        select_statement = "select normalized_query from normalization_cache " \
+                           "where query_hash = :query_hash and normalizer_version = :normalizer_version"
+        try:
+            with self._engine.connect() as connection:
+                result = connection.execute(select_statement, query_hash=self._query_hash(sparql_prefixes, query),
+                                            normalizer_version=self.normalizer_version).fetchone()
+            if result is None:
+                return None
+            return _loads_normalized_query(result[0])
+        except Exception as e:
+            logging.error(e)
+            return None
+
+    def put(self, sparql_prefixes: str, query: str, normalized_query: NormalizedQuery):
+        """
+        Caches :normalized_query. An existing entry of the same query is replaced.
+
+        :param sparql_prefixes:
+        :param query:
+        :param normalized_query:
+        :return:
+        """
+
+        insert_statement = "insert or replace into normalization_cache(query_hash, normalizer_version, " \
+                           "normalized_query) values (:query_hash, :normalizer_version, :normalized_query)"
+        try:
+            with self._engine.connect() as connection:
+                connection.execute(insert_statement, query_hash=self._query_hash(sparql_prefixes, query),
+                                   normalizer_version=self.normalizer_version,
+                                   normalized_query=_dumps_normalized_query(normalized_query))
+        except Exception as e:
+            logging.error(e)
+
+    def invalidate(self, sparql_prefixes: str, query: str) -> bool:
+        """
+        Removes a single query from the cache.
 
+        :return: True if the query was cached.
+        """
+
+        delete_statement = "delete from normalization_cache where query_hash = :query_hash"
+        with self._engine.connect() as connection:
+            result = connection.execute(delete_statement, query_hash=self._query_hash(sparql_prefixes, query))
+        return result.rowcount > 0
+
+    def remove_outdated(self) -> int:
+        """
+        Removes all entries that were created with another normalizer version.
+
+        :return: The number of removed entries.
+        """
+
+        delete_statement = "delete from normalization_cache where normalizer_version != :normalizer_version"
+        with self._engine.connect() as connection:
+            result = connection.execute(delete_statement, normalizer_version=self.normalizer_version)
+        return result.rowcount
@@ -0,0 +1,245 @@
+from ._exceptions import WrongInputFormatException
+from typing import Iterator
+import gzip
+import re
+
+
+def _parse_term(line: str, pos: int) -> int:
+    """
+    Finds the end of the N-Triples(-star) term that starts at :pos.
+
+    :param line:
+    :param pos: The position of the first character of the term.
+    :return: The position after the term.
+    """
+
+    if line.startswith("<<", pos):
+        pos = _skip_whitespace(line, pos + 2)
+        for _ in range(3):
+            pos = _skip_whitespace(line, _parse_term(line, pos))
+        if not line.startswith(">>", pos):
+            raise WrongInputFormatException("Quoted triple is not closed: {0}".format(line))
+        return pos + 2
+    if line.startswith("<", pos):
+        end = line.find(">", pos)
+        if end == -1:
+            raise WrongInputFormatException("IRI is not closed: {0}".format(line))
+        return end + 1
+    if line.startswith("_:", pos):
+        end = pos
+        while end < len(line) and not line[end].isspace() and not line.startswith(">>", end):
+            end += 1
+        return end
+    if line.startswith('"', pos):
+        end = pos + 1
+        while end < len(line) and line[end] != '"':
+            end += 2 if line[end] == "\\" else 1
+        if end >= len(line):
+            raise WrongInputFormatException("Literal is not closed: {0}".format(line))
+        end += 1
+        if line.startswith("^^", end):
+            return _parse_term(line, end + 2)
+        if line.startswith("@", end):
+            while end < len(line) and not line[end].isspace() and not line.startswith(">>", end):
+                end += 1
+        return end
+    raise WrongInputFormatException("Unknown term at position {0}: {1}".format(pos, line))
+
+
+def _skip_whitespace(line: str, pos: int) -> int:
+    while pos < len(line) and line[pos].isspace():
+        pos += 1
+    return pos
+
+
+def parse_ntriples_line(line: str) -> tuple:
+    """
+    Splits an N-Triples(-star) statement into its subject, predicate and object in n3 syntax.
+
+    :param line: One line of an N-Triples(-star) file.
+    :return: (subject, predicate, object) or None if the line is empty or a comment.
+    """
+
+    pos = _skip_whitespace(line, 0)
+    if pos == len(line) or line[pos] == "#":
+        return None
+    terms = []
+    for _ in range(3):
+        end = _parse_term(line, pos)
+        terms.append(line[pos:end])
+        pos = _skip_whitespace(line, end)
+    if not line.startswith(".", pos):
+        raise WrongInputFormatException("Statement does not end with '.': {0}".format(line))
+    return tuple(terms)
+
+
+def has_blank_node(term: str) -> bool:
+    """
+    :param term: A term in n3 syntax.
+    :return: True if the term is a blank node or a quoted triple that contains a blank node.
+    """
+
+    if term.startswith("_:"):
+        return True
+    if term.startswith("<<"):
+        return any(has_blank_node(t) for t in parse_ntriples_line(term[2:-2] + " ."))
+    return False
+
+
+def skolemize(term: str, skolem_base: str) -> str:
+    """
+    Replaces the blank nodes of a term with IRIs (see RDF 1.1 Concepts, 3.5 Replacing Blank Nodes with IRIs).
+    The same blank node label always yields the same IRI.
+
+    :param term: A term in n3 syntax.
+    :param skolem_base: The IRI prefix to which the blank node labels are appended.
+    :return: The term with IRIs instead of blank nodes.
+    """
+
+    if term.startswith("_:"):
+        return "<{0}{1}>".format(skolem_base, term[2:])
+    if term.startswith("<<"):
+        return "<< {0} >>".format(" ".join(skolemize(t, skolem_base) for t in parse_ntriples_line(term[2:-2] + " .")))
+    return term
+
+
+# Strings, IRIs and comments (group 1), which are kept as they are, or blank node labels (group 2).
+_turtle_blank_node_label = re.compile(r'("""(?:[^"\\]|\\.|"(?!""))*"""|\'\'\'(?:[^\'\\]|\\.|\'(?!\'\'))*\'\'\'|'
+                                      r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|<[^<>\s]*>|#[^\n]*)|'
+                                      r'(?<![\w:])_:([^\s,;()\[\]<>"\'#.]+(?:\.+[^\s,;()\[\]<>"\'#.]+)*)')
+
+
+def skolemize_turtle(text: str, skolem_base: str) -> str:
+    """
+    Replaces the blank node labels of a Turtle statement with IRIs like skolemize. Anonymous blank nodes, e.g.
+    blank node property lists, are kept, because they cannot be referenced from other statements.
+
+    :param text: A Turtle statement.
+    :param skolem_base: The IRI prefix to which the blank node labels are appended.
+    :return: The statement with IRIs instead of blank node labels.
+    """
+
+    return _turtle_blank_node_label.sub(
+        lambda match: match.group(1) or "<{0}{1}>".format(skolem_base, match.group(2)), text)
+
+
+def open_rdf_file(path: str):
+    """
+    Opens an RDF file for reading. Files that end with .gz are decompressed on the fly.
+
+    :param path:
+    :return: A text file object.
+    """
+
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def read_ntriples(path: str) -> Iterator[tuple]:
+    """
+    Reads the triples of an N-Triples(-star) file lazily. Files that end with .gz are decompressed.
+
+    :param path:
+    :return: (subject, predicate, object) tuples in n3 syntax.
+    """
+
+    with open_rdf_file(path) as ntriples:
+        for line in ntriples:
+            triple = parse_ntriples_line(line)
+            if triple is not None:
+                yield triple
+
+
+_turtle_special_characters = re.compile(r"""[<"'#.\[\]()]""")
+_sparql_directive = re.compile(r"(PREFIX\s+[^\s:]*:\s*<[^>]*>|BASE\s+<[^>]*>)\s*", re.IGNORECASE)
+
+
+def _end_of_string(line: str, pos: int, quote: str) -> int:
+    """
+    :return: The position after the closing :quote of the string that continues at :pos or -1 if the string is not
+    closed within :line.
+    """
+
+    while pos < len(line):
+        if line[pos] == "\\":
+            pos += 2
+        elif line.startswith(quote, pos):
+            return pos + len(quote)
+        else:
+            pos += 1
+    return -1
+
+
+def read_turtle_statements(path: str) -> Iterator[tuple]:
+    """
+    Splits a Turtle file lazily into its directives and statements without parsing them. A statement ends with
+    a '.' outside of IRIs, strings, comments, blank node property lists and collections.
+
+    :param path: A Turtle file. Files that end with .gz are decompressed.
+    :return: (yn_directive, text) tuples, where text is one directive or one statement.
+    """
+
+    def split_directives(text: str) -> Iterator[tuple]:
+        text = text.strip()
+        while text.startswith("#"):
+            text = text[text.find("\n") + 1:].strip() if "\n" in text else ""
+        if text.startswith("@"):
+            yield True, text
+            return
+        # SPARQL style directives do not end with a '.' and therefore precede the statement in the same text.
+        match = _sparql_directive.match(text)
+        while match:
+            yield True, match.group(1)
+            text = text[match.end():]
+            match = _sparql_directive.match(text)
+        if text.strip():
+            yield False, text
+
+    statement = []
+    quote = None
+    depth = 0
+    with open_rdf_file(path) as turtle:
+        for line_number, line in enumerate(turtle, start=1):
+            start = 0
+            pos = 0
+            while pos < len(line):
+                if quote is not None:
+                    pos = _end_of_string(line, pos, quote)
+                    if pos == -1:
+                        if len(quote) == 1:
+                            raise WrongInputFormatException("String is not closed in line {0}: {1}"
+                                                            .format(line_number, line))
+                        break
+                    quote = None
+                    continue
+
+                match = _turtle_special_characters.search(line, pos)
+                if match is None:
+                    break
+                character = match.group()
+                pos = match.end()
+                if character == "<":
+                    pos = line.find(">", pos) + 1
+                    if pos == 0:
+                        raise WrongInputFormatException("IRI is not closed in line {0}: {1}"
+                                                        .format(line_number, line))
+                elif character in "\"'":
+                    quote = character * 3 if line.startswith(character * 3, match.start()) else character
+                    pos = match.start() + len(quote)
+                elif character == "#":
+                    break
+                elif character in "[(":
+                    depth += 1
+                elif character in "])":
+                    depth -= 1
+                elif depth == 0 and (pos == len(line) or line[pos].isspace() or line[pos] == "#"):
+                    statement.append(line[start:pos])
+                    start = pos
+                    yield from split_directives("".join(statement))
+                    statement = []
+            statement.append(line[start:])
+
+    if quote is not None:
+        raise WrongInputFormatException("String is not closed at the end of {0}".format(path))
+    yield from split_directives("".join(statement))
@@ -2,54 +2,129 @@ from .persistent_id_utils import QueryUtils
 from ._helper import template_path, versioning_timestamp_format
 from .prefixes import versioning_prefixes, split_prefixes_query
 from ._exceptions import RDFStarNotSupported, NoConnectionToRDFStore, NoVersioningMode, \
-    WrongInputFormatException
-from urllib.error import URLError
+    WrongInputFormatException, WriteBehindError
+from .rdf_files import read_ntriples, read_turtle_statements, parse_ntriples_line, skolemize, skolemize_turtle
+from urllib.error import URLError, HTTPError
+from urllib.parse import quote
+from .transport import SPARQLWrapperTransport, transfer_stats
+from .sparql_results import read_results, read_arrow_results, dictionary_encode, dictionary_encode_table
 from enum import Enum
-from SPARQLWrapper import SPARQLWrapper, POST, DIGEST, GET, JSON, Wrapper
+from SPARQLWrapper import SPARQLWrapper, POST, GET, JSON, CSV, TSV, Wrapper
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import namedtuple
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Union, Iterator
+import rdflib
+import re
+import tzlocal
+import time
+import threading
+import json
+import os
+import uuid
 import logging
 
+pd.set_option('display.max_columns', None)
+pd.set_option('display.max_colwidth', None)
 
-def _to_df(result: Wrapper.QueryResult) -> pd.DataFrame:
+
+def _to_df(result: Wrapper.QueryResult, result_format: str = JSON) -> pd.DataFrame:
     """
+    Parses the whole result set into one data frame. The response is parsed incrementally like in get_data with
+    a chunksize.
 
     :param result:
+    :param result_format: The format of the result: JSON, CSV or TSV.
     :return: Dataframe
     """
-    pd.set_option('display.max_columns', None)
-    pd.set_option('display.max_colwidth', None)
-
-    def format_value(res_value):
-        value = res_value["value"]
-        lang = res_value.get("xml:lang", None)
-        datatype = res_value.get("datatype", None)
-        if lang is not None:
-            value += "@" + lang
-        if datatype is not None:
-            value += " [" + datatype + "]"
-        return value
-
-    results = result.convert()
-
-    column_names = []
-    for var in results["head"]["vars"]:
-        column_names.append(var)
-    df = pd.DataFrame(columns=column_names)
-
-    values = []
-    for r in results["results"]["bindings"]:
-        row = []
-        for col in results["head"]["vars"]:
-            if col in r:
-                result_value = format_value(r[col])
-            else:
-                result_value = None
-            row.append(result_value)
-        values.append(row)
-    df = df.append(pd.DataFrame(values, columns=df.columns))
 
-    return df
+    chunks = list(read_results(result.response, result_format))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks)
+
+
+def _read_chunks(path: str, rdf_format: str, chunk_size: int, skolem_base: str = None) -> Iterator[list]:
+    """
+    Reads the triples of an N-Triples or Turtle file lazily in chunks. An N-Triples chunk consists of :chunk_size
+    triples. A Turtle chunk consists of the triples of :chunk_size statements, which are parsed together with the
+    preceding directives. Thus, the anonymous blank nodes of a Turtle statement stay within one chunk.
+
+    :param path: An N-Triples(-star) or Turtle file. Files that end with .gz are decompressed.
+    :param rdf_format: "nt" or "turtle"
+    :param chunk_size:
+    :param skolem_base: If given, labelled blank nodes are replaced with IRIs that start with :skolem_base (see
+    skolemize), so that a blank node label denotes the same node in all chunks.
+    :return: Lists of (subject, predicate, object) tuples in n3 syntax.
+    """
+
+    if rdf_format == "nt":
+        triples = read_ntriples(path)
+        if skolem_base is not None:
+            triples = (tuple(skolemize(term, skolem_base) for term in triple) for triple in triples)
+        chunk = list(islice(triples, chunk_size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(triples, chunk_size))
+        return
+
+    def parse(statements: list) -> list:
+        graph = rdflib.Graph()
+        graph.parse(data="\n".join(list(directives.values()) + statements), format="turtle")
+        ntriples = graph.serialize(format="nt")
+        if isinstance(ntriples, bytes):
+            ntriples = ntriples.decode("utf-8")
+        return [triple for triple in map(parse_ntriples_line, ntriples.splitlines()) if triple is not None]
+
+    directives = {}
+    statements = []
+    for yn_directive, text in read_turtle_statements(path):
+        if yn_directive:
+            # Statements are parsed with the directives that precede them.
+            if statements:
+                yield parse(statements)
+                statements = []
+            prefix = re.match(r"@?prefix\s+([^\s:]*:)", text, re.IGNORECASE)
+            directives[prefix.group(1) if prefix else "base"] = text
+        else:
+            statements.append(text if skolem_base is None else skolemize_turtle(text, skolem_base))
+            if len(statements) == chunk_size:
+                yield parse(statements)
+                statements = []
+    if statements:
+        yield parse(statements)
+
+
+# The result of one update request of a bulk write, see TripleStoreEngine._execute_batches.
+def _remove_checkpoints(checkpoint_file: str, operation: str, partition_mode: 'PartitionMode'):
+    """
+    Removes the records of :operation in :partition_mode from :checkpoint_file. The file is deleted if no records
+    of other operations remain.
+
+    :param checkpoint_file:
+    :param operation:
+    :param partition_mode:
+    :return:
+    """
+
+    if not os.path.exists(checkpoint_file):
+        return
+    with open(checkpoint_file, "r") as checkpoint:
+        records = [json.loads(line) for line in checkpoint if line.strip()]
+    other_records = [record for record in records
+                     if (record['operation'], record['partition_mode']) != (operation, partition_mode.name)]
+    if other_records:
+        with open(checkpoint_file, "w") as checkpoint:
+            checkpoint.writelines(json.dumps(record) + "\n" for record in other_records)
+    else:
+        os.remove(checkpoint_file)
+
+
+BatchResult = namedtuple('BatchResult', ['batch_number', 'cnt_rows', 'timestamp', 'seconds'])
+# The result of one update request of a partitioned operation, see TripleStoreEngine._execute_partitions.
+PartitionResult = namedtuple('PartitionResult', ['partition_number', 'partition', 'seconds'])
 
 
 class VersioningMode(Enum):
@@ -57,6 +132,12 @@ class VersioningMode(Enum):
     SAVE_MEM = 2
 
 
+class PartitionMode(Enum):
+    PREDICATE = 1
+    GRAPH = 2
+    SUBJECT_HASH = 3
+
+
 class TripleStoreEngine:
     """
 
@@ -69,7 +150,7 @@ class TripleStoreEngine:
             self.pw = pw
 
     def __init__(self, query_endpoint: str, update_endpoint: str, credentials: Credentials = None,
-                 skip_connection_test=False):
+                 skip_connection_test=False, transport: SPARQLWrapperTransport = None):
         """
         During initialization a few queries are executed against the RDF* store to test connection but also whether
         the RDF* store in fact supports the 'star' extension. During the execution a side effect may occur and
@@ -84,28 +165,22 @@ class TripleStoreEngine:
         :param update_endpoint: URL for executing write statements on the RDF store. Its URL is an extension of
         query_endpoint: "query_endpoint/statements"
         :param credentials: The user name and password for the remote RDF store
+        :param transport: Creates the connections to the endpoints (see transport.py). Pass a PooledTransport to
+        keep the HTTP connections alive and share them with other TripleStoreEngine instances. Defaults to a
+        SPARQLWrapperTransport, which opens a new connection per request. Pass SPARQLWrapperTransport(compression=True)
+        to receive compressed result sets.
         """
 
         self.credentials = credentials
         self._template_location = template_path("templates/rdf_star_store")
+        self._write_behind_queue = None
+        self._transport = transport if transport is not None else SPARQLWrapperTransport()
+        # The TransferStats of the last get_data call
+        self.transfer_stats = None
 
-        self.sparql_get = SPARQLWrapper(query_endpoint)
-        self.sparql_get.setHTTPAuth(DIGEST)
-        self.sparql_get.setMethod(GET)
-        self.sparql_get.setReturnFormat(JSON)
-
-        self.sparql_get_with_post = SPARQLWrapper(query_endpoint)
-        self.sparql_get_with_post.setHTTPAuth(DIGEST)
-        self.sparql_get_with_post.setMethod(POST)
-        self.sparql_get_with_post.setReturnFormat(JSON)
-
-        self.sparql_post = SPARQLWrapper(update_endpoint)
-        self.sparql_post.setHTTPAuth(DIGEST)
-        self.sparql_post.setMethod(POST)
-
-        if self.credentials is not None:
-            self.sparql_post.setCredentials(credentials.user_name, credentials.pw)
-            self.sparql_get.setCredentials(credentials.user_name, credentials.pw)
+        self.sparql_get = self._transport.connection(query_endpoint, GET, JSON, credentials)
+        self.sparql_get_with_post = self._transport.connection(query_endpoint, POST, JSON)
+        self.sparql_post = self._transport.connection(update_endpoint, POST, credentials=credentials)
 
         if not skip_connection_test:
             # Test connection. Execute one read and one write statement
@@ -156,13 +231,28 @@ class TripleStoreEngine:
         else:
             logging.info("Connection test has been skipped")
 
-    def reset_all_versions(self):
+    def reset_all_versions(self, partition_mode: PartitionMode = None, cnt_partitions: int = 16,
+                           connections: int = 1, checkpoint_file: str = None) -> list:
         """
         Delete all triples with vers:valid_from and vers:valid_until as predicate.
 
-        :return:
+        :param partition_mode: If set, the annotations are deleted with one update request per partition of the
+        RDF store instead of one request for the whole store (see _execute_partitions).
+        :param cnt_partitions: The number of partitions in the SUBJECT_HASH mode.
+        :param connections: The number of update requests that are executed in parallel.
+        :param checkpoint_file: A file in which the finished partitions are recorded. If the operation is
+        interrupted, a subsequent call with the same file skips the partitions that were already finished. Once all
+        partitions finished, the records of the operation are removed and the file is deleted if it is empty.
+        :return: One PartitionResult per executed partition if :partition_mode is set.
         """
 
+        if partition_mode is not None:
+            template = open(self._template_location + "/reset_partition.txt", "r").read()
+            partition_results = self._execute_partitions("reset_all_versions", template, partition_mode,
+                                                         cnt_partitions, connections, checkpoint_file)
+            logging.info("All annotations have been removed.")
+            return partition_results
+
         template = open(self._template_location + "/reset_all_versions.txt", "r").read()
         delete_statement = template.format(versioning_prefixes(""))
         self.sparql_post.setQuery(delete_statement)
@@ -171,11 +261,17 @@ class TripleStoreEngine:
         logging.info("All annotations have been removed.")
 
     def version_all_rows(self, initial_timestamp: datetime = None,
-                         versioning_mode: VersioningMode = VersioningMode.SAVE_MEM):
+                         versioning_mode: VersioningMode = VersioningMode.SAVE_MEM,
+                         partition_mode: PartitionMode = None, cnt_partitions: int = 16, connections: int = 1,
+                         checkpoint_file: str = None) -> list:
         """
         Version all triples with an artificial end date. If the mode is Q_PERF then every triple is additionally
         annotated with a valid_from date where the date is the initial_timestamp provided by the caller.
 
+        For large RDF stores, set :partition_mode to version the triples with one update request per partition
+        of the RDF store instead of one request for the whole store (see _execute_partitions). Triples that are
+        already annotated are skipped, so an interrupted run can be repeated.
+
         :param versioning_mode: The mode to use for versioning your data in the RDF store. The Q_PERF mode takes up
         more storage as for every triple in the RDF store two additional triples are added. In return, querying
         timestamped data is faster. The SAVE_MEM mode only adds one additional metadata triple per data triple
@@ -183,43 +279,312 @@ class TripleStoreEngine:
         Make sure to choose the mode the better suits your need as the mode gets set only once at the beginning.
         Every subsequent query that gets send to the RDF endpoint using get_data() will also operate in the chosen mode.
         :param initial_timestamp: Timestamp which also must include the timezone. Only relevant for Q_PERF mode.
-        :return:
+        :param partition_mode: Partition the triples by predicate, by named graph or by the hash of the subject.
+        :param cnt_partitions: The number of partitions in the SUBJECT_HASH mode.
+        :param connections: The number of update requests that are executed in parallel.
+        :param checkpoint_file: A file in which the finished partitions are recorded. If the operation is
+        interrupted, a subsequent call with the same file skips the partitions that were already finished. Once all
+        partitions finished, the records of the operation are removed and the file is deleted if it is empty.
+        :return: One PartitionResult per executed partition if :partition_mode is set.
         """
 
         final_prefixes = versioning_prefixes("")
         versioning_mode_dir1 = self._template_location + "/../rdf_star_store/versioning_modes"
-        versioning_mode_dir2 = self._template_location + "/../query_utils/versioning_modes"
 
         if versioning_mode == VersioningMode.Q_PERF and initial_timestamp is not None:
             version_timestamp = versioning_timestamp_format(initial_timestamp)
 
             versioning_mode_template1 = open(versioning_mode_dir1 + "/version_all_rows_q_perf.txt", "r").read()
-            versioning_mode_template2 = \
-                open(versioning_mode_dir2 + "/versioning_query_extensions_q_perf.txt", "r").read()
             update_statement = versioning_mode_template1.format(final_prefixes, version_timestamp)
+            partition_template_name = "/version_partition_q_perf.txt"
             message = "All rows have been annotated with start date {0} " \
                       "and an artificial end date".format(initial_timestamp)
         elif versioning_mode == VersioningMode.SAVE_MEM:
             versioning_mode_template1 = open(versioning_mode_dir1 + "/version_all_rows_save_mem.txt", "r").read()
-            versioning_mode_template2 = \
-                open(versioning_mode_dir2 + "/versioning_query_extensions_save_mem.txt", "r").read()
             update_statement = versioning_mode_template1.format(final_prefixes)
+            version_timestamp = None
+            partition_template_name = "/version_partition_save_mem.txt"
             message = "All rows have been annotated with an artificial end date."
         else:
             raise NoVersioningMode("Versioning mode is neither Q_PERF nor SAVE_MEM. Initial versioning will not be"
                                    "executed. Check also whether an initial timestamp was passed in case of Q_PERF.")
 
+        self._activate_versioning_mode(versioning_mode)
+
+        if partition_mode is not None:
+            template = open(versioning_mode_dir1 + partition_template_name, "r").read()
+            partition_results = self._execute_partitions("version_all_rows", template, partition_mode,
+                                                         cnt_partitions, connections, checkpoint_file,
+                                                         version_timestamp)
+            logging.info(message)
+            return partition_results
+
+        self.sparql_post.setQuery(update_statement)
+        self.sparql_post.query()
+
+        logging.info(message)
+
+    def _activate_versioning_mode(self, versioning_mode: VersioningMode):
+        """
+        Copies the templates of :versioning_mode to version_all_rows.txt and versioning_query_extensions.txt.
+        The latter is used by get_data to timestamp queries.
+
+        :param versioning_mode:
+        :return:
+        """
+
+        mode = "q_perf" if versioning_mode == VersioningMode.Q_PERF else "save_mem"
+        versioning_mode_dir1 = self._template_location + "/../rdf_star_store/versioning_modes"
+        versioning_mode_dir2 = self._template_location + "/../query_utils/versioning_modes"
+        versioning_mode_template1 = open(versioning_mode_dir1 + "/version_all_rows_{0}.txt".format(mode), "r").read()
+        versioning_mode_template2 = \
+            open(versioning_mode_dir2 + "/versioning_query_extensions_{0}.txt".format(mode), "r").read()
+
         with open(self._template_location + "/../rdf_star_store/version_all_rows.txt", "w") as vers:
             vers.write(versioning_mode_template1)
         with open(self._template_location + "/../query_utils/versioning_query_extensions.txt", "w") as vers:
             vers.write(versioning_mode_template2)
 
-        self.sparql_post.setQuery(update_statement)
-        self.sparql_post.query()
+    def bulk_load(self, path: str, rdf_format: str = None, initial_timestamp: datetime = None,
+                  versioning_mode: VersioningMode = VersioningMode.SAVE_MEM, graph: str = None,
+                  chunk_size: int = 10000, graph_store_endpoint: str = None, skolem_base: str = None) -> list:
+        """
+        Loads an N-Triples or Turtle file into a fresh RDF store and versions its triples in the same pass, instead
+        of loading the file first and versioning all triples with version_all_rows afterwards. The file is read
+        lazily and sent in chunks of :chunk_size triples. Each chunk contains the triples together with their
+        annotations as N-Triples-star and is posted to the SPARQL 1.1 Graph Store HTTP Protocol endpoint of the
+        RDF store. Thus, only one chunk is held in memory at a time.
+
+        The RDF store creates new blank nodes per request. Therefore, labelled blank nodes, which may be referenced
+        from several chunks, are replaced with IRIs that consist of :skolem_base and the blank node label (see
+        rdf_files.skolemize). Anonymous blank nodes of Turtle files, e.g. blank node property lists, stay within one
+        chunk and are loaded as blank nodes.
+
+        :param path: An N-Triples(-star) or Turtle file. Files that end with .gz are decompressed.
+        :param rdf_format: "nt" or "turtle". By default, the format is derived from the file extension.
+        :param initial_timestamp: The valid_from date of the triples in the Q_PERF mode, which must include the
+        timezone. Defaults to the current time.
+        :param versioning_mode: See version_all_rows.
+        :param graph: The IRI of the named graph into which the triples are loaded. Defaults to the default graph.
+        :param chunk_size: The number of triples per request. Turtle files are sent in chunks of the triples of
+        :chunk_size statements.
+        :param graph_store_endpoint: The URL of the Graph Store HTTP Protocol endpoint. Defaults to GraphDB's
+        endpoint, which is the query endpoint extended by /rdf-graphs/service.
+        :param skolem_base: The IRI prefix of the IRIs that replace blank nodes. Defaults to a prefix with a new UUID
+        per load, so that blank nodes of different loads stay distinct.
+        :return: One BatchResult per request with the number of triples and the execution time in seconds.
+        """
 
-        logging.info(message)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be greater than 0.")
+        if rdf_format is None:
+            file_name = path[:-3] if path.endswith(".gz") else path
+            if file_name.endswith(".nt"):
+                rdf_format = "nt"
+            elif file_name.endswith(".ttl"):
+                rdf_format = "turtle"
+            else:
+                raise WrongInputFormatException("The format of {0} cannot be derived from its file extension. "
+                                                "Please provide rdf_format.".format(path))
+        if rdf_format not in ("nt", "turtle"):
+            raise WrongInputFormatException("rdf_format must be either 'nt' or 'turtle'.")
+
+        if initial_timestamp is None:
+            current_datetime = datetime.now()
+            timezone_delta = tzlocal.get_localzone().dst(current_datetime).seconds
+            initial_timestamp = datetime.now(timezone(timedelta(seconds=timezone_delta)))
+        version_timestamp = versioning_timestamp_format(initial_timestamp)
+
+        vers = "https://github.com/GreenfishK/DataCitation/versioning/"
+        xsd_date_time = "<http://www.w3.org/2001/XMLSchema#dateTime>"
+        annotations = ['<{0}valid_until> "9999-12-31T00:00:00.000+02:00"^^{1}'.format(vers, xsd_date_time)]
+        if versioning_mode == VersioningMode.Q_PERF:
+            annotations.insert(0, '<{0}valid_from> "{1}"^^{2}'.format(vers, version_timestamp, xsd_date_time))
+        elif versioning_mode != VersioningMode.SAVE_MEM:
+            raise NoVersioningMode("Versioning mode is neither Q_PERF nor SAVE_MEM. The file will not be loaded.")
+        self._activate_versioning_mode(versioning_mode)
+
+        if graph_store_endpoint is None:
+            graph_store_endpoint = self.sparql_get.endpoint + "/rdf-graphs/service"
+        if graph is None:
+            url = graph_store_endpoint + "?default"
+        else:
+            url = graph_store_endpoint + "?graph=" + quote(graph.strip("<>"), safe="")
+        if skolem_base is None:
+            skolem_base = "https://github.com/GreenfishK/DataCitation/genid/{0}/".format(uuid.uuid4().hex)
 
-    def get_data(self, select_statement, timestamp: datetime = None, yn_timestamp_query: bool = True) -> pd.DataFrame:
+        def post_chunk(lines: list, cnt_triples: int) -> BatchResult:
+            start_time = time.perf_counter()
+            try:
+                stats = self._transport.post(url, "".join(lines).encode("utf-8"), "application/x-turtlestar",
+                                             self.credentials)
+            except URLError as e:
+                if isinstance(e, HTTPError):
+                    raise
+                raise NoConnectionToRDFStore("No connection to the Graph Store HTTP Protocol endpoint {0} could be "
+                                             "established.".format(graph_store_endpoint))
+            batch_result = BatchResult(len(batch_results) + 1, cnt_triples, version_timestamp,
+                                       time.perf_counter() - start_time)
+            logging.info("Batch {0}: {1} triples loaded with timestamp {2} in {3:.3f} seconds".format(*batch_result))
+            logging.info("Batch {0}: {1} bytes sent, {2} bytes on the wire".format(
+                batch_result.batch_number, stats.request_bytes, stats.request_wire_bytes))
+            return batch_result
+
+        batch_results = []
+        for triples in _read_chunks(path, rdf_format, chunk_size, skolem_base):
+            # N-Triples-star is a subset of Turtle-star.
+            lines = []
+            for triple in triples:
+                statement = " ".join(triple)
+                lines.append(statement + " .\n")
+                for annotation in annotations:
+                    lines.append("<< {0} >> {1} .\n".format(statement, annotation))
+            batch_results.append(post_chunk(lines, len(triples)))
+
+        return batch_results
+
+    def _update_connection(self) -> SPARQLWrapper:
+        """
+        Creates another connection to the update endpoint with the settings of sparql_post. A SPARQLWrapper holds
+        the statement that it executes next and must therefore not be shared between threads.
+
+        :return:
+        """
+
+        return self._transport.connection(self.sparql_post.endpoint, POST, credentials=self.credentials)
+
+    def _partitions(self, partition_mode: PartitionMode, cnt_partitions: int) -> list:
+        """
+        Splits the triples of the RDF store into partitions.
+        PREDICATE: One partition per predicate.
+        GRAPH: One partition per named graph and one for the triples that are in no named graph.
+        SUBJECT_HASH: :cnt_partitions partitions of equal MD5 hash ranges of the subjects.
+
+        :param partition_mode:
+        :param cnt_partitions: The number of partitions in the SUBJECT_HASH mode.
+        :return: A list of (partition, graph pattern) tuples. The graph pattern binds the triples of the partition
+        to ?s ?p ?o.
+        """
+
+        partitions_dir = self._template_location + "/partitions"
+        if partition_mode == PartitionMode.PREDICATE:
+            select_statement = open(partitions_dir + "/select_predicates.txt", "r").read()
+            self.sparql_get.setQuery(select_statement.format(versioning_prefixes("")))
+            bindings = self.sparql_get.query().convert()["results"]["bindings"]
+            pattern = open(partitions_dir + "/predicate.txt", "r").read().rstrip()
+            predicates = sorted("<{0}>".format(b["p"]["value"]) for b in bindings)
+            return [(predicate, pattern.format(predicate)) for predicate in predicates]
+        elif partition_mode == PartitionMode.GRAPH:
+            select_statement = open(partitions_dir + "/select_graphs.txt", "r").read()
+            self.sparql_get.setQuery(select_statement.format(versioning_prefixes("")))
+            bindings = self.sparql_get.query().convert()["results"]["bindings"]
+            pattern = open(partitions_dir + "/graph.txt", "r").read().rstrip()
+            graphs = sorted("<{0}>".format(b["g"]["value"]) for b in bindings)
+            default_graph_pattern = open(partitions_dir + "/default_graph.txt", "r").read().rstrip().format()
+            return [(graph, pattern.format(graph)) for graph in graphs] + [("default graph", default_graph_pattern)]
+        elif partition_mode == PartitionMode.SUBJECT_HASH:
+            if not 1 <= cnt_partitions <= 65536:
+                raise ValueError("cnt_partitions must be between 1 and 65536.")
+            pattern = open(partitions_dir + "/subject_hash.txt", "r").read().rstrip()
+            # The hash ranges are compared by the first four hex digits of the MD5 hash.
+            bounds = ["{0:04x}".format(i * 65536 // cnt_partitions) for i in range(cnt_partitions)] + [None]
+            partitions = []
+            for lower, upper in zip(bounds, bounds[1:]):
+                hash_filter = '?subjectHash >= "{0}"'.format(lower)
+                if upper is not None:
+                    hash_filter += ' && ?subjectHash < "{0}"'.format(upper)
+                partitions.append(("{0}-{1}".format(lower, upper or "ffff"), pattern.format(hash_filter)))
+            return partitions
+        else:
+            raise ValueError("Partition mode is neither PREDICATE, GRAPH nor SUBJECT_HASH.")
+
+    def _execute_partitions(self, operation: str, template: str, partition_mode: PartitionMode,
+                            cnt_partitions: int, connections: int, checkpoint_file: str, *args) -> list:
+        """
+        Executes the update :template once per partition of the RDF store (see _partitions) instead of once for the
+        whole store. The partitions are executed over :connections parallel connections. Each finished partition
+        is appended to :checkpoint_file, so that a repeated call skips it. If a partition fails, the partitions
+        that were not started yet are cancelled and the error is raised once the running partitions finished.
+        Once all partitions finished, the records of the operation are removed from :checkpoint_file, so that a
+        later call with the same file executes all partitions again.
+
+        :param operation: The name under which the finished partitions are recorded in :checkpoint_file.
+        :param template: An update template with the prefixes as {0}, the graph pattern of the partition as {1}
+        and :args as {2}, {3}, ...
+        :param partition_mode:
+        :param cnt_partitions: The number of partitions in the SUBJECT_HASH mode.
+        :param connections: The number of update requests that are executed in parallel.
+        :param checkpoint_file: The checkpoint file or None if no checkpoints should be recorded.
+        :return: One PartitionResult per executed partition, ordered by partition number.
+        """
+
+        if connections < 1:
+            raise ValueError("connections must be greater than 0.")
+
+        partitions = self._partitions(partition_mode, cnt_partitions)
+        finished_partitions = set()
+        if checkpoint_file is not None and os.path.exists(checkpoint_file):
+            with open(checkpoint_file, "r") as checkpoint:
+                for line in checkpoint:
+                    record = json.loads(line)
+                    if record['operation'] == operation and record['partition_mode'] == partition_mode.name:
+                        finished_partitions.add(record['partition'])
+        pending_partitions = [(partition_number, partition, pattern)
+                              for partition_number, (partition, pattern) in enumerate(partitions, start=1)
+                              if partition not in finished_partitions]
+        logging.info("{0}: {1} partitions, {2} of them already finished".format(
+            operation, len(partitions), len(partitions) - len(pending_partitions)))
+
+        sparql_prefixes = versioning_prefixes("")
+        checkpoint_lock = threading.Lock()
+        connection = threading.local()
+
+        def execute_partition(partition_number: int, partition: str, pattern: str) -> PartitionResult:
+            if not hasattr(connection, "sparql_post"):
+                connection.sparql_post = self._update_connection()
+            start_time = time.perf_counter()
+            connection.sparql_post.setQuery(template.format(sparql_prefixes, pattern, *args))
+            connection.sparql_post.query()
+            partition_result = PartitionResult(partition_number, partition, time.perf_counter() - start_time)
+            if checkpoint_file is not None:
+                with checkpoint_lock, open(checkpoint_file, "a") as checkpoint:
+                    checkpoint.write(json.dumps({'operation': operation, 'partition_mode': partition_mode.name,
+                                                 'partition': partition}) + "\n")
+            return partition_result
+
+        partition_results = []
+        error = None
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            futures = [executor.submit(execute_partition, *p) for p in pending_partitions]
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                if future.exception() is not None:
+                    if error is None:
+                        error = future.exception()
+                        for f in futures:
+                            f.cancel()
+                    continue
+                partition_result = future.result()
+                partition_results.append(partition_result)
+                logging.info("{0}: partition {1} ({2}) finished in {3:.3f} seconds; {4}/{5} partitions "
+                             "pending".format(operation, partition_result.partition_number, partition_result.partition,
+                                              partition_result.seconds,
+                                              len(pending_partitions) - len(partition_results),
+                                              len(partitions)))
+        if error is not None:
+            logging.error("{0} was interrupted after {1} partitions: {2}".format(
+                operation, len(partition_results), error))
+            raise error
+        if checkpoint_file is not None:
+            _remove_checkpoints(checkpoint_file, operation, partition_mode)
+
+        return sorted(partition_results)
+
+    def get_data(self, select_statement: Union[str, QueryUtils], timestamp: datetime = None,
+                 yn_timestamp_query: bool = True, chunksize: int = None, result_format: str = JSON,
+                 yn_dictionary_encoding: bool = False, yn_arrow_table: bool = False) \
+            -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """
         Executes the SPARQL select statement and returns a result set. If the timestamp is provided the result set
         will be a snapshot of the data as of timestamp. Otherwise, the most recent version of the data will be returned.
@@ -229,17 +594,47 @@ class TripleStoreEngine:
         is executed as it is against the RDF store. Set this flag to 'False' if you are passing a timestamped query
         via :select_statement and leaving :timestamp blank.
         :param timestamp:
-        :param select_statement:
-        :return:
+        :param select_statement: The select statement or a QueryUtils object that was already created from it.
+        In the latter case the query is not parsed and normalized again. Its timestamped query is executed if
+        :timestamp is left blank or equals the QueryUtils' execution timestamp.
+        :param chunksize: If provided, an iterator over data frames with up to :chunksize rows is returned. The
+        response is parsed while the iterator is consumed, so only one chunk is held in memory at a time.
+        :param result_format: The format in which the RDF store returns the result: JSON, CSV or TSV
+        (see SPARQLWrapper). CSV results have neither language tags nor datatypes.
+        :param yn_dictionary_encoding: If true, the terms of each column are dictionary-encoded as pandas
+        Categorical (see sparql_results.dictionary_encode), which saves memory if terms repeat and lets sorting,
+        uniqueness checks and checksums work on integer codes. With a :chunksize, each chunk has its own categories.
+        :param yn_arrow_table: If true, the result set is built as pyarrow Table instead of a data frame, with
+        dictionary arrays if :yn_dictionary_encoding is true. See sparql_results for the handoff to pandas,
+        Parquet and Feather. Requires the pyarrow package.
+        :return: The result set as data frame or an iterator over data frames if :chunksize is provided.
         """
         logging.info("Get data ...")
+        if chunksize is not None and chunksize < 1:
+            raise ValueError("chunksize must be greater than 0.")
+        if result_format not in (JSON, CSV, TSV):
+            raise WrongInputFormatException("Unsupported result format: {0}. Use JSON, CSV or TSV."
+                                            .format(result_format))
+        if self._write_behind_queue is not None:
+            self._write_behind_queue.flush()
+        if isinstance(select_statement, QueryUtils) and not yn_timestamp_query:
+            select_statement = select_statement.sparql_prefixes + "\n" + select_statement.query
+
         if yn_timestamp_query:
-            if timestamp is None:
-                query_utils = QueryUtils(query=select_statement)
+            if isinstance(select_statement, QueryUtils):
+                query_utils = select_statement
+                if timestamp is None or \
+                        versioning_timestamp_format(timestamp) == query_utils.execution_timestamp:
+                    query = query_utils.timestamped_query
+                else:
+                    query = query_utils.timestamp_query(citation_timestamp=timestamp)
             else:
-                query_utils = QueryUtils(query=select_statement, execution_timestamp=timestamp)
+                if timestamp is None:
+                    query_utils = QueryUtils(query=select_statement)
+                else:
+                    query_utils = QueryUtils(query=select_statement, execution_timestamp=timestamp)
+                query = query_utils.timestamped_query
 
-            query = query_utils.timestamped_query
             logging.info("Timestamped query with timestamp {0} being executed:"
                          " \n {1}".format(query_utils.execution_timestamp, query))
             self.sparql_get_with_post.setQuery(query)
@@ -249,11 +644,43 @@ class TripleStoreEngine:
         # The query sometimes gets recognized as LOAD even though it is a SELECT statement. this results into
         # a failed execution as we are using an get endpoint which is not allowed with LOAD
         self.sparql_get_with_post.queryType = 'SELECT'
-        result = self.sparql_get_with_post.query()
-        df = _to_df(result)
+        self.sparql_get_with_post.setReturnFormat(result_format)
+        try:
+            result = self.sparql_get_with_post.query()
+        finally:
+            self.sparql_get_with_post.setReturnFormat(JSON)
+        if chunksize is not None:
+            return self._result_chunks(result, result_format, chunksize, yn_dictionary_encoding, yn_arrow_table)
+
+        if yn_arrow_table:
+            df = next(read_arrow_results(result.response, result_format))
+            self._set_transfer_stats(result)
+            return dictionary_encode_table(df) if yn_dictionary_encoding else df
+
+        df = _to_df(result, result_format)
+        self._set_transfer_stats(result)
+        if yn_dictionary_encoding:
+            df = dictionary_encode(df)
 
         return df
 
+    def _result_chunks(self, result: Wrapper.QueryResult, result_format: str, chunksize: int,
+                       yn_dictionary_encoding: bool, yn_arrow_table: bool) -> Iterator[pd.DataFrame]:
+        if yn_arrow_table:
+            for table in read_arrow_results(result.response, result_format, chunksize):
+                yield dictionary_encode_table(table) if yn_dictionary_encoding else table
+        else:
+            for df in read_results(result.response, result_format, chunksize):
+                yield dictionary_encode(df) if yn_dictionary_encoding else df
+        self._set_transfer_stats(result)
+
+    def _set_transfer_stats(self, result: Wrapper.QueryResult):
+        self.transfer_stats = transfer_stats(result)
+        if self.transfer_stats is not None:
+            logging.info("Result set: {0} bytes on the wire, {1} bytes decoded ({2})".format(
+                self.transfer_stats.response_wire_bytes, self.transfer_stats.response_decoded_bytes,
+                self.transfer_stats.content_encoding or "identity"))
+
     def update(self, triples: dict, prefixes: dict = None):
         """
         Updates all triples' objects that are provided in :triples as key values with the corresponding
@@ -266,10 +693,13 @@ class TripleStoreEngine:
         :param prefixes: Prefixes that are used within :param triples
         """
 
+        if self._write_behind_queue is not None:
+            self._write_behind_queue.flush()
+
         template = open(self._template_location + "/update_triples.txt", "r").read()
+        sparql_prefixes = versioning_prefixes(prefixes)
         for i, (triple, new_value) in enumerate(triples.items()):
             if isinstance(triple, tuple) and isinstance(new_value, str):
-                sparql_prefixes = versioning_prefixes(prefixes)
                 update_statement = template.format(sparql_prefixes, triple[0], triple[1], triple[2], new_value)
                 self.sparql_post.setQuery(update_statement)
                 result = self.sparql_post.query()
@@ -291,6 +721,10 @@ class TripleStoreEngine:
         :return:
         """
 
+        if self._write_behind_queue is not None:
+            self._write_behind_queue.insert_triples(triples, prefixes)
+            return
+
         statement = open(self._template_location + "/insert_triples.txt", "r").read()
 
         if prefixes:
@@ -332,10 +766,14 @@ class TripleStoreEngine:
         :param prefixes: Prefixes that are used within :param triples
         """
 
+        if self._write_behind_queue is not None:
+            self._write_behind_queue.outdate_triples(triples, prefixes)
+            return
+
         template = open(self._template_location + "/outdate_triples.txt", "r").read()
+        sparql_prefixes = versioning_prefixes(prefixes)
         for triple in triples:
             if isinstance(triple, tuple):
-                sparql_prefixes = versioning_prefixes(prefixes)
                 update_statement = template.format(sparql_prefixes, triple[0], triple[1], triple[2])
                 self.sparql_post.setQuery(update_statement)
                 result = self.sparql_post.query()
@@ -344,6 +782,165 @@ class TripleStoreEngine:
                 raise WrongInputFormatException("Wrong input format. The update statement will not be executed. "
                                                 "Please provide :triples as a list of tuples (str, str, str). ")
 
+    def write_behind(self, flush_size: int = 1000, flush_interval: float = 1.0, max_pending: int = 10000,
+                     batch_size: int = 1000) -> 'WriteBehindQueue':
+        """
+        Switches the engine to write-behind mode: insert_triples and outdate_triples only buffer the triples and
+        return immediately. A background thread writes them as batched updates (see insert_triples_bulk and
+        outdate_triples_bulk). Use the returned queue as a context manager or call its close() method to leave
+        the write-behind mode. update and get_data flush the buffered triples first, so they see all preceding
+        writes. The bulk methods bypass the queue.
+
+        :param flush_size: The number of buffered mutations that triggers a flush.
+        :param flush_interval: The maximum number of seconds a mutation stays buffered.
+        :param max_pending: The maximum number of buffered mutations. insert_triples and outdate_triples block
+        until the buffer was flushed if it is full.
+        :param batch_size: The maximum number of triples per update request.
+        :return: The write-behind queue.
+        """
+
+        if self._write_behind_queue is not None:
+            raise RuntimeError("The engine is already in write-behind mode.")
+        self._write_behind_queue = WriteBehindQueue(self, flush_size, flush_interval, max_pending, batch_size)
+        return self._write_behind_queue
+
+    def _execute_batches(self, template_name: str, rows: list, prefixes: dict, batch_size: int,
+                         timestamp: datetime, connection: SPARQLWrapper = None) -> list:
+        """
+        Executes the update template :template_name once per batch of :batch_size rows instead of once per triple.
+        The rows of a batch are passed to the template as one VALUES block. All rows share one commit timestamp
+        that is bound to ?newVersion instead of SPARQL's NOW().
+
+        :param template_name: The file name of the update template in templates/rdf_star_store.
+        :param rows: The rows of the VALUES block in n3 syntax, e.g. "(pub:s pub:p pub:o)".
+        :param prefixes: Prefixes that are used within :rows
+        :param batch_size: The maximum number of rows per update request.
+        :param timestamp: The commit timestamp, which must include the timezone. Defaults to the current time.
+        :param connection: The connection to the update endpoint. Defaults to sparql_post. Threads other than the
+        caller's must pass their own connection (see _update_connection).
+        :return: One BatchResult per update request with the number of rows and the execution time in seconds.
+        """
+
+        if batch_size < 1:
+            raise ValueError("batch_size must be greater than 0.")
+
+        template = open(self._template_location + "/" + template_name, "r").read()
+        if prefixes:
+            sparql_prefixes = versioning_prefixes(prefixes)
+        else:
+            sparql_prefixes = versioning_prefixes("")
+
+        if timestamp is None:
+            current_datetime = datetime.now()
+            timezone_delta = tzlocal.get_localzone().dst(current_datetime).seconds
+            timestamp = datetime.now(timezone(timedelta(seconds=timezone_delta)))
+        version_timestamp = versioning_timestamp_format(timestamp)
+        if connection is None:
+            connection = self.sparql_post
+
+        batch_results = []
+        for batch_number, start in enumerate(range(0, len(rows), batch_size), start=1):
+            batch = rows[start:start + batch_size]
+            update_statement = template.format(sparql_prefixes, "\n".join("        " + row for row in batch),
+                                               version_timestamp)
+            start_time = time.perf_counter()
+            connection.setQuery(update_statement)
+            stats = transfer_stats(connection.query())
+            batch_result = BatchResult(batch_number, len(batch), version_timestamp, time.perf_counter() - start_time)
+            logging.info("Batch {0}: {1} rows written with timestamp {2} in {3:.3f} seconds".format(*batch_result))
+            if stats is not None:
+                logging.info("Batch {0}: {1} bytes sent, {2} bytes on the wire".format(
+                    batch_number, stats.request_bytes, stats.request_wire_bytes))
+            batch_results.append(batch_result)
+
+        return batch_results
+
+    def insert_triples_bulk(self, triples: list, prefixes: dict = None, batch_size: int = 1000,
+                            timestamp: datetime = None) -> list:
+        """
+        Inserts triples like insert_triples but sends one update request per :batch_size triples instead of one
+        per triple. All triples are annotated with the same valid_from date. As the triples are passed to the RDF
+        store as VALUES blocks, they must not contain blank nodes.
+
+        :param triples: A list with three elements - a subject, predicate and object. The triple elements must be
+        provided in n3 syntax!
+        Or: A list of lists with three elements.
+        :param prefixes: Prefixes that are used within :param triples
+        :param batch_size: The maximum number of triples per update request.
+        :param timestamp: The valid_from date of the triples, which must include the timezone.
+        Defaults to the current time.
+        :return: One BatchResult per update request.
+        """
+
+        trpls = []
+        if not isinstance(triples[0], list) and len(triples) == 3:
+            trpls.append(triples)
+        else:
+            trpls = triples
+
+        rows = []
+        for triple in trpls:
+            if isinstance(triple, list) and len(triple) == 3:
+                rows.append("({0} {1} {2})".format(triple[0], triple[1], triple[2]))
+            else:
+                e = "Please provide either a list of lists with three elements - subject, predicate and object or a " \
+                    "single list with aforementioned three elements in n3 syntax. "
+                logging.error(e)
+                raise WrongInputFormatException(e)
+
+        return self._execute_batches("insert_triples_bulk.txt", rows, prefixes, batch_size, timestamp)
+
+    def update_bulk(self, triples: dict, prefixes: dict = None, batch_size: int = 1000,
+                    timestamp: datetime = None) -> list:
+        """
+        Updates triples like update but sends one update request per :batch_size triples instead of one
+        per triple. All updated triples are outdated and all new triples are annotated with the same date.
+        As the triples are passed to the RDF store as VALUES blocks, they must not contain blank nodes.
+
+        :param triples: A dictionary with triples as key values and strings as values. All triple elements
+        and corresponding new values must be provided as strings and may also contain SPARQL prefixes. E.g. foaf:name
+        :param prefixes: Prefixes that are used within :param triples
+        :param batch_size: The maximum number of triples per update request.
+        :param timestamp: The date of the update, which must include the timezone. Defaults to the current time.
+        :return: One BatchResult per update request.
+        """
+
+        rows = []
+        for triple, new_value in triples.items():
+            if isinstance(triple, tuple) and isinstance(new_value, str):
+                rows.append("({0} {1} {2} {3})".format(triple[0], triple[1], triple[2], new_value))
+            else:
+                raise WrongInputFormatException("Wrong input format. The update statement will not be executed. "
+                                                "Please provide :triples.key() as a tuple (str, str, str) "
+                                                "and :triples.value() as a string.")
+
+        return self._execute_batches("update_triples_bulk.txt", rows, prefixes, batch_size, timestamp)
+
+    def outdate_triples_bulk(self, triples: list, prefixes: dict = None, batch_size: int = 1000,
+                             timestamp: datetime = None) -> list:
+        """
+        Outdates triples like outdate_triples but sends one update request per :batch_size triples instead of one
+        per triple. All triples are outdated with the same date instead of SPARQL's NOW().
+        As the triples are passed to the RDF store as VALUES blocks, they must not contain blank nodes.
+
+        :param triples: A list of tuples where each tuple is a triple (s, p, o) -> (str, str, str).
+        All triple elements must be provided  as strings and may also contain SPARQL prefixes. E.g. foaf:name
+        :param prefixes: Prefixes that are used within :param triples
+        :param batch_size: The maximum number of triples per update request.
+        :param timestamp: The date of the outdate, which must include the timezone. Defaults to the current time.
+        :return: One BatchResult per update request.
+        """
+
+        rows = []
+        for triple in triples:
+            if isinstance(triple, tuple):
+                rows.append("({0} {1} {2})".format(triple[0], triple[1], triple[2]))
+            else:
+                raise WrongInputFormatException("Wrong input format. The update statement will not be executed. "
+                                                "Please provide :triples as a list of tuples (str, str, str). ")
+
+        return self._execute_batches("outdate_triples_bulk.txt", rows, prefixes, batch_size, timestamp)
+
     def _delete_triples(self, triples: list, prefixes: dict = None):
         """
         Deletes the triples and its version annotations from the history. Should be used with care
@@ -385,3 +982,250 @@ class TripleStoreEngine:
                     "single list with aforementioned three elements in n3 syntax. "
                 logging.error(e)
                 raise WrongInputFormatException(e)
+
+
+class WriteBehindQueue:
+
+    def __init__(self, engine: TripleStoreEngine, flush_size: int = 1000, flush_interval: float = 1.0,
+                 max_pending: int = 10000, batch_size: int = 1000):
+        """
+        Buffers inserts and outdates of an engine in write-behind mode (see TripleStoreEngine.write_behind) and
+        writes them in a background thread once :flush_size mutations are buffered or :flush_interval seconds
+        passed. Mutations that cancel out within one flush are not written at all: A triple that is inserted
+        and outdated afterwards is neither inserted nor outdated. Repeated inserts or outdates of the same triple
+        are written once. A flush writes all outdates before all inserts, which preserves the order of an outdate
+        that is followed by an insert of the same triple, and all of its triples share one timestamp.
+
+        A mutation is only removed from the buffer once its update request succeeded. If a request fails, the
+        unwritten mutations are buffered again and written with the next flush, so outdates whose inserts were not
+        written yet are completed later. The next call of insert_triples, outdate_triples, flush or close raises a
+        WriteBehindError that lists the unwritten mutations.
+
+        Triples are identified by their n3 strings and prefixes. Thus, a triple that is written with prefixes
+        and without them is not recognized as the same triple.
+
+        :param engine:
+        :param flush_size: The number of buffered mutations that triggers a flush.
+        :param flush_interval: The maximum number of seconds a mutation stays buffered.
+        :param max_pending: The maximum number of buffered mutations. Producers block if the buffer is full.
+        :param batch_size: The maximum number of triples per update request.
+        """
+
+        if flush_size < 1 or max_pending < flush_size or flush_interval <= 0:
+            raise ValueError("flush_size and flush_interval must be greater than 0 and max_pending must not be "
+                             "less than flush_size.")
+
+        self.engine = engine
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        # (prefixes, triple) -> [yn_outdate, yn_insert]
+        self._buffer = {}
+        self._prefixes = {}
+        self._cnt_pending = 0
+        self._error = None
+        self._closed = False
+        self._condition = threading.Condition()
+        # Serializes the writes so that buffers are written in the order they were taken.
+        self._write_lock = threading.Lock()
+        # The background thread must not share sparql_post with the caller of the engine.
+        self._connection = engine._update_connection()
+        self._thread = threading.Thread(target=self._run, name="WriteBehindQueue", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def insert_triples(self, triples: list, prefixes: dict = None):
+        """
+        Buffers triples to be inserted. See TripleStoreEngine.insert_triples for the input format.
+
+        :param triples:
+        :param prefixes:
+        :return:
+        """
+
+        if not isinstance(triples[0], list) and len(triples) == 3:
+            triples = [triples]
+        for triple in triples:
+            if not (isinstance(triple, list) and len(triple) == 3):
+                e = "Please provide either a list of lists with three elements - subject, predicate and object or a " \
+                    "single list with aforementioned three elements in n3 syntax. "
+                logging.error(e)
+                raise WrongInputFormatException(e)
+        self._put([tuple(triple) for triple in triples], prefixes, yn_insert=True)
+
+    def outdate_triples(self, triples: list, prefixes: dict = None):
+        """
+        Buffers triples to be outdated. See TripleStoreEngine.outdate_triples for the input format.
+
+        :param triples:
+        :param prefixes:
+        :return:
+        """
+
+        for triple in triples:
+            if not isinstance(triple, tuple):
+                raise WrongInputFormatException("Wrong input format. The update statement will not be executed. "
+                                                "Please provide :triples as a list of tuples (str, str, str). ")
+        self._put(list(triples), prefixes, yn_insert=False)
+
+    def _put(self, triples: list, prefixes: dict, yn_insert: bool):
+        prefixes_key = tuple(sorted(prefixes.items())) if prefixes else ()
+        with self._condition:
+            self._raise_error()
+            if self._closed:
+                raise RuntimeError("The write-behind queue is closed.")
+            for triple in triples:
+                # Back-pressure: Wait for the background thread to take the buffer.
+                self._condition.wait_for(lambda: self._cnt_pending < self.max_pending or self._error is not None)
+                self._raise_error()
+                self._prefixes[prefixes_key] = prefixes
+                self._merge((prefixes_key, triple), yn_insert)
+                if self._cnt_pending >= self.flush_size:
+                    self._condition.notify_all()
+
+    def _merge(self, key: tuple, yn_insert: bool):
+        """
+        Merges an insert or outdate of a triple into the buffer. The caller must hold the condition.
+
+        :param key: (prefixes_key, triple)
+        :param yn_insert:
+        :return:
+        """
+
+        mutation = self._buffer.setdefault(key, [False, False])
+        cnt_mutations = sum(mutation)
+        if yn_insert:
+            mutation[1] = True
+        elif mutation[1]:
+            # An insert followed by an outdate cancels out.
+            mutation[1] = False
+        else:
+            mutation[0] = True
+        self._cnt_pending += sum(mutation) - cnt_mutations
+        if not any(mutation):
+            del self._buffer[key]
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _write_buffer(self):
+        with self._write_lock:
+            with self._condition:
+                buffer, prefixes = self._buffer, self._prefixes
+                self._buffer, self._prefixes, self._cnt_pending = {}, {}, 0
+                self._condition.notify_all()
+            if not buffer:
+                return
+
+            outdates, inserts = {}, {}
+            for (prefixes_key, triple), (yn_outdate, yn_insert) in buffer.items():
+                if yn_outdate:
+                    outdates.setdefault(prefixes_key, []).append(triple)
+                if yn_insert:
+                    inserts.setdefault(prefixes_key, []).append(triple)
+
+            current_datetime = datetime.now()
+            timezone_delta = tzlocal.get_localzone().dst(current_datetime).seconds
+            timestamp = datetime.now(timezone(timedelta(seconds=timezone_delta)))
+            # Mutations are removed from the buffer once their update request succeeded.
+            try:
+                for mutations, yn_insert in [(outdates, False), (inserts, True)]:
+                    for prefixes_key, triples in mutations.items():
+                        for start in range(0, len(triples), self.batch_size):
+                            batch = triples[start:start + self.batch_size]
+                            self.engine._execute_batches(
+                                "insert_triples_bulk.txt" if yn_insert else "outdate_triples_bulk.txt",
+                                ["({0} {1} {2})".format(*triple) for triple in batch], prefixes[prefixes_key],
+                                self.batch_size, timestamp, self._connection)
+                            for triple in batch:
+                                mutation = buffer[(prefixes_key, triple)]
+                                mutation[1 if yn_insert else 0] = False
+                                if not any(mutation):
+                                    del buffer[(prefixes_key, triple)]
+            except Exception as e:
+                self._restore(buffer, prefixes)
+                raise WriteBehindError(
+                    "Write-behind flush failed: {0} The unwritten mutations are buffered again.".format(e),
+                    [(triple, prefixes[prefixes_key]) for (prefixes_key, triple), mutation in buffer.items()
+                     if mutation[0]],
+                    [(triple, prefixes[prefixes_key]) for (prefixes_key, triple), mutation in buffer.items()
+                     if mutation[1]]) from e
+            logging.info("Write-behind flush: {0} outdates and {1} inserts written".format(
+                sum(len(t) for t in outdates.values()), sum(len(t) for t in inserts.values())))
+
+    def _restore(self, buffer: dict, prefixes: dict):
+        """
+        Puts mutations that could not be written back into the buffer. They precede the mutations that were
+        buffered while they were written.
+
+        :param buffer: The unwritten mutations.
+        :param prefixes:
+        :return:
+        """
+
+        with self._condition:
+            newer_buffer = self._buffer
+            self._buffer, self._cnt_pending = {}, 0
+            for mutations in [buffer, newer_buffer]:
+                for key, (yn_outdate, yn_insert) in mutations.items():
+                    # An outdate and an insert of the same triple were buffered in this order.
+                    if yn_outdate:
+                        self._merge(key, yn_insert=False)
+                    if yn_insert:
+                        self._merge(key, yn_insert=True)
+            for prefixes_key, prefixes_value in prefixes.items():
+                self._prefixes.setdefault(prefixes_key, prefixes_value)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._cnt_pending >= self.flush_size,
+                                         timeout=self.flush_interval)
+                yn_closed = self._closed
+            try:
+                self._write_buffer()
+            except Exception as e:
+                logging.error(e)
+                with self._condition:
+                    self._error = e
+                    self._condition.notify_all()
+            if yn_closed:
+                return
+
+    def flush(self):
+        """
+        Writes all buffered mutations and waits until they are written.
+
+        :return:
+        """
+
+        self._write_buffer()
+        with self._condition:
+            self._raise_error()
+
+    def close(self):
+        """
+        Writes all buffered mutations, stops the background thread and leaves the write-behind mode of the engine.
+
+        :return:
+        """
+
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        if self.engine._write_behind_queue is self:
+            self.engine._write_behind_queue = None
+        with self._condition:
+            self._raise_error()
@@ -0,0 +1,537 @@
+"""
+Incremental parsers for SPARQL 1.1 query results in the JSON, CSV and TSV formats. The parsers read the HTTP response
+while they produce the rows, so only the rows of the current chunk are held in memory.
+
+The values of the data frames are formatted the same way for all formats: IRIs and blank node labels without
+brackets, literals with their language tag appended as "@lang" or their datatype appended as " [datatype]".
+The CSV format does not distinguish IRIs, blank nodes and literals and has neither language tags nor datatypes.
+Unbound variables and empty strings are both None in the CSV format.
+
+Instead of data frames, the results can be read into pyarrow Tables, which hold the strings in contiguous buffers.
+This requires the pyarrow package:
+
+    pip install rdf_data_citation[arrow]
+"""
+
+from ._exceptions import WrongInputFormatException
+from SPARQLWrapper import JSON, CSV, TSV
+from typing import Iterator
+import pandas as pd
+import numpy as np
+import itertools
+import codecs
+import csv
+import json
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pa = None
+
+_read_size = 64 * 1024
+_xsd = "http://www.w3.org/2001/XMLSchema#"
+_non_whitespace = re.compile(r"\S")
+_object_separator = re.compile(r"\}\s*,\s*(?=\{)")
+
+
+def _to_chunks(variables: list, rows: Iterator[list], chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    :param variables: The column names.
+    :param rows: Lists of formatted values in the order of :variables.
+    :param chunksize: The maximum number of rows per data frame. If None, all rows are returned in one data frame.
+    :return: Data frames with :chunksize rows. Their index continues from chunk to chunk. At least one data frame is
+    returned, even if there are no rows.
+    """
+
+    chunk = []
+    start = 0
+    for row in rows:
+        chunk.append(row)
+        if chunksize is not None and len(chunk) == chunksize:
+            yield pd.DataFrame(chunk, columns=variables, index=pd.RangeIndex(start, start + len(chunk)))
+            start += len(chunk)
+            chunk = []
+    if chunk or start == 0:
+        yield pd.DataFrame(chunk, columns=variables, index=pd.RangeIndex(start, start + len(chunk)))
+
+
+class _JSONColumns:
+    """
+    Collects the bindings of a SPARQL JSON result in one list of values per variable. The suffixes "@lang" and
+    " [datatype]" are collected with their row numbers and appended to the values of the whole column at once when
+    the data frame is built. Each distinct suffix is created only once.
+    """
+
+    def __init__(self, variables: list):
+        self.variables = variables
+        self.cnt_rows = 0
+        self._values = [[] for _ in variables]
+        self._lang_suffixes = [([], []) for _ in variables]
+        self._datatype_suffixes = [([], []) for _ in variables]
+        self._columns = list(zip(variables, [values.append for values in self._values], self._lang_suffixes,
+                                 self._datatype_suffixes))
+        self._suffixes = ({}, {})
+
+    def add(self, binding: dict):
+        row = self.cnt_rows
+        lang_suffixes, datatype_suffixes = self._suffixes
+        for var, append, langs, datatypes in self._columns:
+            term = binding.get(var)
+            if term is None:
+                append(None)
+                continue
+            append(term["value"])
+            lang = term.get("xml:lang")
+            if lang is not None:
+                suffix = lang_suffixes.get(lang)
+                if suffix is None:
+                    suffix = lang_suffixes[lang] = "@" + lang
+                langs[0].append(row)
+                langs[1].append(suffix)
+            datatype = term.get("datatype")
+            if datatype is not None:
+                suffix = datatype_suffixes.get(datatype)
+                if suffix is None:
+                    suffix = datatype_suffixes[datatype] = " [" + datatype + "]"
+                datatypes[0].append(row)
+                datatypes[1].append(suffix)
+        self.cnt_rows += 1
+
+    def to_df(self, start: int) -> pd.DataFrame:
+        """
+        :param start: The index of the first row.
+        :return: The values with their language tag appended as "@lang" and their datatype appended as
+        " [datatype]". Unbound variables are None.
+        """
+
+        df_columns = {}
+        for var, values, lang_suffixes, datatype_suffixes in \
+                zip(self.variables, self._values, self._lang_suffixes, self._datatype_suffixes):
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            for rows, suffixes in (lang_suffixes, datatype_suffixes):
+                if len(rows) == len(values):
+                    column = column + np.array(suffixes, dtype=object)
+                elif rows:
+                    column[rows] = column[rows] + np.array(suffixes, dtype=object)
+            df_columns[var] = column
+        return pd.DataFrame(df_columns, columns=self.variables, index=pd.RangeIndex(start, start + self.cnt_rows),
+                            copy=False)
+
+    def to_table(self):
+        """
+        :return: A pyarrow Table with the same values as the data frame of to_df. The suffixes are appended with
+        Arrow compute functions.
+        """
+
+        arrays = []
+        for values, lang_suffixes, datatype_suffixes in zip(self._values, self._lang_suffixes,
+                                                            self._datatype_suffixes):
+            column = pa.array(values, type=pa.string())
+            for rows, suffixes in (lang_suffixes, datatype_suffixes):
+                if len(rows) == len(values):
+                    column = pc.binary_join_element_wise(column, pa.array(suffixes, type=pa.string()), "")
+                elif rows:
+                    all_suffixes = np.full(len(values), "", dtype=object)
+                    all_suffixes[rows] = suffixes
+                    column = pc.binary_join_element_wise(column, pa.array(all_suffixes, type=pa.string()), "")
+            arrays.append(column)
+        return pa.Table.from_arrays(arrays, names=self.variables)
+
+
+class _JSONResultReader:
+    """
+    Reads the result bindings of a SPARQL JSON result one by one. Only the top level structure of the document is
+    scanned here. The head and each binding are decoded with the JSON decoder of the standard library.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        # Separators before this position in the buffer lie within strings.
+        self._min_separator = 0
+        self.variables = None
+
+    def _fill(self) -> bool:
+        """
+        Reads the next part of the stream into the buffer.
+
+        :return: False if the end of the stream was reached before.
+        """
+
+        if self._eof:
+            return False
+        data = self._stream.read(_read_size)
+        if self._pos > _read_size:
+            self._buffer = self._buffer[self._pos:]
+            self._min_separator = max(0, self._min_separator - self._pos)
+            self._pos = 0
+        if not data:
+            self._eof = True
+            self._buffer += self._decoder.decode(b"", final=True)
+        else:
+            self._buffer += self._decoder.decode(data)
+        return True
+
+    def _peek(self) -> str:
+        """
+        :return: The next character that is not whitespace or an empty string at the end of the stream.
+        """
+
+        while True:
+            match = _non_whitespace.search(self._buffer, self._pos)
+            if match is not None:
+                self._pos = match.start()
+                return match.group()
+            self._pos = len(self._buffer)
+            if not self._fill():
+                return ""
+
+    def _expect(self, characters: str) -> str:
+        character = self._peek()
+        if not character or character not in characters:
+            raise WrongInputFormatException("Invalid SPARQL JSON result: expected one of '{0}' but found '{1}' at "
+                                            "position {2}".format(characters, character, self._pos))
+        self._pos += 1
+        return character
+
+    def _value(self):
+        """
+        :return: The JSON value that starts at the current position.
+        """
+
+        self._peek()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer might continue in the next part of the stream.
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise WrongInputFormatException("Invalid SPARQL JSON result: {0}".format(e))
+            self._fill()
+
+    def _members(self) -> Iterator[str]:
+        """
+        Iterates over the keys of the object that starts at the current position. The value of each key must be
+        consumed before the next key is requested.
+        """
+
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def _complete_objects(self) -> list:
+        """
+        Decodes all objects of the array that are complete within the buffer at once, starting at the current
+        position. The decoded part ends at the last "}," before a "{". If this separator lies within a string,
+        the part is not valid JSON and the objects must be decoded one by one up to there.
+
+        :return: The objects or None if there are not any or the part is not valid.
+        """
+
+        last = None
+        for last in _object_separator.finditer(self._buffer, max(self._pos, self._min_separator)):
+            pass
+        if last is None:
+            return None
+        try:
+            objects = self._json_decoder.decode("[" + self._buffer[self._pos:last.start() + 1] + "]")
+        except json.JSONDecodeError:
+            self._min_separator = last.end()
+            return None
+        self._pos = last.end()
+        return objects
+
+    def _items(self) -> Iterator:
+        """
+        Iterates over the values of the array that starts at the current position.
+        """
+
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            objects = self._complete_objects()
+            if objects:
+                yield from objects
+                continue
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+            self._peek()
+
+    def bindings(self) -> Iterator[dict]:
+        """
+        :return: The bindings of the result in the order of the document. The variables are set as soon as the
+        head has been read.
+        """
+
+        for key in self._members():
+            if key == "head":
+                self.variables = self._value()["vars"]
+            elif key == "results":
+                for results_key in self._members():
+                    if results_key != "bindings":
+                        self._value()
+                        continue
+                    yield from self._items()
+            else:
+                self._value()
+        if self.variables is None:
+            raise WrongInputFormatException("Invalid SPARQL JSON result: the head is missing.")
+
+
+def read_json_results(stream, chunksize: int = None, yn_arrow_table: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Parses a SPARQL JSON result incrementally.
+
+    :param stream: A binary file object, e.g. the HTTP response.
+    :param chunksize: The maximum number of rows per data frame. If None, all rows are returned in one data frame.
+    :param yn_arrow_table: If true, pyarrow Tables are returned instead of data frames.
+    :return: Data frames with one column per variable of the result.
+    """
+
+    if yn_arrow_table:
+        _check_pyarrow()
+
+    reader = _JSONResultReader(stream)
+    bindings = reader.bindings()
+    # The head normally precedes the results. Otherwise, the bindings are kept until the variables are known.
+    pending = []
+    for binding in bindings:
+        pending.append(binding)
+        if reader.variables is not None:
+            break
+
+    def chunks() -> Iterator[pd.DataFrame]:
+        columns = _JSONColumns(reader.variables)
+        start = 0
+        for binding in itertools.chain(pending, bindings):
+            columns.add(binding)
+            if columns.cnt_rows == chunksize:
+                yield columns.to_table() if yn_arrow_table else columns.to_df(start)
+                start += columns.cnt_rows
+                columns = _JSONColumns(reader.variables)
+        if columns.cnt_rows or start == 0:
+            yield columns.to_table() if yn_arrow_table else columns.to_df(start)
+
+    return chunks()
+
+
+def read_csv_results(stream, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Parses a SPARQL CSV result incrementally.
+
+    :param stream: A binary file object, e.g. the HTTP response.
+    :param chunksize: The maximum number of rows per data frame. If None, all rows are returned in one data frame.
+    :return: Data frames with one column per variable of the result.
+    """
+
+    reader = csv.reader(codecs.getreader("utf-8")(stream))
+    variables = next(reader, [])
+    rows = ([value if value != "" else None for value in row] for row in reader if row)
+    return _to_chunks(variables, rows, chunksize)
+
+
+_turtle_escape = re.compile(r"\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)")
+_turtle_escapes = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f'}
+_turtle_number = re.compile(r"[+-]?(\d+|\d*\.\d+|(\d+\.?\d*|\.\d+)[eE][+-]?\d+)$")
+
+
+def _unescape(literal: str) -> str:
+    def replace(match) -> str:
+        escape = match.group(1)
+        if escape[0] in "uU" and len(escape) > 1:
+            return chr(int(escape[1:], 16))
+        return _turtle_escapes.get(escape, escape)
+
+    return _turtle_escape.sub(replace, literal)
+
+
+def _parse_tsv_term(term: str) -> str:
+    """
+    :param term: An RDF term in Turtle syntax as used in SPARQL TSV results.
+    :return: The value formatted like the values of SPARQL JSON results.
+    """
+
+    if term == "":
+        return None
+    if term.startswith("<") and term.endswith(">"):
+        return term[1:-1]
+    if term.startswith("_:"):
+        return term[2:]
+    if term.startswith('"'):
+        end = term.rfind('"')
+        if end == 0:
+            raise WrongInputFormatException("Literal is not closed: {0}".format(term))
+        value = _unescape(term[1:end])
+        suffix = term[end + 1:]
+        if suffix.startswith("@"):
+            return value + suffix
+        if suffix.startswith("^^"):
+            return value + " [" + suffix[2:].strip("<>") + "]"
+        return value
+    if term in ("true", "false"):
+        return term + " [" + _xsd + "boolean]"
+    if _turtle_number.match(term):
+        if term.lstrip("+-").isdigit():
+            datatype = "integer"
+        elif "e" in term.lower():
+            datatype = "double"
+        else:
+            datatype = "decimal"
+        return term + " [" + _xsd + datatype + "]"
+    raise WrongInputFormatException("Unknown RDF term in SPARQL TSV result: {0}".format(term))
+
+
+def read_tsv_results(stream, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    Parses a SPARQL TSV result incrementally. Literals with language tags or datatypes are formatted like the
+    literals of SPARQL JSON results.
+
+    :param stream: A binary file object, e.g. the HTTP response.
+    :param chunksize: The maximum number of rows per data frame. If None, all rows are returned in one data frame.
+    :return: Data frames with one column per variable of the result.
+    """
+
+    lines = codecs.getreader("utf-8")(stream)
+    header = lines.readline().rstrip("\r\n")
+    variables = [var.lstrip("?$") for var in header.split("\t")] if header else []
+    # Tabs and line breaks within literals are escaped in TSV.
+    rows = ([_parse_tsv_term(term) for term in line.rstrip("\r\n").split("\t")]
+            for line in lines if line.rstrip("\r\n"))
+    return _to_chunks(variables, rows, chunksize)
+
+
+def read_results(stream, result_format: str = JSON, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    :param stream: A binary file object, e.g. the HTTP response.
+    :param result_format: JSON, CSV or TSV (see SPARQLWrapper).
+    :param chunksize: The maximum number of rows per data frame. If None, all rows are returned in one data frame.
+    :return: Data frames with one column per variable of the result.
+    """
+
+    if result_format == JSON:
+        return read_json_results(stream, chunksize)
+    if result_format == CSV:
+        return read_csv_results(stream, chunksize)
+    if result_format == TSV:
+        return read_tsv_results(stream, chunksize)
+    raise WrongInputFormatException("Unsupported result format: {0}. Use JSON, CSV or TSV.".format(result_format))
+
+
+def _check_pyarrow():
+    if pa is None:
+        raise ImportError("Arrow result sets require the pyarrow package. "
+                          "Install it with: pip install rdf_data_citation[arrow]")
+
+
+def read_arrow_results(stream, result_format: str = JSON, chunksize: int = None) -> Iterator:
+    """
+    Parses a SPARQL result incrementally into pyarrow Tables. JSON results are collected into Arrow arrays directly.
+    CSV and TSV results are converted from their data frames.
+
+    :param stream: A binary file object, e.g. the HTTP response.
+    :param result_format: JSON, CSV or TSV (see SPARQLWrapper).
+    :param chunksize: The maximum number of rows per table. If None, all rows are returned in one table.
+    :return: pyarrow Tables with one string column per variable of the result.
+    """
+
+    _check_pyarrow()
+    if result_format == JSON:
+        return read_json_results(stream, chunksize, yn_arrow_table=True)
+    return (pa.Table.from_pandas(df, schema=pa.schema([(var, pa.string()) for var in df.columns]),
+                                 preserve_index=False)
+            for df in read_results(stream, result_format, chunksize))
+
+
+def dictionary_encode_table(table):
+    """
+    Dictionary-encodes the columns of a pyarrow Table (see dictionary_encode).
+
+    :param table:
+    :return: The table with one dictionary array per variable.
+    """
+
+    _check_pyarrow()
+    return pa.Table.from_arrays([pc.dictionary_encode(column) for column in table.columns],
+                                names=table.column_names)
+
+
+def table_to_pandas(table, yn_zero_copy: bool = False) -> pd.DataFrame:
+    """
+    Hands a pyarrow Table over to pandas.
+
+    :param table:
+    :param yn_zero_copy: If true, the columns of the data frame are backed by the Arrow arrays (pandas.ArrowDtype),
+    so the strings are not copied. Missing values are pandas.NA instead of None. Otherwise, the data frame equals
+    the one of TripleStoreEngine.get_data with object columns, or Categorical columns for dictionary arrays.
+    :return:
+    """
+
+    _check_pyarrow()
+    if yn_zero_copy:
+        if not hasattr(pd, "ArrowDtype"):
+            raise ImportError("Zero-copy data frames require pandas 1.5 or newer.")
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(split_blocks=True)
+
+
+def write_parquet(table, path: str, **kwargs):
+    """
+    Writes a pyarrow Table to a Parquet file without converting it.
+
+    :param table:
+    :param path:
+    :param kwargs: Options of pyarrow.parquet.write_table, e.g. compression.
+    :return:
+    """
+
+    _check_pyarrow()
+    pyarrow.parquet.write_table(table, path, **kwargs)
+
+
+def write_feather(table, path: str, **kwargs):
+    """
+    Writes a pyarrow Table to a Feather (Arrow IPC) file. Uncompressed, the Arrow buffers are written as they are.
+
+    :param table:
+    :param path:
+    :param kwargs: Options of pyarrow.feather.write_feather, e.g. compression="uncompressed".
+    :return:
+    """
+
+    _check_pyarrow()
+    pyarrow.feather.write_feather(table, path, **kwargs)
+
+
+def dictionary_encode(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Dictionary-encodes the RDF terms of each column: every distinct term is stored once and each row holds an
+    integer code (pandas Categorical). The categories are sorted, so sorting by the codes yields the same order
+    as sorting by the terms. Unbound variables become missing values.
+
+    :param df: A result set as returned by the read_*_results functions.
+    :return: The result set with one categorical column per variable.
+    """
+
+    return pd.DataFrame({var: pd.Categorical(df[var]) for var in df.columns}, columns=df.columns, index=df.index)
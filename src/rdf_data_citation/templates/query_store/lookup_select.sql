@@ -1,6 +1,8 @@
 select a.query_checksum, a.orig_query, b.timestamped_query, a.query_prefixes, a.normal_query, a.normal_query_algebra, a.last_execution_pid,
+a.timestamp_template,
 b.query_pid, b.result_set_description, b.result_set_sort_order, b.execution_timestamp,
-b.result_set_checksum, b.citation_data, b.citation_snippet
+b.result_set_checksum, b.result_set_checksum_algorithm,
+b.result_set_block_checksums, b.citation_data, b.citation_snippet
 from query_hub a
 join query_satellite b
 on (a.query_checksum = b.query_checksum and a.last_execution_pid = b.query_pid)
@@ -0,0 +1,3 @@
+select count(*)
+from query_satellite
+where query_checksum = :query_checksum
\ No newline at end of file
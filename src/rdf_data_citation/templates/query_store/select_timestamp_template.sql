@@ -0,0 +1,3 @@
+select timestamp_template
+from query_hub
+where query_checksum = :query_checksum
\ No newline at end of file
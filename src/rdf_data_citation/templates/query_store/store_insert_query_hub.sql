@@ -1,2 +1,3 @@
-insert into query_hub(query_checksum, orig_query, query_prefixes, normal_query, normal_query_algebra)
-values (:query_checksum, :orig_query, :query_prefixes, :normal_query, :normal_query_algebra)
\ No newline at end of file
+insert into query_hub(query_checksum, orig_query, query_prefixes, normal_query, normal_query_algebra,
+                      timestamp_template)
+values (:query_checksum, :orig_query, :query_prefixes, :normal_query, :normal_query_algebra, :timestamp_template)
\ No newline at end of file
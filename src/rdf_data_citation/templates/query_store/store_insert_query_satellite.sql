@@ -1,5 +1,6 @@
 insert into query_satellite(query_pid, query_checksum, timestamped_query, result_set_checksum,
-                           result_set_description, result_set_sort_order, citation_data,
-                           citation_snippet, execution_timestamp)
-values (:query_pid, :query_checksum, :timestamped_query, :result_set_checksum, :result_set_description,
+                           result_set_checksum_algorithm, result_set_block_checksums, result_set_description,
+                           result_set_sort_order, citation_data, citation_snippet, execution_timestamp)
+values (:query_pid, :query_checksum, :timestamped_query, :result_set_checksum, :result_set_checksum_algorithm,
+:result_set_block_checksums, :result_set_description,
 :result_set_sort_order, :citation_data, :citation_snippet, :execution_timestamp)
\ No newline at end of file
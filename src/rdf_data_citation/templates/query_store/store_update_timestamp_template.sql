@@ -0,0 +1,4 @@
+update query_hub
+set timestamp_template = :timestamp_template
+where query_checksum = :query_checksum
+and timestamp_template is null
\ No newline at end of file
@@ -0,0 +1,399 @@
+"""
+Transports create the connections of a TripleStoreEngine to the query, update and Graph Store HTTP Protocol
+endpoints of an RDF store.
+
+SPARQLWrapperTransport is the default. Each of its connections is a SPARQLWrapper, which opens a new
+HTTP connection and authenticates again for every request.
+
+PooledTransport keeps the HTTP connections to each host alive in a pool and reuses the DIGEST authentication
+across requests. It is thread-safe, so one PooledTransport can be shared by many TripleStoreEngine and
+QueryHandler instances, which then share its connection pools. It requires the requests package:
+
+    pip install rdf_data_citation[pooled]
+
+Both transports can negotiate gzip or deflate compressed responses and compress large request bodies with gzip.
+The bytes that were sent and received on the wire and the bytes before compression and after decompression are
+reported per request (see transfer_stats).
+"""
+
+from SPARQLWrapper import SPARQLWrapper, DIGEST, Wrapper
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed, EndPointNotFound, Unauthorized, URITooLong, \
+    EndPointInternalError
+from urllib.error import URLError, HTTPError
+from urllib.request import Request, HTTPDigestAuthHandler, HTTPPasswordMgrWithDefaultRealm, build_opener
+from collections import namedtuple
+import threading
+import gzip
+import zlib
+import io
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.auth import HTTPDigestAuth
+except ImportError:
+    requests = None
+
+# The bytes of one request and its response before compression (request_bytes), on the wire (*_wire_bytes) and
+# after decompression (response_decoded_bytes). The response bytes are counted while the response is read.
+TransferStats = namedtuple('TransferStats', ['request_bytes', 'request_wire_bytes', 'response_wire_bytes',
+                                             'response_decoded_bytes', 'content_encoding'])
+
+
+def transfer_stats(result: Wrapper.QueryResult) -> TransferStats:
+    """
+    :param result: The result of a query or update that was executed over a connection of a transport.
+    :return: The transfer statistics of the request or None if the connection does not count them.
+    """
+
+    response = result.response
+    if not hasattr(response, "wire_bytes"):
+        return None
+    return TransferStats(response.request_bytes, response.request_wire_bytes, response.wire_bytes,
+                         response.decoded_bytes, response.content_encoding)
+
+
+def _compress_request(data: bytes, compress_requests_above: int) -> tuple:
+    """
+    :return: The request body, which is compressed with gzip if it is larger than :compress_requests_above bytes,
+    and the content encoding or None if it is not compressed.
+    """
+
+    if compress_requests_above is not None and data and len(data) > compress_requests_above:
+        return gzip.compress(data), "gzip"
+    return data, None
+
+
+class _DecodingResponse:
+    """
+    Decompresses a gzip or deflate encoded HTTP response while it is read and counts the bytes on the wire and the
+    decoded bytes. Provides the part of the urllib response interface that SPARQLWrapper.QueryResult uses.
+    """
+
+    def __init__(self, response, content_encoding: str, request_bytes: int, request_wire_bytes: int):
+        self._response = response
+        self.content_encoding = content_encoding.strip().lower() if content_encoding else ""
+        self.request_bytes = request_bytes
+        self.request_wire_bytes = request_wire_bytes
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self._buffer = b""
+        self._eof = False
+        if self.content_encoding in ("gzip", "x-gzip"):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.content_encoding == "deflate":
+            self._decompressor = zlib.decompressobj()
+        else:
+            self._decompressor = None
+
+    def _read_chunk(self) -> bytes:
+        chunk = self._response.read(64 * 1024)
+        if not chunk:
+            self._eof = True
+            return self._decompressor.flush() if self._decompressor is not None else b""
+        self.wire_bytes += len(chunk)
+        if self._decompressor is None:
+            return chunk
+        try:
+            return self._decompressor.decompress(chunk)
+        except zlib.error:
+            if self.content_encoding != "deflate" or self.wire_bytes != len(chunk):
+                raise
+            # Some servers send deflate data without zlib header.
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(chunk)
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            chunks = [self._buffer]
+            while not self._eof:
+                chunks.append(self._read_chunk())
+            data = b"".join(chunks)
+            self._buffer = b""
+        else:
+            while not self._eof and len(self._buffer) < size:
+                self._buffer += self._read_chunk()
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        self.decoded_bytes += len(data)
+        return data
+
+    def info(self):
+        return self._response.info()
+
+    def geturl(self) -> str:
+        return self._response.geturl()
+
+    def close(self):
+        self._response.close()
+
+
+class _SPARQLConnection(SPARQLWrapper):
+    """
+    A SPARQLWrapper that negotiates compressed responses, compresses large request bodies and counts the bytes of
+    its requests and responses.
+    """
+
+    def __init__(self, endpoint: str, compression: bool = False, compress_requests_above: int = None):
+        super().__init__(endpoint)
+        self._compression = compression
+        self._compress_requests_above = compress_requests_above
+        self._request_bytes = 0
+        self._request_wire_bytes = 0
+        if compression:
+            self.addCustomHttpHeader("Accept-Encoding", "gzip, deflate")
+
+    def _createRequest(self):
+        request = super()._createRequest()
+        self._request_bytes = len(request.data) if request.data else 0
+        request.data, content_encoding = _compress_request(request.data, self._compress_requests_above)
+        if content_encoding is not None:
+            request.add_header("Content-Encoding", content_encoding)
+        self._request_wire_bytes = len(request.data) if request.data else 0
+        return request
+
+    def _query(self):
+        response, return_format = super()._query()
+        return _DecodingResponse(response, response.info().get("Content-Encoding"), self._request_bytes,
+                                 self._request_wire_bytes), return_format
+
+
+class SPARQLWrapperTransport:
+    """
+    Creates a new SPARQLWrapper per connection. This is the behaviour of TripleStoreEngine without a transport.
+    """
+
+    def __init__(self, compression: bool = False, compress_requests_above: int = None):
+        """
+        :param compression: If True, gzip or deflate compressed responses are accepted. They are decompressed
+        while the result is parsed.
+        :param compress_requests_above: Request bodies, e.g. updates, that are larger than this number of bytes are
+        compressed with gzip. The RDF store must support compressed requests. By default, no request is compressed.
+        """
+
+        self.compression = compression
+        self.compress_requests_above = compress_requests_above
+
+    def connection(self, endpoint: str, method: str, return_format: str = None, credentials=None) -> SPARQLWrapper:
+        """
+        Creates a connection to a SPARQL endpoint with DIGEST authentication.
+
+        :param endpoint: The URL of the query or update endpoint.
+        :param method: GET or POST
+        :param return_format: The format of the result, e.g. JSON. If None, SPARQLWrapper's default is used.
+        :param credentials: An object with a user_name and a pw or None if the endpoint is not protected.
+        :return: An object with the interface of SPARQLWrapper.
+        """
+
+        sparql = self._new_connection(endpoint)
+        sparql.setHTTPAuth(DIGEST)
+        sparql.setMethod(method)
+        if return_format is not None:
+            sparql.setReturnFormat(return_format)
+        if credentials is not None:
+            sparql.setCredentials(credentials.user_name, credentials.pw)
+        return sparql
+
+    def _new_connection(self, endpoint: str) -> SPARQLWrapper:
+        return _SPARQLConnection(endpoint, self.compression, self.compress_requests_above)
+
+    def post(self, url: str, data: bytes, content_type: str, credentials=None) -> TransferStats:
+        """
+        Posts :data to :url, e.g. RDF data to a Graph Store HTTP Protocol endpoint.
+
+        :param url:
+        :param data:
+        :param content_type: The media type of :data.
+        :param credentials: An object with a user_name and a pw or None if the endpoint is not protected.
+        :return: The transfer statistics of the request.
+        :raises urllib.error.HTTPError: If the HTTP return code is 400 or greater.
+        :raises urllib.error.URLError: If no connection could be established.
+        """
+
+        handlers = []
+        if credentials is not None:
+            password_manager = HTTPPasswordMgrWithDefaultRealm()
+            password_manager.add_password(None, url, credentials.user_name, credentials.pw)
+            handlers.append(HTTPDigestAuthHandler(password_manager))
+        wire_data, content_encoding = _compress_request(data, self.compress_requests_above)
+        headers = {'Content-Type': content_type}
+        if content_encoding is not None:
+            headers['Content-Encoding'] = content_encoding
+        request = Request(url, data=wire_data, method="POST", headers=headers)
+        response = build_opener(*handlers).open(request)
+        response_wire_bytes = len(response.read())
+        response.close()
+        return TransferStats(len(data), len(wire_data), response_wire_bytes, response_wire_bytes, "")
+
+
+class _PooledResponse:
+    """
+    Provides the part of the urllib response interface that SPARQLWrapper.QueryResult uses. The response body is
+    read from the socket and decompressed by urllib3 while the result is parsed, so it is never held in memory as
+    a whole. The connection returns to the pool once the body was read completely and the response was closed.
+    """
+
+    def __init__(self, response, request_bytes: int, request_wire_bytes: int, yn_streamed: bool = True):
+        self._response = response
+        self._body = None if yn_streamed else io.BytesIO(response.content)
+        self.content_encoding = response.headers.get("Content-Encoding", "").strip().lower()
+        self.request_bytes = request_bytes
+        self.request_wire_bytes = request_wire_bytes
+        self.decoded_bytes = 0
+
+    @property
+    def wire_bytes(self) -> int:
+        # urllib3 counts the bytes that were read from the socket.
+        return self._response.raw.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._body is not None:
+            data = self._body.read(size)
+            self.decoded_bytes += len(data)
+            return data
+        raw = self._response.raw
+        if size is None or size < 0:
+            data = raw.read(decode_content=True)
+        else:
+            data = raw.read(size, decode_content=True)
+            # Older urllib3 versions return no bytes if a compressed chunk did not decode to any bytes yet.
+            while size > 0 and not data and not raw.closed:
+                data = raw.read(size, decode_content=True)
+        self.decoded_bytes += len(data)
+        return data
+
+    def info(self) -> dict:
+        return dict(self._response.headers)
+
+    def geturl(self) -> str:
+        return self._response.url
+
+    def close(self):
+        self._response.close()
+
+
+class _PooledSPARQLWrapper(_SPARQLConnection):
+    """
+    A SPARQLWrapper that sends its requests through the connection pools of a requests session instead of
+    opening a new urllib connection per request.
+    """
+
+    def __init__(self, endpoint: str, session, compression: bool = True, compress_requests_above: int = None):
+        super().__init__(endpoint, compression, compress_requests_above)
+        self._session = session
+        self._digest_auth = None
+
+    def _auth(self):
+        if not (self.user and self.passwd) or self.http_auth != DIGEST:
+            # Basic authentication is sent as header by SPARQLWrapper._createRequest
+            return None
+        if self._digest_auth is None or (self._digest_auth.username, self._digest_auth.password) != \
+                (self.user, self.passwd):
+            # HTTPDigestAuth keeps the server's nonce per thread, so the challenge is not repeated for every request.
+            self._digest_auth = HTTPDigestAuth(self.user, self.passwd)
+        return self._digest_auth
+
+    def _query(self):
+        user = self.user
+        if self.http_auth == DIGEST:
+            # Prevents SPARQLWrapper from installing a global urllib opener for DIGEST authentication.
+            self.user = None
+        try:
+            request = self._createRequest()
+        finally:
+            self.user = user
+
+        headers = dict(request.header_items())
+        if not self._compression:
+            # requests accepts compressed responses by default.
+            headers['Accept-Encoding'] = "identity"
+        try:
+            # Query results are streamed into the result parser. The short responses of updates are read at once,
+            # which returns the connection to the pool even if the result is never read.
+            yn_streamed = not self.isSparqlUpdateRequest()
+            response = self._session.request(request.get_method(), request.full_url, data=request.data,
+                                             headers=headers, auth=self._auth(), timeout=self.timeout,
+                                             stream=yn_streamed)
+        except requests.ConnectionError as e:
+            raise URLError(e)
+
+        if response.status_code == 400:
+            raise QueryBadFormed(response.content)
+        elif response.status_code == 404:
+            raise EndPointNotFound(response.content)
+        elif response.status_code == 401:
+            raise Unauthorized(response.content)
+        elif response.status_code == 414:
+            raise URITooLong(response.content)
+        elif response.status_code == 500:
+            raise EndPointInternalError(response.content)
+        elif response.status_code >= 400:
+            raise HTTPError(request.full_url, response.status_code, response.reason, response.headers, None)
+
+        return _PooledResponse(response, self._request_bytes, self._request_wire_bytes, yn_streamed), \
+            self.returnFormat
+
+
+class PooledTransport(SPARQLWrapperTransport):
+    """
+    Keeps up to :pool_size HTTP connections per host alive and shares them between all connections that are
+    created by this transport.
+    """
+
+    def __init__(self, pool_size: int = 10, max_hosts: int = 10, pool_block: bool = True, compression: bool = True,
+                 compress_requests_above: int = None):
+        """
+        :param pool_size: The maximum number of HTTP connections per host.
+        :param max_hosts: The maximum number of hosts for which a connection pool is kept.
+        :param pool_block: If True, a request waits until a connection of the pool is free if all :pool_size
+        connections are in use. Otherwise, an additional connection is opened and closed after the request.
+        :param compression: See SPARQLWrapperTransport.
+        :param compress_requests_above: See SPARQLWrapperTransport.
+        """
+
+        if requests is None:
+            raise ImportError("PooledTransport requires the requests package. "
+                              "Install it with: pip install rdf_data_citation[pooled]")
+        if pool_size < 1:
+            raise ValueError("pool_size must be greater than 0.")
+
+        super().__init__(compression, compress_requests_above)
+        self.pool_size = pool_size
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=pool_size, pool_block=pool_block)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._digest_auths = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, endpoint: str) -> SPARQLWrapper:
+        return _PooledSPARQLWrapper(endpoint, self._session, self.compression, self.compress_requests_above)
+
+    def post(self, url: str, data: bytes, content_type: str, credentials=None) -> TransferStats:
+        auth = None
+        if credentials is not None:
+            with self._lock:
+                key = (credentials.user_name, credentials.pw)
+                if key not in self._digest_auths:
+                    self._digest_auths[key] = HTTPDigestAuth(credentials.user_name, credentials.pw)
+                auth = self._digest_auths[key]
+        wire_data, content_encoding = _compress_request(data, self.compress_requests_above)
+        headers = {'Content-Type': content_type}
+        if content_encoding is not None:
+            headers['Content-Encoding'] = content_encoding
+        try:
+            response = self._session.post(url, data=wire_data, headers=headers, auth=auth)
+        except requests.ConnectionError as e:
+            raise URLError(e)
+        if response.status_code >= 400:
+            raise HTTPError(url, response.status_code, response.reason, response.headers, None)
+        return TransferStats(len(data), len(wire_data), response.raw.tell(), len(response.content),
+                             response.headers.get("Content-Encoding", "").strip().lower())
+
+    def close(self):
+        """
+        Closes all pooled connections.
+
+        :return:
+        """
+
+        self._session.close()
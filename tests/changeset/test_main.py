@@ -0,0 +1,151 @@
+from src.rdf_data_citation.changeset import compute_changeset, parse_ntriples_line, read_ntriples
+from src.rdf_data_citation._exceptions import WrongInputFormatException
+from tests.test_base import Test, TestExecution
+import gzip
+import os
+import shutil
+import tempfile
+
+
+class TestChangeset(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.old_path = "test_data/snapshot_old.nt"
+        self.new_path = "test_data/snapshot_new.nt"
+        self.expected_added = sorted([
+            ('<http://ex.org/s3>', '<http://ex.org/p>', '"43"^^<http://www.w3.org/2001/XMLSchema#integer>'),
+            ('<< <http://ex.org/s1> <http://ex.org/p> <http://ex.org/o1> >>', '<http://ex.org/source>',
+             '<http://ex.org/dump2>'),
+            ('<http://ex.org/s8>', '<http://ex.org/p>', '"added literal with a _:label"')])
+        self.expected_removed = sorted([
+            ('<http://ex.org/s3>', '<http://ex.org/p>', '"42"^^<http://www.w3.org/2001/XMLSchema#integer>'),
+            ('<http://ex.org/s4>', '<http://ex.org/p>', '"removed \\"quoted\\" literal"'),
+            ('<< <http://ex.org/s1> <http://ex.org/p> <http://ex.org/o1> >>', '<http://ex.org/source>',
+             '<http://ex.org/dump1>')])
+
+    def changeset(self, old_path: str, new_path: str, partition_size: int, max_open_files: int = 256) -> tuple:
+        added, removed, cnt_unchanged, cnt_skipped, cnt_partitions = [], [], 0, 0, 0
+        for i, cnt_partitions, partition_added, partition_removed, cnt_partition_unchanged, cnt_partition_skipped \
+                in compute_changeset(old_path, new_path, partition_size, max_open_files=max_open_files):
+            added.extend(partition_added)
+            removed.extend(partition_removed)
+            cnt_unchanged += cnt_partition_unchanged
+            cnt_skipped += cnt_partition_skipped
+        return sorted(added), sorted(removed), cnt_unchanged, cnt_skipped, cnt_partitions
+
+    def test_parse_ntriples_line__terms(self):
+        line = '<< <http://ex.org/s> <http://ex.org/p> "a b"@en >>  <http://ex.org/q> "c \\" d"^^<http://ex.org/t> .\n'
+        test = Test(test_number=1,
+                    tc_desc='Test if an N-Triples-star statement with a quoted triple and literals that contain '
+                            'whitespaces and escaped quotes is split into its three terms.',
+                    expected_result=str(('<< <http://ex.org/s> <http://ex.org/p> "a b"@en >>', '<http://ex.org/q>',
+                                         '"c \\" d"^^<http://ex.org/t>')),
+                    actual_result=str(parse_ntriples_line(line)))
+
+        return test
+
+    def test_parse_ntriples_line__errors(self):
+        lines = ['<http://ex.org/s> <http://ex.org/p> "not closed .',
+                 '<http://ex.org/s> <http://ex.org/p> <http://ex.org/o>',
+                 '<< <http://ex.org/s> <http://ex.org/p> <http://ex.org/o> <http://ex.org/q> <http://ex.org/o> .',
+                 'http://ex.org/s <http://ex.org/p> <http://ex.org/o> .']
+        cnt_errors = 0
+        for line in lines:
+            try:
+                parse_ntriples_line(line)
+            except WrongInputFormatException:
+                cnt_errors += 1
+
+        test = Test(test_number=2,
+                    tc_desc='Test if malformed statements raise a WrongInputFormatException and if comments and '
+                            'empty lines are ignored.',
+                    expected_result="errors: 4, comment: None, empty line: None",
+                    actual_result="errors: {0}, comment: {1}, empty line: {2}".format(
+                        cnt_errors, parse_ntriples_line("# comment\n"), parse_ntriples_line("  \n")))
+
+        return test
+
+    def test_compute_changeset__one_partition(self):
+        added, removed, cnt_unchanged, cnt_skipped, cnt_partitions = self.changeset(self.old_path, self.new_path,
+                                                                                     64 * 1024 * 1024)
+        test = Test(test_number=3,
+                    tc_desc='Test if the added and removed triples of two snapshots are computed within one '
+                            'partition. Duplicates are counted once and triples with blank nodes are skipped.',
+                    expected_result="partitions: 1, added: {0}, removed: {1}, unchanged: 3, skipped: 2".format(
+                        self.expected_added, self.expected_removed),
+                    actual_result="partitions: {0}, added: {1}, removed: {2}, unchanged: {3}, skipped: {4}".format(
+                        cnt_partitions, added, removed, cnt_unchanged, cnt_skipped))
+
+        return test
+
+    def test_compute_changeset__many_partitions(self):
+        added, removed, cnt_unchanged, cnt_skipped, cnt_partitions = self.changeset(self.old_path, self.new_path, 100)
+        test = Test(test_number=4,
+                    tc_desc='Test if the changeset is the same if the snapshots are split into many partitions.',
+                    expected_result="many partitions: True, added: {0}, removed: {1}, unchanged: 3, "
+                                    "skipped: 2".format(self.expected_added, self.expected_removed),
+                    actual_result="many partitions: {0}, added: {1}, removed: {2}, unchanged: {3}, "
+                                  "skipped: {4}".format(cnt_partitions > 1, added, removed, cnt_unchanged,
+                                                        cnt_skipped))
+
+        return test
+
+    def test_compute_changeset__gzip(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for path in [self.old_path, self.new_path]:
+                with open(path, "rb") as snapshot, \
+                        gzip.open(os.path.join(directory, os.path.basename(path) + ".gz"), "wb") as gz_snapshot:
+                    shutil.copyfileobj(snapshot, gz_snapshot)
+            gz_changeset = self.changeset(os.path.join(directory, "snapshot_old.nt.gz"),
+                                          os.path.join(directory, "snapshot_new.nt.gz"), 64 * 1024 * 1024)
+            cnt_triples = len(list(read_ntriples(os.path.join(directory, "snapshot_new.nt.gz"))))
+        finally:
+            shutil.rmtree(directory)
+
+        test = Test(test_number=5,
+                    tc_desc='Test if gzip compressed snapshots yield the same changeset.',
+                    expected_result="triples: 8, changeset: {0}".format(
+                        (self.expected_added, self.expected_removed, 3, 2)),
+                    actual_result="triples: {0}, changeset: {1}".format(cnt_triples, gz_changeset[:4]))
+
+        return test
+
+    def test_compute_changeset__max_open_files(self):
+        changeset = self.changeset(self.old_path, self.new_path, 100)
+        changeset_in_passes = self.changeset(self.old_path, self.new_path, 100, max_open_files=2)
+        test = Test(test_number=6,
+                    tc_desc='Test if the changeset is the same if the partitions are written in several passes '
+                            'because more partitions are needed than files may be open at the same time.',
+                    expected_result="passes: True, changeset: {0}".format(changeset),
+                    actual_result="passes: {0}, changeset: {1}".format(changeset_in_passes[4] > 2,
+                                                                      changeset_in_passes))
+
+        return test
+
+    def test_compute_changeset__gzip_partitions(self):
+        directory = tempfile.mkdtemp()
+        try:
+            for path in [self.old_path, self.new_path]:
+                with open(path, "rb") as snapshot, \
+                        gzip.open(os.path.join(directory, os.path.basename(path) + ".gz"), "wb") as gz_snapshot:
+                    shutil.copyfileobj(snapshot, gz_snapshot)
+            cnt_gz_partitions = self.changeset(os.path.join(directory, "snapshot_old.nt.gz"),
+                                               os.path.join(directory, "snapshot_new.nt.gz"), 100)[4]
+        finally:
+            shutil.rmtree(directory)
+        cnt_partitions = self.changeset(self.old_path, self.new_path, 100)[4]
+
+        test = Test(test_number=7,
+                    tc_desc='Test if the partitions of gzip compressed snapshots are not larger than the partitions '
+                            'of the uncompressed snapshots, i.e. if the decompressed size is estimated.',
+                    expected_result="at least as many partitions: True",
+                    actual_result="at least as many partitions: {0}".format(cnt_gz_partitions >= cnt_partitions))
+
+        return test
+
+
+t = TestChangeset(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
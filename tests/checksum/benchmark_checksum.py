@@ -0,0 +1,54 @@
+"""
+Benchmarks the result set checksums against the number of rows. The synthetic result sets have eight columns of
+IRIs with a decreasing number of distinct values, where every tenth value of the last column is missing. For every
+size the column order independent algorithms, the legacy cell-wise one (sha256-cell-sum-v1) and the vectorized one
+(column-hash-sum-v2), and the column order dependent algorithms, pandas' row hash (pandas-row-hash-v1) and the
+canonical serialization (canonical-blake2b-v1), hash the same data frame. The cell-wise algorithm is only measured
+up to 100000 rows, because it takes minutes on larger result sets. Run from this directory:
+
+    python benchmark_checksum.py
+"""
+
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils, CHECKSUM_CELL_SUM_V1, \
+    CHECKSUM_COLUMN_HASH_SUM_V2, CHECKSUM_ROW_HASH_V1, CHECKSUM_CANONICAL_V1
+import pandas as pd
+import timeit
+
+
+def synthetic_dataset(cnt_rows: int, cnt_columns: int = 8) -> pd.DataFrame:
+    """
+    :param cnt_rows: Number of rows.
+    :param cnt_columns: Number of columns.
+    :return: A data frame with :cnt_rows rows and :cnt_columns columns of IRIs.
+    """
+
+    columns = {}
+    for i in range(cnt_columns):
+        values = ["http://example.org/c{0}/{1}".format(i, j % max(cnt_rows // (i + 1), 1)) for j in range(cnt_rows)]
+        columns["c{0}".format(i)] = values
+    dataset = pd.DataFrame(columns)
+    dataset.iloc[::10, -1] = None
+    return dataset
+
+
+def time_checksum(dataset: pd.DataFrame, algorithm: str, repeat: int = 3) -> float:
+    rdf_ds = RDFDataSetUtils()
+    return min(timeit.repeat(lambda: rdf_ds.compute_checksum(dataset, algorithm=algorithm), number=1,
+                             repeat=repeat))
+
+
+if __name__ == "__main__":
+    print("{0:>8} {1:>11} {2:>15} {3:>8} {4:>13} {5:>14} {6:>8}".format(
+        "rows", "legacy [s]", "vectorized [s]", "speedup", "row hash [s]", "canonical [s]", "speedup"))
+    for cnt_rows in [10000, 100000, 1000000, 2000000]:
+        dataset = synthetic_dataset(cnt_rows)
+        vectorized = time_checksum(dataset, CHECKSUM_COLUMN_HASH_SUM_V2)
+        row_hash = time_checksum(dataset, CHECKSUM_ROW_HASH_V1)
+        canonical = time_checksum(dataset, CHECKSUM_CANONICAL_V1)
+        if cnt_rows <= 100000:
+            legacy = time_checksum(dataset, CHECKSUM_CELL_SUM_V1, repeat=1)
+            legacy_columns = "{0:>11.3f} {1:>15.3f} {2:>8.1f}".format(legacy, vectorized, legacy / vectorized)
+        else:
+            legacy_columns = "{0:>11} {1:>15.3f} {2:>8}".format("-", vectorized, "-")
+        print("{0:>8} {1} {2:>13.3f} {3:>14.3f} {4:>8.1f}".format(cnt_rows, legacy_columns, row_hash, canonical,
+                                                                  row_hash / canonical))
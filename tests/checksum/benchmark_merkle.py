@@ -0,0 +1,35 @@
+"""
+Benchmarks the Merkle tree checksum (merkle-blake2b-v1) against the number of workers. The blocks of the synthetic
+result sets (see benchmark_checksum.synthetic_dataset) are hashed sequentially, in a thread pool and in a process
+pool. The canonical checksum (canonical-blake2b-v1) hashes the same data frame as a baseline. Speedups require
+several CPU cores. Run from this directory:
+
+    python benchmark_merkle.py
+"""
+
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils, CHECKSUM_CANONICAL_V1
+from benchmark_checksum import synthetic_dataset, time_checksum
+import os
+import timeit
+
+
+def time_merkle_checksum(dataset, workers: int, yn_process_pool: bool = False, repeat: int = 3) -> float:
+    rdf_ds = RDFDataSetUtils()
+    return min(timeit.repeat(lambda: rdf_ds.compute_merkle_checksum(dataset, workers=workers,
+                                                                     yn_process_pool=yn_process_pool),
+                             number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    cnt_workers = os.cpu_count() or 1
+    print("CPUs: {0}".format(cnt_workers))
+    print("{0:>8} {1:>14} {2:>15} {3:>12} {4:>13} {5:>8}".format(
+        "rows", "canonical [s]", "sequential [s]", "threads [s]", "processes [s]", "speedup"))
+    for cnt_rows in [100000, 1000000, 2000000]:
+        dataset = synthetic_dataset(cnt_rows)
+        canonical = time_checksum(dataset, CHECKSUM_CANONICAL_V1)
+        sequential = time_merkle_checksum(dataset, workers=1)
+        threads = time_merkle_checksum(dataset, workers=cnt_workers)
+        processes = time_merkle_checksum(dataset, workers=cnt_workers, yn_process_pool=True)
+        print("{0:>8} {1:>14.3f} {2:>15.3f} {3:>12.3f} {4:>13.3f} {5:>8.1f}".format(
+            cnt_rows, canonical, sequential, threads, processes, sequential / min(threads, processes)))
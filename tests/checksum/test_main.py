@@ -0,0 +1,187 @@
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils, ResultSetChecksum, changed_row_ranges, \
+    CHECKSUM_CELL_SUM_V1, CHECKSUM_ROW_HASH_V1, CHECKSUM_COLUMN_HASH_SUM_V2, CHECKSUM_CANONICAL_V1, CHECKSUM_MERKLE_V1
+from src.rdf_data_citation.sparql_results import dictionary_encode
+from tests.test_base import Test, TestExecution
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import hashlib
+
+
+class TestChecksum(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.dataset = pd.DataFrame({'s': ['http://ex.org/s1', 'http://ex.org/s2', 'http://ex.org/s3'],
+                                     'label': ['one@en', None, 'drei@de'],
+                                     'age': ['31 [http://www.w3.org/2001/XMLSchema#integer]', '42', None]})
+
+    def test_column_hash_sum__column_order(self):
+        rdf_ds = RDFDataSetUtils()
+        checksums = [rdf_ds.compute_checksum(dataset) for dataset in
+                     [self.dataset, self.dataset[['age', 's', 'label']], dictionary_encode(self.dataset),
+                      pa.Table.from_pandas(self.dataset), self.dataset.fillna(np.nan),
+                      self.dataset.astype("string")]]
+        float_dataset = pd.DataFrame({'s': ['http://ex.org/s1', 'http://ex.org/s2'], 'value': [1.5, np.nan]})
+        float_checksums = [rdf_ds.compute_checksum(dataset) for dataset in
+                           [float_dataset, pa.Table.from_pandas(float_dataset), dictionary_encode(float_dataset),
+                            float_dataset.astype({'value': str}).replace("nan", None)]]
+
+        test = Test(test_number=1,
+                    tc_desc='Test if the vectorized checksum is the same for any column order, for dictionary-encoded '
+                            'data frames, Arrow tables and other representations of missing values, also in float '
+                            'columns.',
+                    expected_result=str([RDFDataSetUtils(self.dataset).checksum] * 6 + [float_checksums[0]] * 4),
+                    actual_result=str(checksums + float_checksums))
+
+        return test
+
+    def test_column_hash_sum__changes(self):
+        rdf_ds = RDFDataSetUtils()
+        checksum = rdf_ds.compute_checksum(self.dataset)
+        changed_value = self.dataset.replace("42", "43")
+        swapped_columns = self.dataset.rename(columns={'s': 'label', 'label': 's'})
+        none_string = self.dataset.fillna("None")
+        swapped_rows = self.dataset.iloc[[1, 0, 2]]
+
+        test = Test(test_number=2,
+                    tc_desc='Test if the vectorized checksum changes if a value changes, if values move to another '
+                            'column, if missing values are replaced by the string None and if rows are swapped.',
+                    expected_result=str([True] * 4),
+                    actual_result=str([rdf_ds.compute_checksum(dataset) != checksum for dataset in
+                                       [changed_value, swapped_columns, none_string, swapped_rows]]))
+
+        return test
+
+    def test_compute_checksum__algorithms(self):
+        rdf_ds = RDFDataSetUtils(self.dataset)
+        try:
+            rdf_ds.compute_checksum(algorithm="md5")
+            error = None
+        except ValueError as e:
+            error = type(e).__name__
+
+        # Checksums computed before the checksum algorithms were versioned.
+        test = Test(test_number=3,
+                    tc_desc='Test if the legacy algorithms still yield the checksums they yielded before they were '
+                            'versioned and if unknown algorithms are rejected.',
+                    expected_result=str([CHECKSUM_COLUMN_HASH_SUM_V2,
+                                         "fcb41f17b63cf47aad51456c169b2cab77a4a29d6061e6c903744ab200988172",
+                                         "b55b2575a90ed955262dc69c36ebc6f77ef776a53c51dbf148a59bc05f0608c0",
+                                         "ValueError"]),
+                    actual_result=str([rdf_ds.checksum_algorithm,
+                                       rdf_ds.compute_checksum(algorithm=CHECKSUM_CELL_SUM_V1),
+                                       rdf_ds.compute_checksum(algorithm=CHECKSUM_ROW_HASH_V1),
+                                       error]))
+
+        return test
+
+    def test_canonical__serialization(self):
+        dataset = pd.DataFrame({'s': ['http://ex.org/s1', 'http://ex.org/s2'],
+                                'label': ['two\twords \\ "quoted"', None]})
+        serialization = 's\tlabel\nhttp://ex.org/s1\ttwo\\twords \\\\ "quoted"\nhttp://ex.org/s2\t\\N\n'
+        rdf_ds = RDFDataSetUtils()
+
+        test = Test(test_number=4,
+                    tc_desc='Test if the canonical checksum is the BLAKE2b hash of the header line and the rows in '
+                            'column order, separated by tabs, with escaped terms and missing values as \\N. It is '
+                            'the default for column order dependent checksums.',
+                    expected_result=str([hashlib.blake2b(serialization.encode("utf-8"), digest_size=32).hexdigest()]
+                                        * 2),
+                    actual_result=str([rdf_ds.compute_checksum(dataset, algorithm=CHECKSUM_CANONICAL_V1),
+                                       rdf_ds.compute_checksum(dataset, column_order_dependent=True)]))
+
+        return test
+
+    def test_canonical__representations(self):
+        rdf_ds = RDFDataSetUtils()
+        checksum = rdf_ds.compute_checksum(self.dataset, algorithm=CHECKSUM_CANONICAL_V1)
+        checksums = [rdf_ds.compute_checksum(dataset, algorithm=CHECKSUM_CANONICAL_V1) for dataset in
+                     [self.dataset.set_index(self.dataset.index + 10), dictionary_encode(self.dataset),
+                      pa.Table.from_pandas(self.dataset), self.dataset.fillna(np.nan),
+                      self.dataset.astype("string")]]
+        changed = [rdf_ds.compute_checksum(dataset, algorithm=CHECKSUM_CANONICAL_V1) for dataset in
+                   [self.dataset[['age', 's', 'label']], self.dataset.fillna("\\N"),
+                    self.dataset.iloc[[1, 0, 2]]]]
+
+        test = Test(test_number=5,
+                    tc_desc='Test if the canonical checksum neither depends on the index nor on the representation '
+                            'of the dataset and if it changes with the column order, the row order and if missing '
+                            'values are replaced by the string \\N.',
+                    expected_result=str([[checksum] * 5, [True] * 3]),
+                    actual_result=str([checksums, [c != checksum for c in changed]]))
+
+        return test
+
+    def test_result_set_checksum__chunks(self):
+        rdf_ds = RDFDataSetUtils()
+        checksums = []
+        expected_checksums = []
+        for algorithm in ResultSetChecksum.algorithms:
+            expected_checksums += [rdf_ds.compute_checksum(self.dataset, algorithm=algorithm)] * 2
+            checksum = ResultSetChecksum(algorithm)
+            for start in range(0, 3, 2):
+                checksum.update(self.dataset.iloc[start:start + 2])
+            checksums.append(checksum.hexdigest())
+            checksum = ResultSetChecksum(algorithm)
+            for batch in pa.Table.from_pandas(self.dataset, preserve_index=False).to_batches(max_chunksize=1):
+                checksum.update(pa.Table.from_batches([batch]))
+            checksums.append(checksum.hexdigest())
+
+        errors = []
+        checksum = ResultSetChecksum()
+        checksum.update(self.dataset)
+        for update in [lambda: ResultSetChecksum(CHECKSUM_ROW_HASH_V1),
+                       lambda: checksum.update(self.dataset[['age', 's', 'label']])]:
+            try:
+                update()
+            except ValueError as e:
+                errors.append(type(e).__name__)
+
+        test = Test(test_number=6,
+                    tc_desc='Test if the checksum of a result set that is computed chunk by chunk equals the checksum '
+                            'of the whole result set and if algorithms that cannot be computed chunk by chunk and '
+                            'chunks with other columns are rejected.',
+                    expected_result=str([expected_checksums, ["ValueError"] * 2]),
+                    actual_result=str([checksums, errors]))
+
+        return test
+
+    def test_merkle__blocks(self):
+        rdf_ds = RDFDataSetUtils()
+        dataset = pd.concat([self.dataset] * 3, ignore_index=True)
+        merkle_checksum = rdf_ds.compute_merkle_checksum(dataset, block_size=2, workers=1)
+        merkle_checksums = [rdf_ds.compute_merkle_checksum(dataset, block_size=2, workers=2),
+                            rdf_ds.compute_merkle_checksum(dataset, block_size=2, workers=2, yn_process_pool=True),
+                            rdf_ds.compute_merkle_checksum(pa.Table.from_pandas(dataset), block_size=2)]
+        chunked_checksum = ResultSetChecksum(CHECKSUM_MERKLE_V1, block_size=2)
+        for start in range(0, 9, 3):
+            chunked_checksum.update(dataset.iloc[start:start + 3])
+        merkle_checksums.append(chunked_checksum.merkle_checksum())
+
+        changed_dataset = dataset.copy()
+        changed_dataset.iloc[4, 1] = "fünf@de"
+        changed_merkle_checksum = rdf_ds.compute_merkle_checksum(changed_dataset, block_size=2)
+        appended_merkle_checksum = rdf_ds.compute_merkle_checksum(pd.concat([dataset, self.dataset]), block_size=2)
+        try:
+            changed_row_ranges(merkle_checksum, rdf_ds.compute_merkle_checksum(dataset, block_size=3))
+            error = None
+        except ValueError as e:
+            error = type(e).__name__
+
+        test = Test(test_number=7,
+                    tc_desc='Test if the Merkle tree checksum is the same if the blocks are hashed sequentially, in '
+                            'a thread pool, in a process pool, from an Arrow table or chunk by chunk, if the changed '
+                            'row ranges are found and if checksums with different block sizes are rejected.',
+                    expected_result=str([[merkle_checksum] * 4, 5,
+                                         [range(4, 6)], [range(8, 10), range(10, 12)], "ValueError"]),
+                    actual_result=str([merkle_checksums, len(merkle_checksum.block_checksums),
+                                       changed_row_ranges(merkle_checksum, changed_merkle_checksum),
+                                       changed_row_ranges(merkle_checksum, appended_merkle_checksum), error]))
+
+        return test
+
+
+t = TestChecksum(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
@@ -0,0 +1,79 @@
+from src.rdf_data_citation.persistent_id_utils import _translate_algebra
+from tests.test_base import Test, TestExecution
+from concurrent.futures import ThreadPoolExecutor
+import rdflib.plugins.sparql.parser as parser
+import rdflib.plugins.sparql.algebra as algebra
+import glob
+import os
+import logging
+
+
+class TestConcurrency(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False, cnt_translations: int = 500, cnt_workers: int = 32):
+        """
+
+        :param cnt_translations: Number of translations that are run in parallel over the algebra_to_text corpus.
+        :param cnt_workers: Number of threads.
+        """
+        super().__init__(annotated_tests)
+        self.cnt_translations = cnt_translations
+        self.cnt_workers = cnt_workers
+        self.queries = {}
+        self.expected_translations = {}
+
+    def before_all_tests(self):
+        """
+        Reads the algebra_to_text corpus and translates each query once sequentially. These translations
+        serve as the expected results for the parallel runs.
+
+        :return:
+        """
+
+        print("Executing before_tests ...")
+        for path in sorted(glob.glob("../algebra_to_text/test_data/*.txt")):
+            query = open(path, "r").read()
+            try:
+                self.expected_translations[path] = _translate_algebra(algebra.translateQuery(parser.parseQuery(query)))
+                self.queries[path] = query
+            except Exception as e:
+                logging.info("{0} is not part of the concurrency corpus: {1}".format(path, e))
+
+    def test_concurrency__parallel_translations(self):
+        def translate(path):
+            query_algebra = algebra.translateQuery(parser.parseQuery(self.queries[path]))
+            return path, _translate_algebra(query_algebra)
+
+        paths = list(self.queries.keys())
+        tasks = [paths[i % len(paths)] for i in range(self.cnt_translations)]
+        with ThreadPoolExecutor(max_workers=self.cnt_workers) as executor:
+            results = list(executor.map(translate, tasks))
+        mismatches = [path for path, translation in results if translation != self.expected_translations[path]]
+
+        test = Test(test_number=1,
+                    tc_desc='Test if {0} translations of the algebra_to_text corpus that run in parallel on {1} '
+                            'threads yield the same query texts as the sequential translations.'
+                            .format(self.cnt_translations, self.cnt_workers),
+                    expected_result="mismatches: 0",
+                    actual_result="mismatches: {0}".format(len(mismatches)))
+
+        return test
+
+    def test_concurrency__no_files_written(self):
+        query_algebra = algebra.translateQuery(parser.parseQuery(next(iter(self.queries.values()))))
+        files_before = set(os.listdir("."))
+        _translate_algebra(query_algebra)
+        files_after = set(os.listdir("."))
+
+        test = Test(test_number=2,
+                    tc_desc='Test if the translation from the query algebra to the query text does not write any '
+                            'files into the working directory.',
+                    expected_result="new files: []",
+                    actual_result="new files: {0}".format(sorted(files_after - files_before)))
+
+        return test
+
+
+t = TestConcurrency(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
@@ -0,0 +1,81 @@
+"""
+Compares the normalization of QueryUtils.normalize_query_tree with the normalization as it was before its tree
+traversals were fused and before the triple statements were sorted once per BGP (legacy_normalization.py).
+First, it checks that both yield identical checksums and normalized query trees for all queries in test_data.
+Second, it measures both on synthetic queries that grow in the number of triple statements and sequence paths.
+Both normalize a copy of the same prepared query, so the parsing time is not part of the measurement.
+Run from this directory:
+
+    python benchmark_normalization.py
+"""
+
+from src.rdf_data_citation.persistent_id_utils import QueryUtils, PreparedQuery, _translate_algebra
+from tests.normalization.legacy_normalization import normalize_query_tree_legacy
+import glob
+import hashlib
+import sys
+import timeit
+
+
+def checksum(query_algebra) -> str:
+    return hashlib.sha256(str.encode(_translate_algebra(query_algebra))).hexdigest()
+
+
+def synthetic_query(size: int) -> str:
+    """
+    Creates a select statement with :size triple statements and :size // 4 sequence paths. The statements share
+    20 variables because the normalization only supports up to 26 variables.
+
+    :param size: Number of triple statements.
+    :return:
+    """
+
+    triples = " ".join("?s{0} <http://example.org/p{1}> ?o{0} .".format(i % 10, i) for i in range(size))
+    paths = " ".join("?o{0} <http://example.org/q{1}>/<http://example.org/r{1}> <http://example.org/x{1}> ."
+                     .format(i % 10, i) for i in range(size // 4))
+    return "select ?s0 ?o0 where {{ {0} {1} }} order by ?s0".format(triples, paths)
+
+
+def normalize_query_tree(prepared_query: PreparedQuery):
+    query_utils = QueryUtils()
+    query_utils.prepared_query = prepared_query
+    return query_utils.normalize_query_tree()
+
+
+def compare_checksums() -> int:
+    mismatches = []
+    paths = sorted(glob.glob("test_data/*.txt"))
+    for path in paths:
+        query = open(path, "r").read()
+        try:
+            legacy = normalize_query_tree_legacy(query)
+        except Exception as e:
+            legacy = "{0}: {1}".format(type(e).__name__, e)
+        try:
+            fused = QueryUtils().normalize_query_tree(query)
+        except Exception as e:
+            fused = "{0}: {1}".format(type(e).__name__, e)
+        if isinstance(legacy, str) or isinstance(fused, str):
+            if legacy != fused:
+                mismatches.append(path)
+        elif (checksum(legacy), str(legacy.algebra)) != (checksum(fused), str(fused.algebra)):
+            mismatches.append(path)
+
+    print("{0} queries, identical checksums and query trees: {1}, mismatches: {2}"
+          .format(len(paths), len(paths) - len(mismatches), mismatches))
+    return len(mismatches)
+
+
+if __name__ == "__main__":
+    # rdflib's parser recurses per triple statement
+    sys.setrecursionlimit(100000)
+    if compare_checksums():
+        sys.exit(1)
+
+    print("{0:>6} {1:>12} {2:>12} {3:>8}".format("size", "legacy [s]", "fused [s]", "speedup"))
+    for size in [25, 50, 100, 200, 400, 800]:
+        prepared_query = PreparedQuery(synthetic_query(size))
+        assert checksum(normalize_query_tree_legacy(prepared_query)) == checksum(normalize_query_tree(prepared_query))
+        legacy = min(timeit.repeat(lambda: normalize_query_tree_legacy(prepared_query), number=1, repeat=3))
+        fused = min(timeit.repeat(lambda: normalize_query_tree(prepared_query), number=1, repeat=3))
+        print("{0:>6} {1:>12.4f} {2:>12.4f} {3:>8.1f}".format(size, legacy, fused, legacy / fused))
@@ -0,0 +1,287 @@
+"""
+The query normalization as it was before its tree traversals were fused. It only serves as the reference for
+benchmark_normalization.py, which checks that both normalizations yield identical checksums and measures the
+speedup.
+"""
+
+from src.rdf_data_citation.persistent_id_utils import _query_algebra, _resolve_paths, PreparedQuery
+from src.rdf_data_citation.prefixes import split_prefixes_query
+from src.rdf_data_citation._exceptions import ExpressionNotCoveredException
+from rdflib.plugins.sparql.parserutils import CompValue, Expr
+from rdflib.plugins.sparql.operators import TrueFilter, UnaryNot, Builtin_BOUND
+from rdflib.term import Variable
+from rdflib.paths import Path
+import rdflib.plugins.sparql.algebra as algebra
+from typing import Union
+import logging
+
+
+def _resolve_paths_legacy(node):
+    """
+    Resolves paths like _resolve_paths but orders the triple statements with rdflib's reorderTriples, which sorts
+    the remaining triple statements again after each statement.
+    """
+
+    _resolve_paths(node)
+    if isinstance(node, CompValue) and node.name == "BGP":
+        node.triples = algebra.reorderTriples(node["triples"])
+
+
+def normalize_query_tree_legacy(query: Union[str, PreparedQuery]) -> algebra.Query:
+    """
+    R4 - Query Uniqueness
+    Normalizes the query tree like QueryUtils.normalize_query_tree with one tree traversal per normalization step.
+
+    :param query: The SPARQL select statement including its prefixes or the prepared query, whose query tree is
+    copied instead of parsing the query.
+    :return: normalized query tree object
+    """
+
+    if isinstance(query, PreparedQuery):
+        q_algebra = query.algebra_copy()
+    else:
+        prefixes, query = split_prefixes_query(query)
+        q_algebra = _query_algebra(query, prefixes)
+
+    def remove_protected_vars(node):
+        """
+        Removes protected nodes _vars from the query tree. _vars store just the used variables within the
+        corresponding node and are found in every CompValue. E.g. _vars in BGP are variables encountered in triple
+        statements. Excluding them does not change the query semantics in any way as they are just additional
+        information.
+
+        :return:
+        """
+        if isinstance(node, set):
+            return set()
+
+    algebra.traverse(q_algebra.algebra, visitPost=remove_protected_vars)
+
+    """
+    #6.1
+    Aliases via BIND keyword just rename variables but the query result stays the same.
+    It must be distinguished whether bind is used to give existing variables an alias or
+    to do the same with more complex expressions. A normalization will only be carried out
+    in former case.
+    Measure: Aliases just for the purpose of giving simple variables another name will be removed.
+    """
+    aliases = {}
+
+    def remove_alias(node):
+        if isinstance(node, CompValue) and node.name == "Extend" and isinstance(node.expr, Variable):
+            if node.expr.n3().startswith('?__agg_'):
+                aliases[node.expr] = node.var
+            else:
+                aliases[node.var] = node.expr
+            return node.p
+
+    def overwrite_aliases_with_orig_var(node):
+        if isinstance(node, Variable):
+            if aliases.get(node):
+                return aliases.get(node)
+
+    algebra.traverse(q_algebra.algebra, visitPost=remove_alias)
+    algebra.traverse(q_algebra.algebra, visitPost=overwrite_aliases_with_orig_var)
+
+    """
+    #6.2
+    Aliases that are assigned in the select clause are just another means to #6.1 (using bind to
+    assign aliases). 
+    Measure: Same as 6.1
+    """
+    # Solved with 6.1 as "Extend" in the algebra tree can mean explicit binding using the BIND keyword
+    # or implicitly in the projection part (=select variables) of the select clause.
+
+    """
+    #8 
+    "filter not exists {triple}" expressions will be converted into the "filter + !bound" expression.
+    """
+
+    def replace_filter_not_exists(node):
+        if isinstance(node, CompValue) and node.name == 'Filter':
+            if node.expr.name == 'Builtin_NOTEXISTS' and node.p.name == 'BGP':
+                if len(node.expr.graph.p2.triples) == 1:
+                    return algebra.Filter(expr=Expr(name='UnaryNot', evalfn=UnaryNot,
+                                                    expr=Expr(name='Builtin_BOUND',
+                                                              evalfn=Builtin_BOUND,
+                                                              arg=node.expr.graph.p2.triples[0][2])),
+                                          p=algebra.LeftJoin(node.p,
+                                                             algebra.BGP(triples=node.expr.graph.p2.triples),
+                                                             expr=TrueFilter))
+                else:
+                    raise ExpressionNotCoveredException("FILTER NOT EXISTS clause has more than one "
+                                                        "triple statement. This case is seemingly rare and "
+                                                        "has not been covered yet. Therefore, FILTER NOT EXISTS "
+                                                        "will not be translated into the OPTIONAL + !BOUND pattern."
+                                                        "")
+
+    try:
+        algebra.traverse(q_algebra.algebra, replace_filter_not_exists)
+    except ExpressionNotCoveredException as e:
+        err = "Query will not be normalized because of following error: {0}".format(e)
+        raise ExpressionNotCoveredException(err)
+
+    """
+    #9
+    Inverting the order of the triple statement (object predicate subject instead of subject predicate object) 
+    using "^" yields the same result as if actually exchanging the subject and object within the triple statement.
+    """
+    pass
+    # Solved with _resolve_paths (see #10)
+
+    """
+    #10
+    Sequence paths can reduce the number of triples in the query statement and are commonly used. They can be
+    resolved to 'normal' triple statements.
+    """
+    try:
+        algebra.traverse(q_algebra.algebra, _resolve_paths_legacy)
+    except ExpressionNotCoveredException as e:
+        err = "Query will not be normalized because of following error: {0}".format(e)
+        raise ExpressionNotCoveredException(err)
+
+    """
+    #11
+    Prefixes can be interchanged in the prefix section before the query and subsequently 
+    in the query without changing the outcome
+    """
+    pass
+    # Solved by translating the query into the query algebra. Prefixes get resolved.
+
+    """
+    #1
+    A where clause will always be inserted.
+    """
+    pass
+    # Solved by translating the query into the query algebra.
+
+    """
+    #2
+    rdf:type" predicate can be replaced by "a".
+    """
+    pass
+    # Solved by translating the query into the query algebra.
+
+    """
+    #3
+    In case of an asterisk in the select-clause, all variables will be projected. However, this does not mean that 
+    a query with explicitly stated variables will be equivalent to a query that uses the asterisk as a shortcut 
+    to select all variables. This is due to the importance of the variables' order in the select clause.
+    """
+    pass
+    # Solved by translating the query into the query algebra.
+
+    """
+    #7
+    Variable names have no effect on the query semantic.
+    Measure: Variables in the query tree will be replaced by letters from the alphabet. Only up to 26 variables 
+    are supported. 
+    There is no need to sort the variables in the query tree as this is implicitly solved by the algebra. Variables
+    are sorted by their bindings where the ones with the most bindings come first.
+    """
+    q_vars_mapped = {}
+
+    def retrieve_pv_vars(node):
+        if isinstance(node, CompValue) and node.get('PV') and type(node.get('PV')) == list:
+            for idx, pv in enumerate(node.get('PV')):
+                if isinstance(pv, Variable):
+                    q_vars_mapped.setdefault(pv, chr(len(q_vars_mapped) + 97))
+                else:
+                    raise ExpressionNotCoveredException("There is a project variable that is actually not "
+                                                        "a variables but {0}. This case has not been covered yet."
+                                                        "It will not be considered for replacement with a "
+                                                        "letter from the alphabet.".format(type(pv)))
+
+    def retrieve_bgp_vars(node):
+        if isinstance(node, CompValue) and node.name == 'BGP':
+            for triple in node.triples:
+                if isinstance(triple[0], Variable):
+                    q_vars_mapped.setdefault(triple[0], chr(len(q_vars_mapped) + 97))
+                if isinstance(triple[1], Variable):
+                    q_vars_mapped.setdefault(triple[1], chr(len(q_vars_mapped) + 97))
+                if isinstance(triple[2], Variable):
+                    q_vars_mapped.setdefault(triple[2], chr(len(q_vars_mapped) + 97))
+
+    def retrieve_bind_vars(node):
+        if isinstance(node, CompValue) and node.name == 'Extend':
+            q_vars_mapped.setdefault(node.var, chr(len(q_vars_mapped) + 97))
+
+    def replace_variable_names_with_letters(node):
+        if isinstance(node, Variable) and not node.startswith("__agg_"):
+            try:
+                var = Variable(q_vars_mapped.get(node))
+                return var
+            except Exception:
+                raise ExpressionNotCoveredException("The variable {0} is not found in: BGP, Bind. and will "
+                                                    "not be replaced with a letter. Check whether something "
+                                                    "went wrong prior to this step or the variable is not part "
+                                                    "of any triple statement.".format(node))
+
+    algebra.traverse(q_algebra.algebra, retrieve_bind_vars)
+    algebra.traverse(q_algebra.algebra, retrieve_pv_vars)
+    algebra.traverse(q_algebra.algebra, retrieve_bgp_vars)
+
+    try:
+        algebra.traverse(q_algebra.algebra, visitPost=replace_variable_names_with_letters)
+    except ExpressionNotCoveredException as e:
+        err = "Query will not be normalized because of following error: {0}".format(e)
+        raise ExpressionNotCoveredException(err)
+
+    """
+    #5
+    Triple statements are first ordered by the number of their bindings. This is already done in the 
+    query-to-algebra translation step. 
+    Then, the query is ordered alphabetically by subject, predicate, object.
+    """
+
+    def reorder_triples(node):
+        if isinstance(node, CompValue) and node.name == 'BGP':
+            ordered_triples = {}
+            try:
+                for t in node.triples:
+                    norm_triple = ""
+
+                    if isinstance(t[0], Variable):
+                        try:
+                            s = Variable(q_vars_mapped.get(t[0]))
+                        except TypeError:
+                            s = "does_not_exist"
+                            logging.warning("Variable does not exist in q_vars_mapped.")
+                    else:
+                        s = t[0]
+
+                    if isinstance(t[1], Variable):
+                        p = Variable(q_vars_mapped.get(t[1]))
+                    elif isinstance(t[1], Path):
+                        logging.warning("A not resolved path was found: {0}. The whole triple statement will not "
+                                        "be considered for re-ordering the triple statements.".format(t[1]))
+                        continue
+                    else:
+                        p = t[1]
+
+                    if isinstance(t[2], Variable):
+                        o = Variable(q_vars_mapped.get(t[2]))
+                    else:
+                        o = t[2]
+                    norm_triple += s + "_" + p + "_" + o
+                    ordered_triples[(s, p, o)] = norm_triple
+                    ordered_triples = {k: var for k, var in sorted(ordered_triples.items(),
+                                                                   key=lambda item: item[1])}
+            except Exception:
+                raise ExpressionNotCoveredException("There might be uncovered expressions, "
+                                                    "identifiers or paths. Triple statements will not "
+                                                    "be re-ordered.")
+
+            node.triples.clear()
+            node.triples.extend(list(ordered_triples.keys()))
+        elif isinstance(node, CompValue) and node.name == 'TriplesBlock':
+            raise ExpressionNotCoveredException("TriplesBlock has not been covered yet. "
+                                                "Triples within a TripleBlock Node will not be ordered. ")
+
+    try:
+        algebra.traverse(q_algebra.algebra, reorder_triples)
+    except ExpressionNotCoveredException as e:
+        err = "Query will not be normalized because of following error: {0}".format(e)
+        raise ExpressionNotCoveredException(err)
+
+    return q_algebra
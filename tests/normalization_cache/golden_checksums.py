@@ -0,0 +1,61 @@
+"""
+Writes the checksums of the normal queries of the tests/normalization corpus together with the NORMALIZER_VERSION
+they were computed with to test_data/normalizer_checksums.csv. test_main.py fails if a checksum changes while
+NORMALIZER_VERSION stays the same. Run from this directory after NORMALIZER_VERSION was increased:
+
+    python golden_checksums.py
+"""
+
+from src.rdf_data_citation.persistent_id_utils import QueryUtils, NORMALIZER_VERSION
+import csv
+import glob
+import os
+import re
+import logging
+
+corpus_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../normalization/test_data")
+golden_checksums_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_data/normalizer_checksums.csv")
+_select_asterisk = re.compile(r"select\s+(distinct\s+|reduced\s+)?\*", re.IGNORECASE)
+
+
+def normalizer_checksums() -> dict:
+    """
+    Normalizes the queries of the tests/normalization corpus. Queries that cannot be normalized are not part of the
+    result. Neither are queries that select *, because the asterisk resolves to a permutation of the variables that
+    changes with Python's hash seed (see test_normalization__asterisk in tests/normalization).
+
+    :return: The checksum of the normal query per file name.
+    """
+
+    checksums = {}
+    for path in sorted(glob.glob(os.path.join(corpus_path, "*.txt"))):
+        query = open(path, "r").read()
+        if _select_asterisk.search(query):
+            continue
+        try:
+            checksums[os.path.basename(path)] = QueryUtils(query).checksum
+        except Exception as e:
+            logging.info("{0} cannot be normalized: {1}".format(path, e))
+    return checksums
+
+
+def read_golden_checksums() -> dict:
+    """
+    :return: The (normalizer version, checksum) pair per file name.
+    """
+
+    with open(golden_checksums_path, "r") as golden_checksums:
+        return {row['query']: (int(row['normalizer_version']), row['checksum'])
+                for row in csv.DictReader(golden_checksums, delimiter=';')}
+
+
+def write_golden_checksums():
+    with open(golden_checksums_path, "w", newline="") as golden_checksums:
+        writer = csv.writer(golden_checksums, delimiter=';')
+        writer.writerow(['query', 'normalizer_version', 'checksum'])
+        for query, checksum in normalizer_checksums().items():
+            writer.writerow([query, NORMALIZER_VERSION, checksum])
+
+
+if __name__ == "__main__":
+    write_golden_checksums()
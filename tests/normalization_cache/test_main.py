@@ -0,0 +1,226 @@
+from src.rdf_data_citation.persistent_id_utils import QueryUtils, NormalizationCache, normalization_cache, \
+    NORMALIZER_VERSION, _translate_algebra
+from src.rdf_data_citation.query_store import PersistentNormalizationCache
+from src.rdf_data_citation.prefixes import split_prefixes_query
+from tests.test_base import Test, TestExecution
+from tests.normalization_cache.golden_checksums import normalizer_checksums, read_golden_checksums
+from rdflib.term import Variable
+from datetime import datetime, timedelta, timezone
+import glob
+import os
+import tempfile
+import logging
+
+
+class TestNormalizationCache(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.execution_timestamp = datetime(2021, 4, 30, 12, 11, 21, 941000, timezone(timedelta(hours=2)))
+        self.queries = []
+        self.db_path = os.path.join(tempfile.mkdtemp(), "normalization_cache.db")
+
+    def before_all_tests(self):
+        """
+        Reads the distinct queries of the query_handler corpus. Queries that cannot be normalized are not part
+        of the corpus.
+
+        :return:
+        """
+
+        print("Executing before_tests ...")
+        for path in sorted(glob.glob("../query_handler/test_data/*.txt")):
+            query = open(path, "r").read()
+            try:
+                QueryUtils(query, self.execution_timestamp).checksum
+                if query not in self.queries:
+                    self.queries.append(query)
+            except Exception as e:
+                logging.info("{0} is not part of the normalization cache corpus: {1}".format(path, e))
+
+    def before_single_test(self, test_name: str):
+        print("Executing before_single_tests ...")
+        normalization_cache.cache_clear()
+
+    def test_normalization_cache__hits_and_misses(self):
+        for query in self.queries:
+            QueryUtils(query, self.execution_timestamp).checksum
+        for query in self.queries:
+            QueryUtils(query, self.execution_timestamp).checksum
+        cache_info = normalization_cache.cache_info()
+
+        test = Test(test_number=1,
+                    tc_desc='Test if normalizing each query of the corpus twice yields one miss and one hit per '
+                            'query.',
+                    expected_result="hits: {0}, misses: {0}".format(len(self.queries)),
+                    actual_result="hits: {0}, misses: {1}".format(cache_info.hits, cache_info.misses))
+
+        return test
+
+    def test_normalization_cache__same_results(self):
+        mismatches = []
+        for query in self.queries:
+            query_utils_miss = QueryUtils(query, self.execution_timestamp)
+            query_utils_hit = QueryUtils(query, self.execution_timestamp)
+            if (query_utils_miss.normal_query, query_utils_miss.checksum, query_utils_miss.order_by_variables,
+                query_utils_miss.timestamped_query, query_utils_miss.pid) != \
+                    (query_utils_hit.normal_query, query_utils_hit.checksum, query_utils_hit.order_by_variables,
+                     query_utils_hit.timestamped_query, query_utils_hit.pid) \
+                    or _translate_algebra(query_utils_miss.normal_query_algebra) \
+                    != _translate_algebra(query_utils_hit.normal_query_algebra):
+                mismatches.append(query)
+
+        test = Test(test_number=2,
+                    tc_desc='Test if a QueryUtils object whose normalization is taken from the cache has the '
+                            'same normal query, checksum, order by variables, timestamped query and PID as the one '
+                            'that was normalized.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(mismatches))
+
+        return test
+
+    def test_normalization_cache__entries_immutable(self):
+        query = self.queries[0]
+        query_utils = QueryUtils(query, self.execution_timestamp)
+        normal_query = _translate_algebra(query_utils.normal_query_algebra)
+        query_utils.normal_query_algebra.algebra.p.p = None
+        query_utils.order_by_variables[0].append(Variable("corrupted"))
+        query_utils.order_by_variables[1] = []
+
+        query_utils_hit = QueryUtils(query, self.execution_timestamp)
+        test = Test(test_number=3,
+                    tc_desc='Test if altering the normalized query algebra and the order by variables of a '
+                            'QueryUtils object does not alter the cached entry.',
+                    expected_result="{0} {1}".format(normal_query, {0: query_utils.order_by_variables[0][:-1]}),
+                    actual_result="{0} {1}".format(_translate_algebra(query_utils_hit.normal_query_algebra),
+                                                   query_utils_hit.order_by_variables))
+
+        return test
+
+    def test_normalization_cache__lru_eviction(self):
+        cache = NormalizationCache(maxsize=2)
+        query_utils = [QueryUtils(query, self.execution_timestamp) for query in self.queries[:3]]
+        for q in query_utils:
+            q.checksum
+            cache.put(q.sparql_prefixes, q.query, normalization_cache.get(q.sparql_prefixes, q.query))
+            cache.get(query_utils[0].sparql_prefixes, query_utils[0].query)
+        cached = [cache.get(q.sparql_prefixes, q.query) is not None for q in query_utils]
+
+        test = Test(test_number=4,
+                    tc_desc='Test if the least recently used query is evicted if the cache is full.',
+                    expected_result="cached: [True, False, True], size: 2",
+                    actual_result="cached: {0}, size: {1}".format(cached, cache.cache_info().currsize))
+
+        return test
+
+    def test_normalization_cache__invalidation(self):
+        query = self.queries[0]
+        QueryUtils(query, self.execution_timestamp).checksum
+        sparql_prefixes, select_statement = split_prefixes_query(query)
+        yn_invalidated = normalization_cache.invalidate(sparql_prefixes, select_statement)
+        QueryUtils(query, self.execution_timestamp).checksum
+        cache_info = normalization_cache.cache_info()
+
+        test = Test(test_number=5,
+                    tc_desc='Test if an invalidated query is normalized again.',
+                    expected_result="invalidated: True, hits: 0, misses: 2",
+                    actual_result="invalidated: {0}, hits: {1}, misses: {2}".format(yn_invalidated,
+                                                                                   cache_info.hits,
+                                                                                   cache_info.misses))
+
+        return test
+
+    def test_normalization_cache__disabled(self):
+        normalization_cache.resize(0)
+        try:
+            for query in self.queries[:2]:
+                QueryUtils(query, self.execution_timestamp).checksum
+                QueryUtils(query, self.execution_timestamp).checksum
+            cache_info = normalization_cache.cache_info()
+        finally:
+            normalization_cache.resize(512)
+
+        test = Test(test_number=6,
+                    tc_desc='Test if no query is cached if the cache size is set to 0.',
+                    expected_result="hits: 0, size: 0",
+                    actual_result="hits: {0}, size: {1}".format(cache_info.hits, cache_info.currsize))
+
+        return test
+
+    def test_normalization_cache__persistent_cache(self):
+        normalization_cache.persistent_cache = PersistentNormalizationCache(self.db_path)
+        try:
+            query_utils = [QueryUtils(query, self.execution_timestamp) for query in self.queries]
+            for q in query_utils:
+                q.checksum
+            # Simulates another process or a restart, both of which start with an empty in-process cache.
+            normalization_cache.cache_clear()
+            normalization_cache.persistent_cache = PersistentNormalizationCache(self.db_path)
+            query_utils_hit = [QueryUtils(query, self.execution_timestamp) for query in self.queries]
+            for q in query_utils_hit:
+                q.checksum
+            cache_info = normalization_cache.cache_info()
+        finally:
+            normalization_cache.persistent_cache = None
+
+        mismatches = [q.query for q, q_hit in zip(query_utils, query_utils_hit)
+                      if (q.normal_query, q.checksum, q.order_by_variables, q.timestamped_query,
+                          str(q.normal_query_algebra.algebra))
+                      != (q_hit.normal_query, q_hit.checksum, q_hit.order_by_variables, q_hit.timestamped_query,
+                          str(q_hit.normal_query_algebra.algebra))]
+
+        test = Test(test_number=7,
+                    tc_desc='Test if the normalizations are taken from the persistent cache after the in-process '
+                            'cache was emptied and if they equal the normalizations that were stored.',
+                    expected_result="persistent hits: {0}, misses: 0, mismatches: []".format(len(self.queries)),
+                    actual_result="persistent hits: {0}, misses: {1}, mismatches: {2}".format(
+                        cache_info.persistent_hits, cache_info.misses, mismatches))
+
+        return test
+
+    def test_normalization_cache__persistent_cache_normalizer_version(self):
+        persistent_cache = PersistentNormalizationCache(self.db_path)
+        query_utils = QueryUtils(self.queries[0], self.execution_timestamp)
+        query_utils.checksum
+        persistent_cache.put(query_utils.sparql_prefixes, query_utils.query,
+                             normalization_cache.get(query_utils.sparql_prefixes, query_utils.query))
+
+        persistent_cache.normalizer_version = "outdated"
+        yn_outdated_hit = persistent_cache.get(query_utils.sparql_prefixes, query_utils.query) is not None
+        persistent_cache.normalizer_version = PersistentNormalizationCache(self.db_path).normalizer_version
+        cnt_removed = persistent_cache.remove_outdated()
+        yn_current_hit = persistent_cache.get(query_utils.sparql_prefixes, query_utils.query) is not None
+
+        test = Test(test_number=8,
+                    tc_desc='Test if an entry of another normalizer version is not returned from the persistent '
+                            'cache and if entries of the current version are not removed as outdated.',
+                    expected_result="outdated hit: False, removed: 0, current hit: True",
+                    actual_result="outdated hit: {0}, removed: {1}, current hit: {2}".format(
+                        yn_outdated_hit, cnt_removed, yn_current_hit))
+
+        return test
+
+    def test_normalization_cache__normalizer_version_bumped(self):
+        # If this test fails after a change of the normalization, increase NORMALIZER_VERSION and run
+        # golden_checksums.py to record the checksums of the new version.
+        golden_checksums = read_golden_checksums()
+        checksums = normalizer_checksums()
+        changed = [query for query, (normalizer_version, checksum) in golden_checksums.items()
+                   if normalizer_version == NORMALIZER_VERSION and checksums.get(query) != checksum]
+        cnt_other_versions = len([query for query, (normalizer_version, checksum) in golden_checksums.items()
+                                  if normalizer_version != NORMALIZER_VERSION])
+
+        test = Test(test_number=9,
+                    tc_desc='Test if the checksums of the normal queries of the normalization corpus equal the '
+                            'recorded ones as long as NORMALIZER_VERSION is the same, and if the recorded checksums '
+                            'are the ones of the current NORMALIZER_VERSION.',
+                    expected_result="changed checksums: [], checksums of other versions: 0",
+                    actual_result="changed checksums: {0}, checksums of other versions: {1}".format(
+                        changed, cnt_other_versions))
+
+        return test
+
+
+t = TestNormalizationCache(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
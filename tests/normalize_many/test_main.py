@@ -0,0 +1,124 @@
+from src.rdf_data_citation.persistent_id_utils import QueryUtils, RDFDataSetUtils, MetaData, normalize_many
+from src.rdf_data_citation.query_log import read_query_log, group_by_checksum, main, _query_hub_record
+from src.rdf_data_citation.query_store import QueryStore
+from tests.test_base import Test, TestExecution
+import glob
+import json
+import os
+import tempfile
+
+
+class TestNormalizeMany(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.queries = []
+        self.query_log_path = os.path.join(tempfile.mkdtemp(), "query_log.txt")
+
+    def before_all_tests(self):
+        """
+        Reads the query_handler corpus including the queries that cannot be normalized and writes it twice into a
+        query log whose queries are separated by "###".
+
+        :return:
+        """
+
+        print("Executing before_tests ...")
+        for path in sorted(glob.glob("../query_handler/test_data/*.txt")):
+            self.queries.append(open(path, "r").read())
+        with open(self.query_log_path, "w") as query_log:
+            query_log.write("\n###\n".join(self.queries + self.queries))
+
+    def expected_results(self, queries: list) -> list:
+        results = []
+        for index, query in enumerate(queries):
+            try:
+                query_utils = QueryUtils(query)
+                results.append((index, query_utils.checksum, query_utils.normal_query, None))
+            except Exception as e:
+                results.append((index, None, None, type(e).__name__))
+        return results
+
+    def test_normalize_many__same_results_as_query_utils(self):
+        results = sorted((index, checksum, normal_query, type(error).__name__ if error else None)
+                         for index, checksum, normal_query, error in normalize_many(self.queries, workers=2,
+                                                                                    chunksize=3))
+        expected_results = self.expected_results(self.queries)
+        mismatches = [r[0] for r, e in zip(results, expected_results) if r != e]
+
+        test = Test(test_number=1,
+                    tc_desc='Test if normalizing the queries in parallel processes yields one result per query with '
+                            'the same checksum, normal query and error as QueryUtils.',
+                    expected_result="results: {0}, mismatches: []".format(len(self.queries)),
+                    actual_result="results: {0}, mismatches: {1}".format(len(results), mismatches))
+
+        return test
+
+    def test_normalize_many__duplicate_queries(self):
+        queries = self.queries[:3] * 3
+        results = sorted((index, checksum, normal_query, type(error).__name__ if error else None)
+                         for index, checksum, normal_query, error in normalize_many(queries, workers=2, chunksize=1))
+
+        test = Test(test_number=2,
+                    tc_desc='Test if the results of queries that occur multiple times are yielded for each of '
+                            'their indexes.',
+                    expected_result=str(self.expected_results(queries)),
+                    actual_result=str(results))
+
+        return test
+
+    def test_query_log__read_query_log(self):
+        test = Test(test_number=3,
+                    tc_desc='Test if the queries of a query log that are separated by a delimiter line are read '
+                            'in the order of the query log.',
+                    expected_result=str([q.strip() for q in self.queries + self.queries]),
+                    actual_result=str([q.strip() for q in read_query_log(self.query_log_path, "###")]))
+
+        return test
+
+    def test_query_log__checksum_groups(self):
+        output_path = os.path.join(os.path.dirname(self.query_log_path), "checksum_groups.jsonl")
+        main([self.query_log_path, "--delimiter", "###", "--output", output_path, "--workers", "2"])
+        checksum_groups = [json.loads(line) for line in open(output_path, "r")]
+
+        expected_groups = {}
+        for index, checksum, normal_query, error in self.expected_results(self.queries + self.queries):
+            if error is None:
+                expected_groups.setdefault(checksum, []).append(index)
+        test = Test(test_number=4,
+                    tc_desc='Test if the checksum groups that are written for a query log contain the indexes of '
+                            'all queries with the same checksum.',
+                    expected_result=str(sorted(expected_groups.values())),
+                    actual_result=str(sorted(g['query_indexes'] for g in checksum_groups)))
+
+        return test
+
+    def test_query_log__seed_query_hub(self):
+        query_store = QueryStore()
+        query_utils = QueryUtils(self.queries[0])
+        query_store._remove(query_utils.checksum)
+        try:
+            _, _, query_hub_records = group_by_checksum(self.queries[:1] * 2, workers=1, yn_query_hub_records=True)
+            cnt_seeded = query_store.seed_query_hub(list(query_hub_records.values()))
+            cnt_seeded_again = query_store.seed_query_hub([_query_hub_record(self.queries[0])[2]])
+            # The seeded query is cited like a new query on its first execution.
+            query_store.store(query_utils, RDFDataSetUtils(description="Seeded query test", unique_sort_index=()),
+                              MetaData(), yn_new_query=True)
+            query_data, _, _ = query_store.get_last_execution(query_utils.checksum)
+            pid = query_data.pid
+        finally:
+            query_store._remove(query_utils.checksum)
+
+        test = Test(test_number=5,
+                    tc_desc='Test if a query is seeded into the query_hub table once and if it can be cited '
+                            'afterwards.',
+                    expected_result="seeded: 1, seeded again: 0, pid: {0}".format(query_utils.pid),
+                    actual_result="seeded: {0}, seeded again: {1}, pid: {2}".format(cnt_seeded, cnt_seeded_again,
+                                                                                   pid))
+
+        return test
+
+
+t = TestNormalizeMany(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
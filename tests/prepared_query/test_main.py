@@ -0,0 +1,114 @@
+from src.rdf_data_citation.persistent_id_utils import QueryUtils, PreparedQuery, _translate_algebra, _query_algebra
+from tests.test_base import Test, TestExecution
+import rdflib.plugins.sparql.parser as parser
+from datetime import datetime, timedelta, timezone
+import glob
+import logging
+
+
+class TestPreparedQuery(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.execution_timestamp = datetime(2021, 4, 30, 12, 11, 21, 941000, timezone(timedelta(hours=2)))
+        self.queries = {}
+
+    def before_all_tests(self):
+        """
+        Reads the query_handler corpus. Queries that cannot be normalized are not part of the corpus.
+
+        :return:
+        """
+
+        print("Executing before_tests ...")
+        for path in sorted(glob.glob("../query_handler/test_data/*.txt")):
+            query = open(path, "r").read()
+            try:
+                query_utils = QueryUtils(query, self.execution_timestamp)
+                query_utils.pid, query_utils.timestamped_query
+                self.queries[path] = query
+            except Exception as e:
+                logging.info("{0} is not part of the prepared query corpus: {1}".format(path, e))
+
+    def test_prepared_query__same_results_as_separate_parses(self):
+        mismatches = []
+        for path, query in self.queries.items():
+            query_utils = QueryUtils(query, self.execution_timestamp)
+            query_utils_parsed = QueryUtils()
+            query_utils_parsed.execution_timestamp = query_utils.execution_timestamp
+            normal_query = _translate_algebra(query_utils_parsed.normalize_query_tree(query))
+            timestamped_query = query_utils_parsed.timestamp_query(query)
+            if (query_utils.normal_query, query_utils.timestamped_query) != (normal_query, timestamped_query):
+                mismatches.append(path)
+
+        test = Test(test_number=1,
+                    tc_desc='Test if the normal query and the timestamped query derived from one prepared query '
+                            'are the same as if the query is parsed separately for each of them.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(mismatches))
+
+        return test
+
+    def test_prepared_query__prepared_tree_unchanged(self):
+        mismatches = []
+        for path, query in self.queries.items():
+            prepared_query = PreparedQuery(query)
+            query_utils = QueryUtils(prepared_query, self.execution_timestamp)
+            query_utils.pid, query_utils.timestamped_query, query_utils.order_by_variables
+            parsed_query = _query_algebra(prepared_query.query, prepared_query.sparql_prefixes)
+            if _translate_algebra(prepared_query.query_algebra) != _translate_algebra(parsed_query):
+                mismatches.append(path)
+
+        test = Test(test_number=2,
+                    tc_desc='Test if normalizing, timestamping and retrieving the order by variables does not alter '
+                            'the query tree of the prepared query.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(mismatches))
+
+        return test
+
+    def test_prepared_query__parse_once(self):
+        parse_query = parser.parseQuery
+        parse_calls = []
+
+        def count_parse_calls(query):
+            parse_calls.append(query)
+            return parse_query(query)
+
+        parser.parseQuery = count_parse_calls
+        try:
+            query_utils = QueryUtils(next(iter(self.queries.values())), self.execution_timestamp)
+            query_utils.pid, query_utils.timestamped_query, query_utils.order_by_variables
+        finally:
+            parser.parseQuery = parse_query
+
+        test = Test(test_number=3,
+                    tc_desc='Test if the query is parsed only once when a QueryUtils object is created.',
+                    expected_result="parse calls: 1",
+                    actual_result="parse calls: {0}".format(len(parse_calls)))
+
+        return test
+
+    def test_prepared_query__lazy_attributes(self):
+        mismatches = []
+        for path, query in self.queries.items():
+            query_utils = QueryUtils(query, self.execution_timestamp)
+            timestamped_query = query_utils.timestamped_query
+            expected_timestamped_query = QueryUtils(query, self.execution_timestamp).timestamp_query()
+            computed_attributes = [a for a in ('_normalized_query', 'normal_query_algebra', 'normal_query',
+                                               'order_by_variables', 'checksum', 'pid') if a in vars(query_utils)]
+            if computed_attributes or timestamped_query != expected_timestamped_query:
+                mismatches.append((path, computed_attributes))
+
+        test = Test(test_number=4,
+                    tc_desc='Test if retrieving the timestamped query of a QueryUtils object neither normalizes '
+                            'the query nor computes its checksum and PID.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(mismatches))
+
+        return test
+
+
+t = TestPreparedQuery(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
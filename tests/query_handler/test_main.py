@@ -2,8 +2,10 @@ from src.rdf_data_citation._exceptions import NoUniqueSortIndexError, SortVariab
 from src.rdf_data_citation.rdf_star import TripleStoreEngine
 import src.rdf_data_citation.query_handler as qh
 from src.rdf_data_citation.persistent_id_utils import QueryUtils, RDFDataSetUtils, generate_citation_snippet, MetaData
+from src.rdf_data_citation.persistent_id_utils import CHECKSUM_CANONICAL_V1
 from src.rdf_data_citation.query_store import QueryStore
 from tests.test_base import Test, TestExecution, format_text
+from tests.sparql_endpoint import SPARQLEndpointServer
 from datetime import datetime, timezone, timedelta
 import logging
 
@@ -435,6 +437,57 @@ class TestQueryHandler(TestExecution):
 
     # TODO: Tests for retrieving minted datasets
 
+    def test_qh__verify(self):
+        handler = self.q_handler
+        self.citation_metadata.title = "Obama occurrences"
+
+        # Actual results
+        handler.mint_query_pid(select_statement=self.select_statement,
+                               citation_metadata=self.citation_metadata,
+                               timestamp=self.execution_timestamp)
+        self.q_handler = handler
+
+        # Test object
+        test = Test(test_number=10,
+                    tc_desc='Test if the result set of a minted PID is verified, also if the checksum is computed '
+                            'chunk by chunk while the result set is downloaded.',
+                    expected_result=str([True, True]),
+                    actual_result=str([handler.verify(handler.query_utils.pid),
+                                       handler.verify(handler.query_utils.pid, chunksize=2)]))
+
+        return test
+
+    def test_qh__verify_chunk_order(self):
+        server = SPARQLEndpointServer().start()
+        try:
+            engine = TripleStoreEngine(server.query_endpoint, server.update_endpoint, skip_connection_test=True)
+            query_handler = qh.QueryHandler(server.query_endpoint, server.update_endpoint)
+            verified = []
+            for select_statement, sort_order in [
+                    (self.select_statement, ["n"]),
+                    ("select ?s ?label where { ?s <http://ex.org/label> ?label . } order by ?s", ["s"])]:
+                query_data = QueryUtils()
+                query_data.timestamped_query = select_statement
+                result_set_data = RDFDataSetUtils()
+                dataset = result_set_data.sort(tuple(sort_order), engine.get_data(select_statement,
+                                                                                  yn_timestamp_query=False))
+                result_set_data.checksum_algorithm = CHECKSUM_CANONICAL_V1
+                result_set_data.checksum = result_set_data.compute_checksum(dataset, algorithm=CHECKSUM_CANONICAL_V1)
+                verified += [query_handler._verify_chunks(query_data, result_set_data, sort_order, chunksize)
+                             for chunksize in [3, 2]]
+        finally:
+            server.stop()
+
+        test = Test(test_number=11,
+                    tc_desc='Test if chunked verification gives up if the RDF store orders typed literals by value '
+                            'and not like RDFDataSetUtils.sort, within a chunk and across chunk boundaries, and if it '
+                            'verifies result sets in the order of RDFDataSetUtils.sort. The result sets come from a '
+                            'mock SPARQL endpoint.',
+                    expected_result=str([None, None, True, True]),
+                    actual_result=str(verified))
+
+        return test
+
 
 t = TestQueryHandler(annotated_tests=False)
 t.run_tests()
@@ -0,0 +1,88 @@
+from src.rdf_data_citation.rdf_files import read_turtle_statements, has_blank_node
+from src.rdf_data_citation.rdf_star import _read_chunks
+from tests.test_base import Test, TestExecution
+import rdflib
+
+
+class TestRDFFiles(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.turtle_path = "test_data/statements.ttl"
+
+    def test_read_turtle_statements__split(self):
+        statements = list(read_turtle_statements(self.turtle_path))
+        expected_statements = [(True, '@prefix ex: <http://ex.org/> .'),
+                               (True, 'PREFIX foaf: <http://xmlns.com/foaf/0.1/>'),
+                               (False, 'ex:a foaf:name "Alice. Really." ; foaf:knows ex:b, [ foaf:name "anon" ] .'),
+                               (False, 'ex:b foaf:name """multi\nline . # not a comment""" .'),
+                               (False, 'ex:c ex:list ( 1 2.5 ex:d ) .'),
+                               (True, '@prefix ex: <http://other.org/> .'),
+                               (False, 'ex:a ex:p \'single "q"\'@en .')]
+
+        test = Test(test_number=1,
+                    tc_desc='Test if a Turtle file is split into its directives and statements. Dots within strings, '
+                            'comments, decimals, blank node property lists and collections do not end a statement.',
+                    expected_result=str(expected_statements),
+                    actual_result=str(statements))
+
+        return test
+
+    def test_read_chunks__same_triples_as_rdflib(self):
+        chunks = list(_read_chunks(self.turtle_path, "turtle", 2))
+        graph = rdflib.Graph()
+        for triples in chunks:
+            graph.parse(data="".join("{0} {1} {2} .\n".format(*triple) for triple in triples), format="nt")
+        expected_graph = rdflib.Graph()
+        # The prefix ex: is redefined within the file, which rdflib cannot parse in one go.
+        turtle = open(self.turtle_path, "r").read().split("@prefix ex: <http://other.org/> .")
+        expected_graph.parse(data=turtle[0], format="turtle")
+        expected_graph.parse(data="@prefix ex: <http://other.org/> .\n" + turtle[1], format="turtle")
+
+        test = Test(test_number=2,
+                    tc_desc='Test if the triples of the Turtle chunks are isomorphic to the triples that rdflib '
+                            'parses from the whole file and if the triples of a statement stay within one chunk.',
+                    expected_result="chunks: 3, isomorphic: True",
+                    actual_result="chunks: {0}, isomorphic: {1}".format(len(chunks),
+                                                                        graph.isomorphic(expected_graph)))
+
+        return test
+
+    def test_read_chunks__ntriples(self):
+        chunks = list(_read_chunks("../changeset/test_data/snapshot_old.nt", "nt", 3))
+
+        test = Test(test_number=3,
+                    tc_desc='Test if an N-Triples file is read in chunks of the given number of triples.',
+                    expected_result=str([3, 3, 1]),
+                    actual_result=str([len(triples) for triples in chunks]))
+
+        return test
+
+    def test_read_chunks__skolemized_blank_nodes(self):
+        skolem_base = "http://ex.org/genid/"
+        ntriples_chunks = list(_read_chunks("test_data/blank_nodes.nt", "nt", 1, skolem_base))
+        turtle_chunks = list(_read_chunks("test_data/blank_nodes.ttl", "turtle", 1, skolem_base))
+        turtle_objects = sorted(triple[2] for triples in turtle_chunks for triple in triples
+                                if triple[1] != "<http://ex.org/name>")
+
+        test = Test(test_number=4,
+                    tc_desc='Test if labelled blank nodes are replaced with the same IRI in all chunks, also within '
+                            'quoted triples, while strings, IRIs, comments and anonymous blank nodes are kept.',
+                    expected_result=str([[[('<http://ex.org/genid/b1>', '<http://ex.org/name>', '"Alice _:b1"')],
+                                          [('<http://ex.org/a>', '<http://ex.org/knows>', '<http://ex.org/genid/b1>')],
+                                          [('<< <http://ex.org/genid/b1> <http://ex.org/name> "Alice _:b1" >>',
+                                            '<http://ex.org/source>', '<http://ex.org/genid/b2>')]],
+                                         ['<http://ex.org/_:b1>', '<http://ex.org/genid/b1.x>',
+                                          '<http://ex.org/genid/b1>', True],
+                                         ['"Alice _:b1"', '"anon"']]),
+                    actual_result=str([ntriples_chunks,
+                                       turtle_objects[:3] + [has_blank_node(turtle_objects[3])],
+                                       sorted(triple[2] for triples in turtle_chunks for triple in triples
+                                              if triple[1] == "<http://ex.org/name>")]))
+
+        return test
+
+
+t = TestRDFFiles(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
@@ -0,0 +1,49 @@
+"""
+Benchmarks the translation from the query algebra to the query text against the size of the query.
+The synthetic queries grow in the number of triple patterns, OPTIONAL blocks and VALUES rows. For every size
+the single-pass serializer and the legacy translation are timed on the same parsed algebra, so the parsing time
+is not part of the measurement. Run from this directory:
+
+    python benchmark_translation.py
+"""
+
+from src.rdf_data_citation.persistent_id_utils import _translate_algebra
+from tests.serialization.legacy_translation import translate_algebra_legacy
+import rdflib.plugins.sparql.parser as parser
+import rdflib.plugins.sparql.algebra as algebra
+import sys
+import timeit
+
+
+def synthetic_query(size: int) -> str:
+    """
+    Creates a select statement with :size triple patterns, :size // 4 OPTIONAL blocks and a VALUES block
+    with :size rows.
+
+    :param size: Number of triple patterns.
+    :return:
+    """
+
+    triples = " ".join("?s <http://example.org/p{0}> ?o{0} .".format(i) for i in range(size))
+    optionals = " ".join("OPTIONAL {{ ?o{0} <http://example.org/q{0}> ?x{0} . }}".format(i)
+                         for i in range(size // 4))
+    values = " ".join("(<http://example.org/s{0}>)".format(i) for i in range(size))
+    return "select ?s ?o0 where {{ {0} {1} VALUES (?s) {{ {2} }} }}".format(triples, optionals, values)
+
+
+def time_translation(translate, query_algebra, repeat: int = 3) -> float:
+    return min(timeit.repeat(lambda: translate(query_algebra), number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    # rdflib's parser and algebra recurse per nested OPTIONAL block
+    sys.setrecursionlimit(100000)
+    print("{0:>6} {1:>10} {2:>12} {3:>12} {4:>8}".format("size", "chars", "legacy [s]", "serial [s]", "speedup"))
+    for size in [25, 50, 100, 200, 400, 800, 1600]:
+        query_algebra = algebra.translateQuery(parser.parseQuery(synthetic_query(size)))
+        query_text = _translate_algebra(query_algebra)
+        assert query_text == translate_algebra_legacy(query_algebra)
+        legacy = time_translation(translate_algebra_legacy, query_algebra)
+        serial = time_translation(_translate_algebra, query_algebra)
+        print("{0:>6} {1:>10} {2:>12.4f} {3:>12.4f} {4:>8.1f}".format(size, len(query_text), legacy, serial,
+                                                                     legacy / serial))
@@ -0,0 +1,103 @@
+from src.rdf_data_citation.persistent_id_utils import _translate_algebra, QueryUtils
+from tests.serialization.legacy_translation import translate_algebra_legacy
+from tests.test_base import Test, TestExecution
+import rdflib.plugins.sparql.parser as parser
+import rdflib.plugins.sparql.algebra as algebra
+import glob
+import logging
+
+
+class TestSerialization(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.corpus = None
+
+    def before_single_test(self, test_name: str):
+        """
+        Reads the queries of the test corpus whose directory is given by the test name.
+
+        :return:
+        """
+
+        print("Executing before_single_tests ...")
+
+        if self.annotated_tests:
+            test_name = test_name[2:]
+
+        corpus_dir = test_name.split("__")[1]
+        self.corpus = {}
+        for path in sorted(glob.glob("../{0}/test_data/*.txt".format(corpus_dir))):
+            self.corpus[path] = open(path, "r").read()
+
+    def compare_translations(self) -> list:
+        """
+        Translates the query algebra and the normalized query algebra of every query in the corpus with both
+        the single-pass serializer and the legacy translation.
+
+        :return: A list of queries for which the two translations are not byte-identical.
+        """
+
+        mismatches = []
+        for path, query in self.corpus.items():
+            try:
+                legacy = translate_algebra_legacy(algebra.translateQuery(parser.parseQuery(query)))
+            except Exception as e:
+                logging.info("{0} cannot be translated: {1}".format(path, e))
+                continue
+            serialized = _translate_algebra(algebra.translateQuery(parser.parseQuery(query)))
+            if serialized != legacy:
+                mismatches.append(path)
+
+            try:
+                legacy = translate_algebra_legacy(QueryUtils().normalize_query_tree(query))
+            except Exception as e:
+                logging.info("{0} cannot be normalized: {1}".format(path, e))
+                continue
+            serialized = _translate_algebra(QueryUtils().normalize_query_tree(query))
+            if serialized != legacy:
+                mismatches.append(path + " (normalized)")
+
+        return mismatches
+
+    def test_serialization__algebra_to_text(self):
+        test = Test(test_number=1,
+                    tc_desc='Test if the single-pass serializer yields byte-identical query texts to the legacy '
+                            'translation for all queries of the algebra_to_text test corpus.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(self.compare_translations()))
+
+        return test
+
+    def test_serialization__normalization(self):
+        test = Test(test_number=2,
+                    tc_desc='Test if the single-pass serializer yields byte-identical query texts and thus, '
+                            'identical checksums to the legacy translation for all queries of the normalization '
+                            'test corpus.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(self.compare_translations()))
+
+        return test
+
+    def test_serialization__query_handler(self):
+        test = Test(test_number=3,
+                    tc_desc='Test if the single-pass serializer yields byte-identical query texts to the legacy '
+                            'translation for all queries of the query_handler test corpus.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(self.compare_translations()))
+
+        return test
+
+    def test_serialization__versioning(self):
+        test = Test(test_number=4,
+                    tc_desc='Test if the single-pass serializer yields byte-identical query texts to the legacy '
+                            'translation for all queries of the versioning test corpus.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(self.compare_translations()))
+
+        return test
+
+
+t = TestSerialization(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
@@ -0,0 +1,62 @@
+"""
+Benchmarks the primary key discovery of RDFDataSetUtils.create_sort_index against the legacy discovery (see
+legacy_sort_index). Both suggest keys for the datasets in Playground/test_primary_key_suggestor_ds*.csv and for
+synthetic datasets of IRIs whose only key is a combination of :cnt_key_columns columns; the other columns have few
+distinct values and no key among them. The new discovery is measured with and without checking the column
+combinations on a sample of 10000 rows first. All of them must suggest the same keys. Run from this directory:
+
+    python benchmark_sort_index.py
+"""
+
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils
+from tests.sort_index.legacy_sort_index import create_sort_index_legacy
+import pandas as pd
+import numpy as np
+import glob
+import timeit
+
+
+def synthetic_dataset(cnt_rows: int, cnt_columns: int = 8, cnt_key_columns: int = 3) -> pd.DataFrame:
+    """
+    :param cnt_rows: Number of rows.
+    :param cnt_columns: Number of columns.
+    :param cnt_key_columns: Number of columns of the key.
+    :return: A data frame with :cnt_rows rows and :cnt_columns columns of IRIs.
+    """
+
+    rng = np.random.default_rng(0)
+    # The key columns are the digits of the row number with base :radix.
+    radix = int(np.ceil(cnt_rows ** (1 / cnt_key_columns)))
+    row_numbers = rng.permutation(cnt_rows)
+    columns = {}
+    for i in range(cnt_columns):
+        if i < cnt_key_columns:
+            values = row_numbers // radix ** i % radix
+        else:
+            values = rng.integers(0, 4, cnt_rows)
+        columns["c{0}".format(i)] = pd.Series(values).map("http://example.org/c{0}/{{0}}".format(i).format)
+    return pd.DataFrame(columns)
+
+
+def time_create_sort_index(create_sort_index, repeat: int = 3) -> tuple:
+    timings = timeit.repeat(create_sort_index, number=1, repeat=repeat)
+    return min(timings), create_sort_index()
+
+
+if __name__ == "__main__":
+    rdf_ds = RDFDataSetUtils()
+    print("{0:>42} {1:>11} {2:>8} {3:>12} {4:>8} {5:>8}".format(
+        "dataset", "legacy [s]", "new [s]", "sampled [s]", "speedup", "keys"))
+    datasets = [(path.split("/")[-1], pd.read_csv(path))
+                for path in sorted(glob.glob("../../Playground/test_primary_key_suggestor_ds*.csv"))]
+    datasets += [("{0} rows x {1} columns, {2}-column key".format(cnt_rows, cnt_columns, cnt_key_columns),
+                  synthetic_dataset(cnt_rows, cnt_columns, cnt_key_columns))
+                 for cnt_rows, cnt_columns, cnt_key_columns in [(10000, 8, 2), (100000, 8, 2), (100000, 8, 3),
+                                                                (1000000, 8, 3), (100000, 16, 3)]]
+    for name, dataset in datasets:
+        legacy, legacy_keys = time_create_sort_index(lambda: create_sort_index_legacy(dataset), repeat=1)
+        new, keys = time_create_sort_index(lambda: rdf_ds.create_sort_index(dataset))
+        sampled, sampled_keys = time_create_sort_index(lambda: rdf_ds.create_sort_index(dataset, sample_size=10000))
+        assert keys == legacy_keys == sampled_keys
+        print("{0:>42} {1:>11.3f} {2:>8.3f} {3:>12.3f} {4:>8.1f} {5:>8}".format(
+            name, legacy, new, sampled, legacy / min(new, sampled), len(keys)))
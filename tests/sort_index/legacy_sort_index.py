@@ -0,0 +1,95 @@
+"""
+The primary key discovery of RDFDataSetUtils.create_sort_index before it checked candidate keys on integer codes.
+It is kept to benchmark the new key discovery against and to check that both suggest the same keys.
+"""
+
+from src.rdf_data_citation.persistent_id_utils import _is_arrow_table, _arrow_codes
+import pandas as pd
+
+
+def create_sort_index_legacy(dataset: pd.DataFrame) -> list:
+    """
+    Infers the primary key from a dataset by checking every combination of columns with set_index.
+
+    :param dataset: A data frame or pyarrow Table.
+    :return: A list of suggested indexes to use for sorting the dataset.
+    """
+
+    def combination_util(combos: list, arr, n, tuple_size, data, index=0, i=0):
+        """
+        Returns a dictionary with combinations of size tuple_size.
+
+        :param combos: list to be populated with the output combinations from this algorithm
+        :param arr: Input Array
+        :param n: Size of input array
+        :param tuple_size: size of a combination to be printed
+        :param index: Current index in data[]
+        :param data: temporary list to store current combination
+        :param i: index of current element in arr[]
+        :return:
+        """
+
+        # Current combination is ready, print it
+        if index == tuple_size:
+            combo = []
+            for j in range(tuple_size):
+                combo.append(data[j])
+            combos.append(combo)
+            return
+
+        # When no more elements are there to put in data[]
+        if i >= n:
+            return
+
+        # current is included, put next at next location
+        data[index] = arr[i]
+        combination_util(combos, arr, n, tuple_size, data, index + 1, i + 1)
+
+        # current is excluded, replace it with next (Note that i+1 is passed, but index is not changed)
+        combination_util(combos, arr, n, tuple_size, data, index, i + 1)
+
+    sufficient_tuple_size = False
+    # Dictionary-encoded columns and the columns of Arrow tables are compared by their integer codes.
+    if _is_arrow_table(dataset):
+        df_key_finder = pd.DataFrame({name: _arrow_codes(column)[0] for name, column in
+                                      zip(dataset.column_names, dataset.columns)}, columns=dataset.column_names)
+    else:
+        df_key_finder = pd.DataFrame({column: dataset[column].cat.codes
+                                      if isinstance(dataset[column].dtype, pd.CategoricalDtype)
+                                      else dataset[column] for column in dataset.columns}, columns=dataset.columns)
+    df_key_finder.drop_duplicates(inplace=True)
+    cnt_columns = len(df_key_finder.columns)
+    columns = df_key_finder.columns
+
+    distinct_occurrences = {}
+    for column in columns:
+        distinct_occurrences[column] = len(df_key_finder[column].unique().flat)
+
+    attribute_combos_min_tuple_size = {}
+    cnt_index_attrs = 1
+    while not sufficient_tuple_size:
+        attribute_combos = []
+        combination_util(combos=attribute_combos, arr=columns, n=cnt_columns,
+                         tuple_size=cnt_index_attrs, data=[0] * cnt_index_attrs)
+        attribute_combos_unique_flags = {}
+        for combo in attribute_combos:
+            attribute_combos_unique_flags[tuple(combo)] = df_key_finder.set_index(combo).index.is_unique
+
+        if any(attribute_combos_unique_flags.values()):
+            sufficient_tuple_size = True
+            attribute_combos_min_tuple_size = attribute_combos_unique_flags
+        cnt_index_attrs += 1
+
+    dist_stacked_key_attr_values = {}
+    for composition, is_potential_key in attribute_combos_min_tuple_size.items():
+        if is_potential_key:
+            cnt_dist_stacked_attr_values = 0
+            for attribute in composition:
+                cnt_distinct_attribute_values = distinct_occurrences[attribute]
+                cnt_dist_stacked_attr_values += cnt_distinct_attribute_values
+            dist_stacked_key_attr_values[composition] = cnt_dist_stacked_attr_values
+
+    max_val = max(dist_stacked_key_attr_values.values())
+    sort_indexes = [k for k, v in dist_stacked_key_attr_values.items() if v == max_val]
+
+    return sort_indexes
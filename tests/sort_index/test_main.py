@@ -0,0 +1,72 @@
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils
+from src.rdf_data_citation.sparql_results import dictionary_encode
+from tests.sort_index.legacy_sort_index import create_sort_index_legacy
+from tests.test_base import Test, TestExecution
+import pandas as pd
+import pyarrow as pa
+
+
+class TestSortIndex(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.dataset_paths = ["../../Playground/test_primary_key_suggestor_ds{0}.csv".format(i) for i in range(1, 6)]
+        self.dataset = pd.DataFrame({'s': ['http://ex.org/s1', 'http://ex.org/s1', 'http://ex.org/s2',
+                                           'http://ex.org/s2', 'http://ex.org/s3', 'http://ex.org/s3'],
+                                     'p': ['http://ex.org/p1', 'http://ex.org/p2'] * 3,
+                                     'label': ['one@en', None, 'two@en', None, 'drei@de', 'three@en'],
+                                     'g': ['http://ex.org/g1'] * 6})
+
+    def test_create_sort_index__playground(self):
+        rdf_ds = RDFDataSetUtils()
+        datasets = [pd.read_csv(path) for path in self.dataset_paths]
+
+        test = Test(test_number=1,
+                    tc_desc='Test if the suggested keys of the playground datasets are the smallest unique column '
+                            'combinations with the most distinct values and the same as the ones of the legacy key '
+                            'discovery.',
+                    expected_result=str([[('column4',)],
+                                         [('column2', 'column4'), ('column3', 'column4')],
+                                         [('column3', 'column1'), ('column2', 'column1')],
+                                         [('column1', 'column3'), ('column1', 'column2')],
+                                         [('column1', 'column3')]] * 2),
+                    actual_result=str([rdf_ds.create_sort_index(dataset) for dataset in datasets]
+                                      + [create_sort_index_legacy(dataset) for dataset in datasets]))
+
+        return test
+
+    def test_create_sort_index__representations(self):
+        rdf_ds = RDFDataSetUtils(self.dataset)
+        sort_indexes = [rdf_ds.create_sort_index(dataset) for dataset in
+                        [dictionary_encode(self.dataset), pa.Table.from_pandas(self.dataset),
+                         pd.concat([self.dataset, self.dataset])]]
+
+        test = Test(test_number=2,
+                    tc_desc='Test if missing values count as a value of their own, if duplicate rows are ignored and '
+                            'if dictionary-encoded data frames and Arrow tables yield the same keys.',
+                    expected_result=str([[('s', 'label')]] * 4),
+                    actual_result=str([rdf_ds.create_sort_index()] + sort_indexes))
+
+        return test
+
+    def test_create_sort_index__sample(self):
+        rdf_ds = RDFDataSetUtils(self.dataset)
+        try:
+            rdf_ds.create_sort_index(sample_size=0)
+            error = None
+        except ValueError as e:
+            error = type(e).__name__
+
+        test = Test(test_number=3,
+                    tc_desc='Test if the keys are the same if the column combinations are checked on a sample first '
+                            'and if empty samples are rejected.',
+                    expected_result=str([[('s', 'label')]] * 3 + ["ValueError"]),
+                    actual_result=str([rdf_ds.create_sort_index(sample_size=sample_size) for sample_size in
+                                       [1, 3, 100]] + [error]))
+
+        return test
+
+
+t = TestSortIndex(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
@@ -0,0 +1,107 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import threading
+import json
+import gzip
+
+
+class SPARQLEndpoint(BaseHTTPRequestHandler):
+    """
+    A SPARQL endpoint that answers every query with the same result set and counts the TCP connections and
+    the requests it receives. Responses are compressed with gzip if the client accepts it. Queries that contain
+    'large' are answered with 1000 rows. Queries that contain 'numbers' are answered with integers in numeric order.
+    Requests that contain 'bad query' are answered with 400 and updates with 204.
+    """
+
+    protocol_version = "HTTP/1.1"
+    result_set = {'head': {'vars': ['s', 'label']},
+                  'results': {'bindings': [{'s': {'type': 'uri', 'value': 'http://ex.org/s1'},
+                                            'label': {'type': 'literal', 'value': 'one', 'xml:lang': 'en'}},
+                                           {'s': {'type': 'uri', 'value': 'http://ex.org/s2'}}]}}
+    numbers_result_set = {'head': {'vars': ['n']},
+                          'results': {'bindings': [{'n': {'type': 'literal', 'value': str(n),
+                                                          'datatype': 'http://www.w3.org/2001/XMLSchema#integer'}}
+                                                   for n in [8, 9, 10]]}}
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.cnt_connections += 1
+
+    def do_GET(self):
+        self.respond(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        with self.server.lock:
+            self.server.request_encodings.append(self.headers.get('Content-Encoding', "identity"))
+        if self.headers.get('Content-Encoding') == "gzip":
+            body = gzip.decompress(body)
+        body = body.decode("utf-8")
+        if self.headers['Content-Type'].startswith("application/x-www-form-urlencoded"):
+            self.respond(parse_qs(body))
+        else:
+            self.respond({'data': [body]})
+
+    def respond(self, parameters: dict):
+        with self.server.lock:
+            self.server.requests.append((self.path, parameters))
+        if "bad query" in str(parameters):
+            status, body = 400, b"MALFORMED QUERY"
+        elif 'query' in parameters and "large" in parameters['query'][0]:
+            result_set = {'head': self.result_set['head'],
+                          'results': {'bindings': self.result_set['results']['bindings'] * 500}}
+            status, body = 200, json.dumps(result_set).encode("utf-8")
+        elif 'query' in parameters and "numbers" in parameters['query'][0]:
+            status, body = 200, json.dumps(self.numbers_result_set).encode("utf-8")
+        elif 'query' in parameters and "tab-separated-values" in self.headers.get('Accept', ""):
+            status, body = 200, "?s\t?label\n<http://ex.org/s1>\t\"one\"@en\n<http://ex.org/s2>\t\n".encode("utf-8")
+        elif 'query' in parameters:
+            status, body = 200, json.dumps(self.result_set).encode("utf-8")
+        else:
+            status, body = 204, b""
+        self.send_response(status)
+        if "tab-separated-values" in self.headers.get('Accept', ""):
+            self.send_header("Content-Type", "text/tab-separated-values")
+        else:
+            self.send_header("Content-Type", "application/sparql-results+json")
+        if body and "gzip" in self.headers.get('Accept-Encoding', ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class SPARQLEndpointServer(ThreadingHTTPServer):
+    """
+    Serves SPARQLEndpoint on a free local port in a background thread, so that tests can run without an RDF store.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SPARQLEndpoint)
+        self.lock = threading.Lock()
+        self.query_endpoint = "http://127.0.0.1:{0}/repositories/test".format(self.server_port)
+        self.update_endpoint = self.query_endpoint + "/statements"
+        self.cnt_connections = 0
+        self.requests = []
+        self.request_encodings = []
+
+    def start(self) -> 'SPARQLEndpointServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def reset(self):
+        with self.lock:
+            self.cnt_connections = 0
+            self.requests = []
+            self.request_encodings = []
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,79 @@
+"""
+Benchmarks the conversion of SPARQL JSON results into a data frame against the number of rows. The synthetic
+results have one IRI column, one column with language tagged literals, one column with typed literals and one
+column with plain literals, where every tenth row is unbound. For every size the incremental, columnar parser
+and the legacy conversion read the same serialized result from memory, so the network is not part of the
+measurement. Both must return the same values and therefore the same result set checksum. Besides the time, the
+peak memory that is allocated during the conversion is reported, also for the columnar parser with chunks of
+100000 rows that are discarded after use. Run from this directory:
+
+    python benchmark_results.py
+"""
+
+from src.rdf_data_citation.sparql_results import read_json_results
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils
+from tests.sparql_results.legacy_results import read_json_results_legacy
+import io
+import json
+import timeit
+import tracemalloc
+import warnings
+
+
+def synthetic_result(cnt_rows: int) -> bytes:
+    """
+    :param cnt_rows: Number of result rows.
+    :return: A SPARQL JSON result with :cnt_rows rows and four variables.
+    """
+
+    bindings = []
+    for i in range(cnt_rows):
+        binding = {'s': {'type': 'uri', 'value': 'http://example.org/s{0}'.format(i)},
+                   'label': {'type': 'literal', 'value': 'label {0}'.format(i), 'xml:lang': 'en'},
+                   'age': {'type': 'literal', 'value': str(i % 100),
+                           'datatype': 'http://www.w3.org/2001/XMLSchema#integer'}}
+        if i % 10:
+            binding['comment'] = {'type': 'literal', 'value': 'comment {0}'.format(i % 1000)}
+        bindings.append(binding)
+    result = {'head': {'vars': ['s', 'label', 'age', 'comment']}, 'results': {'bindings': bindings}}
+    return json.dumps(result).encode("utf-8")
+
+
+def time_conversion(convert, data: bytes, repeat: int = 3) -> float:
+    return min(timeit.repeat(lambda: convert(io.BytesIO(data)), number=1, repeat=repeat))
+
+
+def peak_memory(convert, data: bytes) -> float:
+    """
+    :return: The peak memory in MB that is allocated by :convert, without the serialized result.
+    """
+
+    tracemalloc.start()
+    convert(io.BytesIO(data))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def consume_chunks(stream):
+    for _ in read_json_results(stream, chunksize=100000):
+        pass
+
+
+if __name__ == "__main__":
+    # DataFrame.append in the legacy conversion is deprecated
+    warnings.simplefilter("ignore", FutureWarning)
+    print("{0:>8} {1:>8} {2:>11} {3:>13} {4:>8} {5:>12} {6:>14} {7:>13}".format(
+        "rows", "MB", "legacy [s]", "columnar [s]", "speedup", "legacy [MB]", "columnar [MB]", "chunked [MB]"))
+    for cnt_rows in [10000, 100000, 1000000]:
+        data = synthetic_result(cnt_rows)
+        df = next(read_json_results(io.BytesIO(data)))
+        df_legacy = read_json_results_legacy(io.BytesIO(data))
+        assert df.equals(df_legacy)
+        assert RDFDataSetUtils(dataset=df).checksum == RDFDataSetUtils(dataset=df_legacy).checksum
+        legacy = time_conversion(read_json_results_legacy, data)
+        columnar = time_conversion(lambda stream: next(read_json_results(stream)), data)
+        print("{0:>8} {1:>8.1f} {2:>11.3f} {3:>13.3f} {4:>8.1f} {5:>12.1f} {6:>14.1f} {7:>13.1f}".format(
+            cnt_rows, len(data) / 1e6, legacy, columnar, legacy / columnar,
+            peak_memory(read_json_results_legacy, data),
+            peak_memory(lambda stream: next(read_json_results(stream)), data), peak_memory(consume_chunks, data)))
@@ -0,0 +1,57 @@
+"""
+The conversion of SPARQL JSON results into a data frame before the columnar conversion in sparql_results. It is
+kept to benchmark the new conversion against and to check that both return the same values.
+"""
+
+import pandas as pd
+import json
+
+
+def to_df_legacy(results: dict) -> pd.DataFrame:
+    """
+
+    :param results: The decoded SPARQL JSON result, as returned by Wrapper.QueryResult.convert().
+    :return: Dataframe
+    """
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.max_colwidth', None)
+
+    def format_value(res_value):
+        value = res_value["value"]
+        lang = res_value.get("xml:lang", None)
+        datatype = res_value.get("datatype", None)
+        if lang is not None:
+            value += "@" + lang
+        if datatype is not None:
+            value += " [" + datatype + "]"
+        return value
+
+    column_names = []
+    for var in results["head"]["vars"]:
+        column_names.append(var)
+    df = pd.DataFrame(columns=column_names)
+
+    values = []
+    for r in results["results"]["bindings"]:
+        row = []
+        for col in results["head"]["vars"]:
+            if col in r:
+                result_value = format_value(r[col])
+            else:
+                result_value = None
+            row.append(result_value)
+        values.append(row)
+    df = df.append(pd.DataFrame(values, columns=df.columns))
+
+    return df
+
+
+def read_json_results_legacy(stream) -> pd.DataFrame:
+    """
+    Decodes the whole response like Wrapper.QueryResult.convert() does for JSON results before it is converted.
+
+    :param stream: A binary file object.
+    :return:
+    """
+
+    return to_df_legacy(json.loads(stream.read().decode("utf-8")))
@@ -0,0 +1,176 @@
+from src.rdf_data_citation import sparql_results
+from src.rdf_data_citation.sparql_results import read_json_results, read_csv_results, read_tsv_results, \
+    dictionary_encode, read_arrow_results, dictionary_encode_table, table_to_pandas, write_parquet, write_feather
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils
+from tests.test_base import Test, TestExecution
+import pandas as pd
+import pyarrow.parquet
+import pyarrow.feather
+import tempfile
+import os
+import io
+
+
+class TestSPARQLResults(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.json_path = "test_data/results.json"
+        self.tsv_path = "test_data/results.tsv"
+        self.csv_path = "test_data/results.csv"
+        self.expected_rows = [['http://ex.org/s1', 'one@en', '31 [http://www.w3.org/2001/XMLSchema#integer]'],
+                              ['http://ex.org/s2', 'two\twords "quoted"', None],
+                              ['b0', 'drei@de', '4.5 [http://www.w3.org/2001/XMLSchema#decimal]'],
+                              ['http://ex.org/s4', None, 'true [http://www.w3.org/2001/XMLSchema#boolean]'],
+                              ['http://ex.org/s5', 'fünf', None]]
+
+    def test_read_json_results__chunks(self):
+        with open(self.json_path, "rb") as stream:
+            chunks = list(read_json_results(stream, chunksize=2))
+        df = pd.concat(chunks)
+
+        test = Test(test_number=1,
+                    tc_desc='Test if a SPARQL JSON result is parsed into data frames of the given chunk size whose '
+                            'index continues from chunk to chunk.',
+                    expected_result=str([[2, 2, 1], ['s', 'label', 'age'], list(range(5)), self.expected_rows]),
+                    actual_result=str([[len(chunk.index) for chunk in chunks], list(df.columns), list(df.index),
+                                       df.values.tolist()]))
+
+        return test
+
+    def test_read_json_results__read_size(self):
+        read_size = sparql_results._read_size
+        sparql_results._read_size = 7
+        try:
+            with open(self.json_path, "rb") as stream:
+                df = next(read_json_results(stream))
+        finally:
+            sparql_results._read_size = read_size
+
+        test = Test(test_number=2,
+                    tc_desc='Test if the JSON parser returns the same rows if the response is read in parts that '
+                            'split the JSON values and multibyte characters.',
+                    expected_result=str(self.expected_rows),
+                    actual_result=str(df.values.tolist()))
+
+        return test
+
+    def test_read_tsv_results(self):
+        with open(self.tsv_path, "rb") as stream:
+            chunks = list(read_tsv_results(stream, chunksize=3))
+        df = pd.concat(chunks)
+
+        test = Test(test_number=3,
+                    tc_desc='Test if the values of a SPARQL TSV result are formatted like the values of the same '
+                            'SPARQL JSON result, including escaped characters and abbreviated numbers.',
+                    expected_result=str([['s', 'label', 'age'], self.expected_rows]),
+                    actual_result=str([list(df.columns), df.values.tolist()]))
+
+        return test
+
+    def test_read_csv_results(self):
+        with open(self.csv_path, "rb") as stream:
+            df = pd.concat(read_csv_results(stream, chunksize=4))
+        expected_rows = [['http://ex.org/s1', 'one', '31'],
+                         ['http://ex.org/s2', 'two\twords "quoted"', None],
+                         ['_:b0', 'drei', '4.5'],
+                         ['http://ex.org/s4', None, 'true'],
+                         ['http://ex.org/s5', 'fünf', None]]
+
+        test = Test(test_number=4,
+                    tc_desc='Test if a SPARQL CSV result is parsed. CSV results have neither language tags nor '
+                            'datatypes.',
+                    expected_result=str([['s', 'label', 'age'], expected_rows]),
+                    actual_result=str([list(df.columns), df.values.tolist()]))
+
+        return test
+
+    def test_read_json_results__empty(self):
+        stream = io.BytesIO(b'{"head": {"vars": ["s"]}, "results": {"bindings": []}}')
+        chunks = list(read_json_results(stream, chunksize=10))
+
+        test = Test(test_number=5,
+                    tc_desc='Test if an empty result set is parsed into one empty data frame with the variables as '
+                            'columns.',
+                    expected_result=str([1, ['s'], 0]),
+                    actual_result=str([len(chunks), list(chunks[0].columns), len(chunks[0].index)]))
+
+        return test
+
+    def test_dictionary_encode__checksum(self):
+        with open(self.json_path, "rb") as stream:
+            df = next(read_json_results(stream))
+        df = pd.concat([df, df.assign(s=df['s'] + "/copy")], ignore_index=True)
+        df_encoded = dictionary_encode(df)
+        rdf_ds = RDFDataSetUtils(dataset=df)
+        rdf_ds_encoded = RDFDataSetUtils(dataset=df_encoded)
+        sorted_df = rdf_ds.sort(("s",))
+        sorted_df_encoded = rdf_ds_encoded.sort(("s",))
+
+        test = Test(test_number=6,
+                    tc_desc='Test if a dictionary-encoded result set yields the same checksums, sort index and sort '
+                            'order as the result set with plain strings.',
+                    expected_result=str(["category"] * 3 + [True] * 4),
+                    actual_result=str([str(dtype) for dtype in df_encoded.dtypes] + [
+                        rdf_ds.checksum == rdf_ds_encoded.checksum,
+                        rdf_ds.create_sort_index() == rdf_ds_encoded.create_sort_index(),
+                        sorted_df['s'].tolist() == sorted_df_encoded['s'].tolist(),
+                        RDFDataSetUtils(dataset=sorted_df).compute_checksum(column_order_dependent=True) ==
+                        RDFDataSetUtils(dataset=sorted_df_encoded).compute_checksum(column_order_dependent=True)]))
+
+        return test
+
+    def test_read_arrow_results__checksum(self):
+        with open(self.json_path, "rb") as stream:
+            df = next(read_json_results(stream))
+        with open(self.json_path, "rb") as stream:
+            table = next(read_arrow_results(stream, "json"))
+        table_encoded = dictionary_encode_table(table)
+        rdf_ds = RDFDataSetUtils(dataset=df)
+        rdf_ds_arrow = RDFDataSetUtils(dataset=table)
+        rdf_ds_encoded = RDFDataSetUtils(dataset=table_encoded)
+
+        test = Test(test_number=7,
+                    tc_desc='Test if an Arrow result set holds the same values as the data frame and yields the '
+                            'same checksums, sort index and sort order, also when it is dictionary-encoded.',
+                    expected_result=str([self.expected_rows] + [True] * 8),
+                    actual_result=str([[list(row.values()) for row in table.to_pylist()]] + [
+                        rdf_ds.checksum == rdf_ds_arrow.checksum == rdf_ds_encoded.checksum,
+                        rdf_ds.compute_checksum(column_order_dependent=True) ==
+                        rdf_ds_arrow.compute_checksum(column_order_dependent=True),
+                        rdf_ds.create_sort_index() == rdf_ds_arrow.create_sort_index(),
+                        rdf_ds.create_sort_index() == rdf_ds_encoded.create_sort_index(),
+                        rdf_ds.sort(("label",)).values.tolist() ==
+                        rdf_ds_arrow.sort(("label",)).to_pandas().values.tolist(),
+                        rdf_ds.sort(("label",)).values.tolist() ==
+                        [list(row.values()) for row in rdf_ds_encoded.sort(("label",)).to_pylist()],
+                        rdf_ds.sort(("label",)).columns.tolist() == rdf_ds_arrow.sort(("label",)).column_names,
+                        rdf_ds.describe() == rdf_ds_arrow.describe()]))
+
+        return test
+
+    def test_write_parquet__round_trip(self):
+        with open(self.json_path, "rb") as stream:
+            table = next(read_arrow_results(stream, "json"))
+        with tempfile.TemporaryDirectory() as directory:
+            parquet_path = os.path.join(directory, "results.parquet")
+            feather_path = os.path.join(directory, "results.feather")
+            write_parquet(table, parquet_path)
+            write_feather(table, feather_path)
+            from_parquet = pyarrow.parquet.read_table(parquet_path)
+            from_feather = pyarrow.feather.read_table(feather_path)
+        df = table_to_pandas(table, yn_zero_copy=True)
+
+        test = Test(test_number=8,
+                    tc_desc='Test if an Arrow result set survives a round trip through Parquet and Feather and is '
+                            'handed to pandas with Arrow-backed columns.',
+                    expected_result=str([True, True, ["string[pyarrow]"] * 3, 5]),
+                    actual_result=str([from_parquet.equals(table), from_feather.equals(table),
+                                       [str(dtype) for dtype in df.dtypes], len(df.index)]))
+
+        return test
+
+
+t = TestSPARQLResults(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
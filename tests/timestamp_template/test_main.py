@@ -0,0 +1,82 @@
+from src.rdf_data_citation.persistent_id_utils import QueryUtils, RDFDataSetUtils, MetaData, \
+    fill_timestamp_template
+from src.rdf_data_citation.query_store import QueryStore
+from tests.test_base import Test, TestExecution
+from datetime import datetime, timedelta, timezone
+import glob
+import logging
+
+
+class TestTimestampTemplate(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.execution_timestamp = datetime(2021, 4, 30, 12, 11, 21, 941000, timezone(timedelta(hours=2)))
+        self.backfill_timestamps = [self.execution_timestamp - timedelta(days=d, hours=d) for d in range(1, 30)]
+        self.queries = {}
+
+    def before_all_tests(self):
+        """
+        Reads the query_handler corpus. Queries that cannot be timestamped are not part of the corpus.
+
+        :return:
+        """
+
+        print("Executing before_tests ...")
+        for path in sorted(glob.glob("../query_handler/test_data/*.txt")):
+            query = open(path, "r").read()
+            try:
+                query_utils = QueryUtils(query, self.execution_timestamp)
+                query_utils.pid, query_utils.timestamped_query
+                self.queries[path] = query
+            except Exception as e:
+                logging.info("{0} is not part of the timestamp template corpus: {1}".format(path, e))
+
+    def test_timestamp_template__same_as_timestamp_query(self):
+        mismatches = []
+        for path, query in self.queries.items():
+            query_utils = QueryUtils(query, self.execution_timestamp)
+            for timestamp in self.backfill_timestamps:
+                # Passing the query compiles a new template from the query text
+                if fill_timestamp_template(query_utils.timestamp_template, timestamp) \
+                        != query_utils.timestamp_query(query, timestamp):
+                    mismatches.append((path, timestamp))
+
+        test = Test(test_number=1,
+                    tc_desc='Test if filling the timestamp template of a query with a timestamp yields the same '
+                            'query as timestamping the query with this timestamp.',
+                    expected_result="mismatches: []",
+                    actual_result="mismatches: {0}".format(mismatches))
+
+        return test
+
+    def test_timestamp_template__query_store(self):
+        query_utils = QueryUtils(next(iter(self.queries.values())), self.execution_timestamp)
+        result_set_utils = RDFDataSetUtils(description="Timestamp template test", unique_sort_index=())
+        citation_metadata = MetaData()
+
+        query_store = QueryStore()
+        query_store._remove(query_utils.checksum)
+        try:
+            query_store.store(query_utils, result_set_utils, citation_metadata, yn_new_query=True)
+            timestamp_template = query_store.get_timestamp_template(query_utils.checksum)
+            query_data, _, _ = query_store.get_query(query_utils.pid)
+            timestamped_query = fill_timestamp_template(timestamp_template, self.execution_timestamp)
+            retimestamped_query = query_data.timestamp_query(citation_timestamp=self.backfill_timestamps[0])
+        finally:
+            query_store._remove(query_utils.checksum)
+
+        test = Test(test_number=2,
+                    tc_desc='Test if the timestamp template is stored with the query and if the retrieved '
+                            'template yields the timestamped queries without parsing the query.',
+                    expected_result="{0}\n{1}".format(query_utils.timestamped_query,
+                                                      query_utils.timestamp_query(
+                                                          citation_timestamp=self.backfill_timestamps[0])),
+                    actual_result="{0}\n{1}".format(timestamped_query, retimestamped_query))
+
+        return test
+
+
+t = TestTimestampTemplate(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
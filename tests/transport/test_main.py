@@ -0,0 +1,277 @@
+from src.rdf_data_citation.rdf_star import TripleStoreEngine
+from src.rdf_data_citation.persistent_id_utils import RDFDataSetUtils, ResultSetChecksum
+from src.rdf_data_citation.transport import PooledTransport, SPARQLWrapperTransport, transfer_stats
+from tests.test_base import Test, TestExecution
+from tests.sparql_endpoint import SPARQLEndpointServer
+from SPARQLWrapper import TSV
+from SPARQLWrapper.SPARQLExceptions import QueryBadFormed
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import json
+import pandas as pd
+import pyarrow as pa
+
+
+class TestTransport(TestExecution):
+
+    def __init__(self, annotated_tests: bool = False):
+        super().__init__(annotated_tests)
+        self.server = None
+        self.query_endpoint = None
+        self.update_endpoint = None
+
+    def before_all_tests(self):
+        print("Executing before_tests ...")
+        self.server = SPARQLEndpointServer().start()
+        self.query_endpoint = self.server.query_endpoint
+        self.update_endpoint = self.server.update_endpoint
+
+    def before_single_test(self, test_name: str):
+        self.server.reset()
+
+    def after_all_tests(self):
+        print("Executing after_tests ...")
+        self.server.stop()
+
+    def engine(self, transport=None) -> TripleStoreEngine:
+        return TripleStoreEngine(self.query_endpoint, self.update_endpoint, skip_connection_test=True,
+                                 transport=transport)
+
+    def test_pooled_transport__same_results(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . }"
+        df_default = self.engine().get_data(select_statement, yn_timestamp_query=False)
+        df_pooled = self.engine(PooledTransport()).get_data(select_statement, yn_timestamp_query=False)
+
+        test = Test(test_number=1,
+                    tc_desc='Test if the result set of a query that was executed over a PooledTransport equals the '
+                            'result set of the default SPARQLWrapper transport.',
+                    expected_result=df_default.to_string(),
+                    actual_result=df_pooled.to_string())
+
+        return test
+
+    def test_pooled_transport__keep_alive(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . }"
+        update_statement = "insert data { <http://ex.org/s1> <http://ex.org/label> 'one' . }"
+
+        engine = self.engine()
+        for _ in range(5):
+            engine.get_data(select_statement, yn_timestamp_query=False)
+            engine.sparql_post.setQuery(update_statement)
+            engine.sparql_post.query()
+        cnt_connections_default = self.server.cnt_connections
+
+        self.server.cnt_connections = 0
+        engine = self.engine(PooledTransport())
+        for _ in range(5):
+            engine.get_data(select_statement, yn_timestamp_query=False)
+            engine.sparql_post.setQuery(update_statement)
+            engine.sparql_post.query()
+        cnt_connections_pooled = self.server.cnt_connections
+        updates = [parameters['update'][0] for path, parameters in self.server.requests if 'update' in parameters]
+
+        test = Test(test_number=2,
+                    tc_desc='Test if a PooledTransport sends queries and updates to the same host over one '
+                            'persistent connection while SPARQLWrapper opens a connection per request. Both send '
+                            'the updates as update parameter.',
+                    expected_result="connections: default 10, pooled 1; updates: 10",
+                    actual_result="connections: default {0}, pooled {1}; updates: {2}".format(
+                        cnt_connections_default, cnt_connections_pooled,
+                        len([u for u in updates if u == update_statement])))
+
+        return test
+
+    def test_pooled_transport__shared_pool(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . }"
+        transport = PooledTransport(pool_size=2)
+        thread_data = threading.local()
+
+        def execute(i: int) -> int:
+            # A TripleStoreEngine holds the query it executes next and is therefore not shared between threads.
+            if not hasattr(thread_data, "engine"):
+                thread_data.engine = self.engine(transport)
+            return len(thread_data.engine.get_data(select_statement, yn_timestamp_query=False).index)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            cnt_rows = list(executor.map(execute, range(4 * 10)))
+
+        test = Test(test_number=3,
+                    tc_desc='Test if engines that share a PooledTransport in parallel threads do not open more '
+                            'connections than the pool size.',
+                    expected_result="rows: [2], connections: <= 2",
+                    actual_result="rows: {0}, connections: {1}".format(
+                        sorted(set(cnt_rows)), "<= 2" if self.server.cnt_connections <= 2 else
+                        self.server.cnt_connections))
+
+        return test
+
+    def test_pooled_transport__errors(self):
+        errors = []
+        for transport in [SPARQLWrapperTransport(), PooledTransport()]:
+            try:
+                self.engine(transport).get_data("bad query", yn_timestamp_query=False)
+            except QueryBadFormed as e:
+                errors.append(type(e).__name__)
+
+        test = Test(test_number=4,
+                    tc_desc='Test if a PooledTransport raises the same SPARQLWrapper exceptions as the default '
+                            'transport.',
+                    expected_result=str(["QueryBadFormed", "QueryBadFormed"]),
+                    actual_result=str(errors))
+
+        return test
+
+    def test_pooled_transport__post(self):
+        data = "<http://ex.org/s1> <http://ex.org/label> \"one\" .\n"
+        graph_store_endpoint = self.query_endpoint + "/rdf-graphs/service?default"
+        SPARQLWrapperTransport().post(graph_store_endpoint, data.encode("utf-8"), "application/x-turtlestar")
+        PooledTransport().post(graph_store_endpoint, data.encode("utf-8"), "application/x-turtlestar")
+
+        test = Test(test_number=5,
+                    tc_desc='Test if both transports post data to a Graph Store HTTP Protocol endpoint.',
+                    expected_result=str([("/repositories/test/rdf-graphs/service?default", {'data': [data]})] * 2),
+                    actual_result=str(self.server.requests))
+
+        return test
+
+    def test_compression__result_sets(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . } # large"
+        engine = self.engine()
+        df_identity = engine.get_data(select_statement, yn_timestamp_query=False)
+        identity_stats = engine.transfer_stats
+
+        actual_results = []
+        for transport in [SPARQLWrapperTransport(compression=True), PooledTransport()]:
+            engine = self.engine(transport)
+            df = engine.get_data(select_statement, yn_timestamp_query=False)
+            stats = engine.transfer_stats
+            actual_results.append("equal: {0}, encoding: {1}, decoded bytes: {2}, compressed: {3}".format(
+                df.equals(df_identity), stats.content_encoding,
+                stats.response_decoded_bytes == identity_stats.response_decoded_bytes,
+                stats.response_wire_bytes < stats.response_decoded_bytes / 10))
+
+        test = Test(test_number=6,
+                    tc_desc='Test if both transports accept gzip compressed result sets if compression is enabled, '
+                            'decode them to the same data frame and report the bytes on the wire and the decoded '
+                            'bytes.',
+                    expected_result=str(["identity"] + ["equal: True, encoding: gzip, decoded bytes: True, "
+                                                        "compressed: True"] * 2),
+                    actual_result=str([identity_stats.content_encoding or "identity"] + actual_results))
+
+        return test
+
+    def test_compression__requests(self):
+        update_statement = "insert data { " + " ".join("<http://ex.org/s{0}> <http://ex.org/label> 'label' ."
+                                                       .format(i) for i in range(100)) + " }"
+        data = update_statement.encode("utf-8")
+        graph_store_endpoint = self.query_endpoint + "/rdf-graphs/service?default"
+
+        actual_results = []
+        for transport in [SPARQLWrapperTransport(compress_requests_above=1000),
+                          PooledTransport(compress_requests_above=1000)]:
+            engine = self.engine(transport)
+            engine.sparql_post.setQuery("insert data { <http://ex.org/s1> <http://ex.org/label> 'one' . }")
+            engine.sparql_post.query()
+            engine.sparql_post.setQuery(update_statement)
+            stats = transfer_stats(engine.sparql_post.query())
+            post_stats = transport.post(graph_store_endpoint, data, "application/x-turtlestar")
+            actual_results.append([stats.request_wire_bytes < stats.request_bytes,
+                                   post_stats.request_bytes == len(data),
+                                   post_stats.request_wire_bytes < len(data)])
+        updates = [parameters.get('update', parameters.get('data'))[0] for path, parameters in self.server.requests]
+
+        test = Test(test_number=7,
+                    tc_desc='Test if both transports compress request bodies above the given size with gzip and '
+                            'leave smaller requests uncompressed.',
+                    expected_result=str([["identity", "gzip", "gzip"] * 2, [[True] * 3] * 2,
+                                         [update_statement] * 4]),
+                    actual_result=str([self.server.request_encodings, actual_results,
+                                       [u for u in updates if u == update_statement]]))
+
+        return test
+
+    def test_get_data__chunks(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . } # large"
+        engine = self.engine(PooledTransport())
+        df = engine.get_data(select_statement, yn_timestamp_query=False)
+        chunks = list(engine.get_data(select_statement, yn_timestamp_query=False, chunksize=300))
+        df_tsv = engine.get_data("select ?s ?label where { ?s <http://ex.org/label> ?label . }",
+                                 yn_timestamp_query=False, result_format=TSV)
+        df_json = engine.get_data("select ?s ?label where { ?s <http://ex.org/label> ?label . }",
+                                  yn_timestamp_query=False)
+
+        test = Test(test_number=8,
+                    tc_desc='Test if get_data returns the result set in chunks of the given size that add up to '
+                            'the result set without chunks and if TSV results equal JSON results.',
+                    expected_result="chunks: [300, 300, 300, 100], equal: True, TSV equals JSON: True",
+                    actual_result="chunks: {0}, equal: {1}, TSV equals JSON: {2}".format(
+                        [len(chunk.index) for chunk in chunks], pd.concat(chunks).equals(df), df_tsv.equals(df_json)))
+
+        return test
+
+    def test_get_data__arrow_table(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . } # large"
+        engine = self.engine(PooledTransport())
+        df = engine.get_data(select_statement, yn_timestamp_query=False)
+        table = engine.get_data(select_statement, yn_timestamp_query=False, yn_arrow_table=True)
+        chunks = list(engine.get_data(select_statement, yn_timestamp_query=False, chunksize=300,
+                                      yn_arrow_table=True))
+        small_select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . }"
+        df_small = engine.get_data(small_select_statement, yn_timestamp_query=False)
+        table_tsv = engine.get_data(small_select_statement, yn_timestamp_query=False, result_format=TSV,
+                                    yn_arrow_table=True)
+
+        test = Test(test_number=9,
+                    tc_desc='Test if get_data builds Arrow tables, also in chunks and from TSV results, that hold '
+                            'the same values as the data frame.',
+                    expected_result="chunks: [300, 300, 300, 100], equal: [True, True, True]",
+                    actual_result="chunks: {0}, equal: {1}".format(
+                        [chunk.num_rows for chunk in chunks],
+                        [table.to_pandas().equals(df), pa.concat_tables(chunks).equals(table),
+                         table_tsv.to_pandas().equals(df_small)]))
+
+        return test
+
+    def test_get_data__checksum_chunks(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . } # large"
+        engine = self.engine(PooledTransport())
+        df = engine.get_data(select_statement, yn_timestamp_query=False)
+        checksum = ResultSetChecksum()
+        for chunk in engine.get_data(select_statement, yn_timestamp_query=False, chunksize=300):
+            checksum.update(chunk)
+
+        test = Test(test_number=10,
+                    tc_desc='Test if the checksum that is computed from the chunks of get_data while they are '
+                            'downloaded equals the checksum of the whole result set.',
+                    expected_result=str([RDFDataSetUtils().compute_checksum(df, column_order_dependent=True), 1000]),
+                    actual_result=str([checksum.hexdigest(), checksum.cnt_rows]))
+
+        return test
+
+    def test_pooled_transport__streaming(self):
+        select_statement = "select ?s ?label where { ?s <http://ex.org/label> ?label . } # large"
+        engine = self.engine(PooledTransport())
+        engine.sparql_get.setQuery(select_statement)
+        response = engine.sparql_get.query().response
+        decoded_bytes_before_read = response.decoded_bytes
+        head = response.read(16)
+        body = head + response.read()
+        response.close()
+        cnt_rows = len(json.loads(body.decode("utf-8"))['results']['bindings'])
+
+        test = Test(test_number=11,
+                    tc_desc='Test if a PooledTransport streams the compressed body of a query result instead of '
+                            'reading it before the result is parsed, and counts the bytes as they are read.',
+                    expected_result="before read: 0, first read: 16, rows: 1000, decoded bytes: True, "
+                                    "compressed: True",
+                    actual_result="before read: {0}, first read: {1}, rows: {2}, decoded bytes: {3}, "
+                                  "compressed: {4}".format(decoded_bytes_before_read, len(head), cnt_rows,
+                                                           response.decoded_bytes == len(body),
+                                                           response.wire_bytes < len(body) / 10))
+
+        return test
+
+
+t = TestTransport(annotated_tests=False)
+t.run_tests()
+t.print_test_results()
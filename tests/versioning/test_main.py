@@ -1,8 +1,16 @@
-from rdf_data_citation.rdf_star import TripleStoreEngine, VersioningMode
+from rdf_data_citation.rdf_star import TripleStoreEngine, VersioningMode, PartitionMode
+from rdf_data_citation.rdf_files import read_ntriples, skolemize
+from rdf_data_citation._exceptions import WriteBehindError
 from tests.test_base import Test, TestExecution, format_text
+from tests.sparql_endpoint import SPARQLEndpointServer
 from datetime import timezone, timedelta, datetime
 import logging
+import json
+import threading
+import time
 import csv
+import os
+import tempfile
 
 
 class TestVersioning(TestExecution):
@@ -674,6 +682,357 @@ class TestVersioning(TestExecution):
 
         return test
 
+    def test_update_bulk__outdate(self):
+        test = Test(test_number=22,
+                    tc_desc='Test if updating the triples of multi_triples_update.csv in batches of two triples '
+                            'sends two update requests and outdates all three triples with the same timestamp.',
+                    expected_result="batches: [2, 1]; outdated triples: 3; distinct timestamps: 1")
+        with open('test_data/multi_triples_update.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_update = {(rows['subject'], rows['predicate'], rows['old_object']): rows['new_object'] for rows
+                                 in reader}
+        prefixes = {'pub': 'http://ontology.ontotext.com/taxonomy/',
+                    'publishing': 'http://ontology.ontotext.com/publishing#'}
+        batch_results = self.rdf_engine.update_bulk(triples_to_update, prefixes, batch_size=2)
+
+        test_query = open("test_data/test_update_multi__outdate.txt", "r").read()
+        result_set_after_update = self.rdf_engine.get_data(test_query, yn_timestamp_query=False)
+        test.actual_result = "batches: {0}; outdated triples: {1}; distinct timestamps: {2}".format(
+            [batch_result.cnt_rows for batch_result in batch_results], len(result_set_after_update.index),
+            result_set_after_update['outdatedVersion'].nunique())
+
+        # Clean up - Delete newly added triples. The nested triples are deleted in after_single_test()
+        with open('test_data/multi_triples_update.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_delete = [[rows['subject'], rows['predicate'], rows['new_object']] for rows in reader]
+        self.rdf_engine._delete_triples(triples_to_delete, prefixes)
+
+        return test
+
+    def test_insert_bulk__two_consecutive_inserts(self):
+        prefixes = {'pub': 'http://ontology.ontotext.com/taxonomy/',
+                    'publishing': 'http://ontology.ontotext.com/publishing#'}
+        dataset_query = open("test_data/test_insert__dataset_query.txt", "r").read()
+        # +2 hours timezone because this is how graphDB sets it for the vienna timezone.
+        vieTZObject = timezone(timedelta(hours=2))
+
+        timestamp_before_insert1 = datetime.now(vieTZObject)
+        with open('test_data/insert_triples.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_insert1 = [[rows['subject'], rows['predicate'], rows['object']] for rows in reader]
+        self.rdf_engine.insert_triples_bulk(triples_to_insert1, prefixes, batch_size=1)
+
+        timestamp_before_insert2 = datetime.now(vieTZObject)
+        with open('test_data/insert_triples2.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_insert2 = [[rows['subject'], rows['predicate'], rows['object']] for rows in reader]
+        self.rdf_engine.insert_triples_bulk(triples_to_insert2, prefixes)
+
+        dataset_before_insert1 = self.rdf_engine.get_data(dataset_query, timestamp_before_insert1)
+        dataset_before_insert2 = self.rdf_engine.get_data(dataset_query, timestamp_before_insert2)
+        dataset_after_insert2 = self.rdf_engine.get_data(dataset_query)
+
+        test = Test(test_number=23,
+                    tc_desc='Make two consecutive bulk inserts and retrieve the dataset as it was before, between '
+                            'and after the inserts. Check that the datasets reflect the right information as of '
+                            'each timestamp.',
+                    expected_result=str(2),
+                    actual_result=str(len(dataset_before_insert2.index) - len(dataset_before_insert1.index)
+                                      + len(dataset_after_insert2.index) - len(dataset_before_insert2.index)))
+
+        # Clean up
+        self.rdf_engine._delete_triples(triples_to_insert1, prefixes)
+        self.rdf_engine._delete_triples(triples_to_insert2, prefixes)
+
+        return test
+
+    def test_outdate_bulk__outdate_triples(self):
+        dataset_query = open("test_data/test_outdate__dataset_query.txt", "r").read()
+        prefixes = {'pub': 'http://ontology.ontotext.com/taxonomy/',
+                    'publishing': 'http://ontology.ontotext.com/publishing#'}
+        with open('test_data/test_outdate__outdate_triples.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_outdate = [(rows['subject'], rows['predicate'], rows['object']) for rows in reader]
+
+        cnt_triples_df = self.rdf_engine.get_data(self.query_cnt_triples, yn_timestamp_query=False)
+        cnt_before_outdate = int(cnt_triples_df['cnt'].item().split(" ")[0])
+
+        self.rdf_engine.outdate_triples_bulk(triples_to_outdate, prefixes, batch_size=2)
+
+        cnt_triples_df = self.rdf_engine.get_data(self.query_cnt_triples, yn_timestamp_query=False)
+        cnt_after_outdate = int(cnt_triples_df['cnt'].item().split(" ")[0])
+        dataset_after_outdate = self.rdf_engine.get_data(dataset_query)
+
+        test = Test(test_number=24,
+                    tc_desc='Test if the number of triples in the RDF store after outdating a set of triples '
+                            'in batches did not change and if the result set after the triples have been outdated '
+                            'is empty. ',
+                    expected_result="number of triples in db: {0}; number of rows in "
+                                    "dataset after outdate: {1}".format(str(cnt_before_outdate), 0),
+                    actual_result="number of triples in db: {0}; number of rows in "
+                                  "dataset after outdate: {1}".format(str(cnt_after_outdate),
+                                                                      len(dataset_after_outdate.index)))
+
+        return test
+
+    def test_write_behind__insert_outdate_cancel_out(self):
+        prefixes = {'pub': 'http://ontology.ontotext.com/taxonomy/',
+                    'publishing': 'http://ontology.ontotext.com/publishing#'}
+        with open('test_data/insert_triples.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_insert = [[rows['subject'], rows['predicate'], rows['object']] for rows in reader]
+
+        cnt_triples_df = self.rdf_engine.get_data(self.query_cnt_triples, yn_timestamp_query=False)
+        cnt_before_write = int(cnt_triples_df['cnt'].item().split(" ")[0])
+        with self.rdf_engine.write_behind(flush_interval=60):
+            self.rdf_engine.insert_triples(triples_to_insert, prefixes)
+            self.rdf_engine.outdate_triples([tuple(triple) for triple in triples_to_insert], prefixes)
+        cnt_triples_df = self.rdf_engine.get_data(self.query_cnt_triples, yn_timestamp_query=False)
+        cnt_after_write = int(cnt_triples_df['cnt'].item().split(" ")[0])
+
+        test = Test(test_number=25,
+                    tc_desc='Test if triples that are inserted and outdated within one flush of the write-behind '
+                            'queue are not written to the RDF store.',
+                    expected_result="number of triples in db: {0}".format(cnt_before_write),
+                    actual_result="number of triples in db: {0}".format(cnt_after_write))
+
+        return test
+
+    def test_write_behind__flush(self):
+        prefixes = {'pub': 'http://ontology.ontotext.com/taxonomy/',
+                    'publishing': 'http://ontology.ontotext.com/publishing#'}
+        dataset_query = open("test_data/test_insert__dataset_query.txt", "r").read()
+        with open('test_data/insert_triples.csv', mode='r') as infile:
+            reader = csv.DictReader(infile, delimiter=';')
+            triples_to_insert = [[rows['subject'], rows['predicate'], rows['object']] for rows in reader]
+
+        dataset_before_insert = self.rdf_engine.get_data(dataset_query)
+        with self.rdf_engine.write_behind(flush_interval=60) as write_behind_queue:
+            for triple in triples_to_insert:
+                self.rdf_engine.insert_triples(triple, prefixes)
+            write_behind_queue.flush()
+            dataset_after_flush = self.rdf_engine.get_data(dataset_query)
+
+        test = Test(test_number=26,
+                    tc_desc='Test if triples that are inserted one by one in write-behind mode are in the dataset '
+                            'after the queue was flushed.',
+                    expected_result=str(1),
+                    actual_result=str(len(dataset_after_flush.index) - len(dataset_before_insert.index)))
+
+        # Clean up
+        self.rdf_engine._delete_triples(triples_to_insert, prefixes)
+
+        return test
+
+    def test_version__partitioned_init_reset(self):
+        test_query = "select ?s ?p ?o { ?s ?p ?o . }"
+        # version_all_rows is executed in before_single_test
+        cnt_triples_versioned = len(self.rdf_engine.get_data(test_query, yn_timestamp_query=False).index)
+        self.rdf_engine.reset_all_versions(PartitionMode.PREDICATE, connections=4)
+        cnt_triples_reset = len(self.rdf_engine.get_data(test_query, yn_timestamp_query=False).index)
+        self.rdf_engine.version_all_rows(self.initial_timestamp, partition_mode=PartitionMode.SUBJECT_HASH,
+                                         cnt_partitions=8, connections=4)
+        cnt_triples_partitioned = len(self.rdf_engine.get_data(test_query, yn_timestamp_query=False).index)
+
+        test = Test(test_number=27,
+                    tc_desc='Test if resetting the versions by predicate yields the initial number of triples and if '
+                            'versioning all triples by subject hash ranges over parallel connections yields the same '
+                            'number of triples as versioning them with one update request.',
+                    expected_result="reset: {0}, versioned: {1}".format(
+                        self.cnt_actual_triples, cnt_triples_versioned),
+                    actual_result="reset: {0}, versioned: {1}".format(cnt_triples_reset, cnt_triples_partitioned))
+
+        return test
+
+    def test_version__partitioned_resume(self):
+        test_query = "select ?s ?p ?o { ?s ?p ?o . }"
+        # version_all_rows is executed in before_single_test
+        cnt_triples_versioned = len(self.rdf_engine.get_data(test_query, yn_timestamp_query=False).index)
+        checkpoint_file = os.path.join(tempfile.mkdtemp(), "checkpoint.jsonl")
+        self.rdf_engine.reset_all_versions()
+        # Records the first two partitions as finished like a run that was interrupted afterwards.
+        self.rdf_engine.version_all_rows(self.initial_timestamp, partition_mode=PartitionMode.SUBJECT_HASH,
+                                         cnt_partitions=4)
+        with open(checkpoint_file, "w") as checkpoint:
+            for partition, pattern in self.rdf_engine._partitions(PartitionMode.SUBJECT_HASH, 4)[:2]:
+                checkpoint.write(json.dumps({'operation': "version_all_rows", 'partition_mode': "SUBJECT_HASH",
+                                             'partition': partition}) + "\n")
+        partition_results = self.rdf_engine.version_all_rows(self.initial_timestamp,
+                                                             partition_mode=PartitionMode.SUBJECT_HASH,
+                                                             cnt_partitions=4, checkpoint_file=checkpoint_file)
+        cnt_triples_resumed = len(self.rdf_engine.get_data(test_query, yn_timestamp_query=False).index)
+
+        test = Test(test_number=28,
+                    tc_desc='Test if versioning all triples again skips the triples that are already annotated, '
+                            'if a repeated run with the same checkpoint file skips the finished partitions and if '
+                            'the checkpoint file is removed once all partitions finished.',
+                    expected_result="versioned: {0}, partitions executed by repeated run: 2, checkpoint file: "
+                                    "False".format(cnt_triples_versioned),
+                    actual_result="versioned: {0}, partitions executed by repeated run: {1}, checkpoint file: "
+                                  "{2}".format(cnt_triples_resumed, len(partition_results),
+                                               os.path.exists(checkpoint_file)))
+
+        return test
+
+    def test_bulk_load__versioned_triples(self):
+        dataset_query = """
+        PREFIX pub: <http://ontology.ontotext.com/taxonomy/>
+        select ?s ?label where {
+            ?s pub:preferredLabel ?label .
+            filter(strstarts(str(?label), "Bulk load test"))
+        } order by ?s
+        """
+        batch_results = self.rdf_engine.bulk_load("test_data/bulk_load.nt", initial_timestamp=self.initial_timestamp,
+                                                  chunk_size=2)
+        dataset_after_load = self.rdf_engine.get_data(dataset_query)
+
+        test = Test(test_number=29,
+                    tc_desc='Test if the triples of an N-Triples file that was loaded in chunks through the Graph '
+                            'Store HTTP Protocol are in the versioned dataset.',
+                    expected_result="chunks: [2, 1], number of rows in dataset: 3",
+                    actual_result="chunks: {0}, number of rows in dataset: {1}".format(
+                        [batch_result.cnt_rows for batch_result in batch_results], len(dataset_after_load.index)))
+
+        # Clean up
+        triples_to_delete = [list(triple) for triple in read_ntriples("test_data/bulk_load.nt")]
+        self.rdf_engine._delete_triples(triples_to_delete)
+
+        return test
+
+    def test_bulk_load__blank_nodes(self):
+        dataset_query = """
+        PREFIX pub: <http://ontology.ontotext.com/taxonomy/>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        select ?s ?label ?comment where {
+            ?s pub:preferredLabel ?label ; rdfs:comment ?comment .
+            filter(strstarts(str(?label), "Bulk load blank node test"))
+        } order by ?s
+        """
+        skolem_base = "http://data.ontotext.com/publishing#BulkLoadBlankNode-"
+        batch_results = self.rdf_engine.bulk_load("test_data/bulk_load_blank_nodes.nt",
+                                                  initial_timestamp=self.initial_timestamp, chunk_size=1,
+                                                  skolem_base=skolem_base)
+        dataset_after_load = self.rdf_engine.get_data(dataset_query)
+
+        test = Test(test_number=30,
+                    tc_desc='Test if a blank node whose triples are loaded in different chunks is one node after the '
+                            'load.',
+                    expected_result="chunks: [1, 1], subjects: ['<{0}author>']".format(skolem_base),
+                    actual_result="chunks: {0}, subjects: {1}".format(
+                        [batch_result.cnt_rows for batch_result in batch_results],
+                        ["<{0}>".format(s) for s in dataset_after_load["s"]]))
+
+        # Clean up
+        triples_to_delete = [[skolemize(term, skolem_base) for term in triple]
+                             for triple in read_ntriples("test_data/bulk_load_blank_nodes.nt")]
+        self.rdf_engine._delete_triples(triples_to_delete)
+
+        return test
+
+    def test_write_behind__failed_flush(self):
+        server = SPARQLEndpointServer().start()
+        try:
+            engine = TripleStoreEngine(server.query_endpoint, server.update_endpoint, skip_connection_test=True)
+            write_behind_queue = engine.write_behind(flush_interval=60, batch_size=1)
+            old_triple = ("<http://ex.org/a>", "<http://ex.org/p>", '"old"')
+            bad_triple = ("<http://ex.org/a>", "<http://ex.org/p>", '"bad query"')
+            new_triple = ("<http://ex.org/a>", "<http://ex.org/p>", '"new"')
+            write_behind_queue.outdate_triples([old_triple])
+            write_behind_queue.insert_triples([list(bad_triple), list(new_triple)])
+            try:
+                write_behind_queue.flush()
+                error = None
+            except WriteBehindError as e:
+                error = [e.outdates, e.inserts]
+            # Cancels out the buffered insert of the bad triple.
+            write_behind_queue.outdate_triples([bad_triple])
+            buffer = sorted((key, list(mutation)) for key, mutation in write_behind_queue._buffer.items())
+            write_behind_queue.close()
+            cnt_requests = len(server.requests)
+        finally:
+            server.stop()
+
+        test = Test(test_number=31,
+                    tc_desc='Test if the mutations of a failed write-behind flush are buffered again, listed in the '
+                            'error and written with the next flush, while the written outdate is not repeated. The '
+                            'updates are sent to a mock SPARQL endpoint that rejects the bad triple.',
+                    expected_result=str([[[], [(bad_triple, None), (new_triple, None)]],
+                                         [(((), new_triple), [False, True])], 3]),
+                    actual_result=str([error, buffer, cnt_requests]))
+
+        return test
+
+    def test_write_behind__concurrent_bulk_insert(self):
+        server = SPARQLEndpointServer().start()
+        try:
+            engine = TripleStoreEngine(server.query_endpoint, server.update_endpoint, skip_connection_test=True)
+            flushed_triples = [["<http://ex.org/a>", "<http://ex.org/p>", '"flushed {0}"'.format(i)] for i in range(50)]
+            bulk_triples = [["<http://ex.org/a>", "<http://ex.org/p>", '"bulk {0}"'.format(i)] for i in range(50)]
+            set_query = engine.sparql_post.setQuery
+
+            def set_query_slowly(query: str):
+                set_query(query)
+                # Widens the gap between setting and sending a statement in which another thread could replace it.
+                time.sleep(0.002)
+
+            engine.sparql_post.setQuery = set_query_slowly
+            with engine.write_behind(flush_interval=60) as write_behind_queue:
+                def flush_one_by_one():
+                    for triple in flushed_triples:
+                        write_behind_queue.insert_triples(triple)
+                        write_behind_queue.flush()
+
+                flush_thread = threading.Thread(target=flush_one_by_one)
+                flush_thread.start()
+                # The bulk methods bypass the write-behind queue.
+                for triple in bulk_triples:
+                    engine.insert_triples_bulk(triple)
+                flush_thread.join()
+            updates = [parameters['update'][0] for path, parameters in server.requests if 'update' in parameters]
+        finally:
+            server.stop()
+
+        test = Test(test_number=32,
+                    tc_desc='Test if write-behind flushes that overlap with bulk inserts of the engine send their '
+                            'own update statements, i.e. if every triple arrives exactly once at a mock SPARQL '
+                            'endpoint.',
+                    expected_result="updates: 100, every triple once: True",
+                    actual_result="updates: {0}, every triple once: {1}".format(
+                        len(updates), all(len([u for u in updates if triple[2] in u]) == 1
+                                          for triple in flushed_triples + bulk_triples)))
+
+        return test
+
+    def test_reset__partitioned_twice(self):
+        server = SPARQLEndpointServer().start()
+        try:
+            engine = TripleStoreEngine(server.query_endpoint, server.update_endpoint, skip_connection_test=True)
+            checkpoint_file = os.path.join(tempfile.mkdtemp(), "checkpoint.jsonl")
+            version_record = {'operation': "version_all_rows", 'partition_mode': "SUBJECT_HASH",
+                              'partition': "0000-4000"}
+            with open(checkpoint_file, "w") as checkpoint:
+                checkpoint.write(json.dumps(version_record) + "\n")
+            cnt_partitions_executed = []
+            for _ in range(2):
+                cnt_partitions_executed.append(len(engine.reset_all_versions(PartitionMode.SUBJECT_HASH,
+                                                                             cnt_partitions=4,
+                                                                             checkpoint_file=checkpoint_file)))
+            with open(checkpoint_file, "r") as checkpoint:
+                records = [json.loads(line) for line in checkpoint]
+            cnt_requests = len(server.requests)
+        finally:
+            server.stop()
+
+        test = Test(test_number=33,
+                    tc_desc='Test if a partitioned reset that finished removes its records from the checkpoint file, '
+                            'so that the same call executes all partitions again, while the records of other '
+                            'operations are kept. The updates are sent to a mock SPARQL endpoint.',
+                    expected_result="partitions executed: [4, 4], requests: 8, records: {0}".format([version_record]),
+                    actual_result="partitions executed: {0}, requests: {1}, records: {2}".format(
+                        cnt_partitions_executed, cnt_requests, records))
+
+        return test
+
 
 t = TestVersioning(annotated_tests=False)
 t.run_tests()